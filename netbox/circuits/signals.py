@@ -1,8 +1,10 @@
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from dcim.signals import rebuild_paths
-from .models import CircuitTermination
+from dcim.svg import CableTraceSVG
+from dcim.utils import rebuild_paths
+from .models import CircuitTermination, Provider
 
 
 @receiver(post_save, sender=CircuitTermination)
@@ -25,3 +27,12 @@ def rebuild_cablepaths(instance, raw=False, **kwargs):
         peer_termination = instance.get_peer_termination()
         if peer_termination:
             rebuild_paths([peer_termination])
+
+
+@receiver(post_save, sender=Provider)
+def invalidate_all_cable_traces(instance, **kwargs):
+    """
+    Invalidate all cached cable traces when a Provider (which labels the circuits and provider networks within them)
+    is modified.
+    """
+    transaction.on_commit(CableTraceSVG.invalidate_cache)
@@ -293,6 +293,37 @@ class RackElevationDetailFilterSerializer(serializers.Serializer):
     )
 
 
+class AvailableRackUnitsFilterSerializer(serializers.Serializer):
+    u_height = serializers.DecimalField(
+        max_digits=4,
+        decimal_places=1,
+        min_value=0.5,
+        default=1
+    )
+    face = serializers.ChoiceField(
+        choices=DeviceFaceChoices,
+        required=False,
+        allow_null=True,
+        default=None
+    )
+    exclude = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=None
+    )
+
+
+class AvailableRackUnitsSerializer(serializers.Serializer):
+    """
+    The units within a rack available to accommodate a device of a given height.
+    """
+    rack = NestedRackSerializer(read_only=True)
+    available_units = serializers.ListField(
+        child=serializers.DecimalField(max_digits=4, decimal_places=1),
+        read_only=True
+    )
+
+
 #
 # Device/module types
 #
@@ -1118,7 +1149,10 @@ class CablePathSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CablePath
-        fields = ['id', 'path', 'is_active', 'is_complete', 'is_split']
+        fields = [
+            'id', 'path', 'is_active', 'is_complete', 'is_split', 'total_length', 'is_length_definitive',
+            'segment_count',
+        ]
 
     @extend_schema_field(serializers.ListField)
     def get_path(self, obj):
@@ -1,5 +1,7 @@
-from django.http import Http404, HttpResponse
+from django.db import transaction
+from django.http import Http404, HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework.decorators import action
@@ -13,7 +15,8 @@ from circuits.models import Circuit
 from dcim import filtersets
 from dcim.constants import CABLE_TRACE_SVG_DEFAULT_WIDTH
 from dcim.models import *
-from dcim.svg import CableTraceSVG
+from dcim.svg import CableTraceSVG, RackElevationSVG
+from dcim.utils import bulk_device_creation, bulk_module_creation
 from extras.api.mixins import ConfigContextQuerySetMixin, ConfigTemplateRenderMixin
 from ipam.models import Prefix, VLAN
 from netbox.api.authentication import IsAuthenticatedOrLoginNotRequired
@@ -49,9 +52,6 @@ class PathEndpointMixin(object):
         """
         obj = get_object_or_404(self.queryset, pk=pk)
 
-        # Initialize the path array
-        path = []
-
         # Render SVG image if requested
         if request.GET.get('render', None) == 'svg':
             try:
@@ -59,10 +59,40 @@ class PathEndpointMixin(object):
             except (ValueError, TypeError):
                 width = CABLE_TRACE_SVG_DEFAULT_WIDTH
             drawing = CableTraceSVG(obj, base_url=request.build_absolute_uri('/'), width=width)
-            return HttpResponse(drawing.render().tostring(), content_type='image/svg+xml')
+            return HttpResponse(drawing.render_cached(), content_type='image/svg+xml')
+
+        return Response(self._serialize_trace(obj.trace(), request))
+
+    @action(detail=False, url_path='trace')
+    def bulk_trace(self, request):
+        """
+        Trace the complete cable paths of all objects matching the specified filters (e.g. a list of IDs). Each path
+        is returned alongside the ID of its originating object and the total length of its CablePath.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        endpoints = list(page if page is not None else queryset)
+
+        traces = queryset.model.trace_endpoints(endpoints)
+        data = [
+            {
+                'id': endpoint.pk,
+                'trace': self._serialize_trace(traces[endpoint.pk], request),
+                'total_length': endpoint.path.total_length if endpoint.path else None,
+                'is_length_definitive': endpoint.path.is_length_definitive if endpoint.path else False,
+                'segment_count': endpoint.path.segment_count if endpoint.path else 0,
+            } for endpoint in endpoints
+        ]
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def _serialize_trace(self, trace, request):
+        path = []
 
         # Serialize path objects, iterating over each three-tuple in the path
-        for near_ends, cable, far_ends in obj.trace():
+        for near_ends, cable, far_ends in trace:
             if near_ends:
                 serializer_a = get_serializer_for_model(near_ends[0], prefix=NESTED_SERIALIZER_PREFIX)
                 near_ends = serializer_a(near_ends, many=True, context={'request': request}).data
@@ -77,7 +107,7 @@ class PathEndpointMixin(object):
 
             path.append((near_ends, cable, far_ends))
 
-        return Response(path)
+        return path
 
 
 class PassThroughPortMixin(object):
@@ -213,18 +243,34 @@ class RackViewSet(NetBoxModelViewSet):
                 except ValueError:
                     pass
 
-            # Render and return the elevation as an SVG drawing with the correct content type
-            drawing = rack.get_elevation_svg(
-                face=data['face'],
+            drawing = RackElevationSVG(
+                rack,
                 user=request.user,
                 unit_width=data['unit_width'],
                 unit_height=data['unit_height'],
                 legend_width=data['legend_width'],
+                margin_width=data['margin_width'],
                 include_images=data['include_images'],
                 base_url=request.build_absolute_uri('/'),
                 highlight_params=highlight_params
             )
-            return HttpResponse(drawing.tostring(), content_type='image/svg+xml')
+
+            # Return 304 (Not Modified) if the client already holds the current rendering of the elevation
+            cache_key = drawing.get_cache_key(data['face'])
+            etag = quote_etag(cache_key)
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match and etag in parse_etags(if_none_match):
+                response = HttpResponseNotModified()
+            else:
+                # Render (or retrieve from cache) and return the elevation as an SVG drawing with the correct
+                # content type
+                response = HttpResponse(
+                    drawing.render_cached(data['face'], cache_key=cache_key),
+                    content_type='image/svg+xml'
+                )
+            response['ETag'] = etag
+
+            return response
 
         else:
             # Return a JSON representation of the rack units in the elevation
@@ -245,6 +291,41 @@ class RackViewSet(NetBoxModelViewSet):
                 rack_units = serializers.RackUnitSerializer(page, many=True, context={'request': request})
                 return self.get_paginated_response(rack_units.data)
 
+    @extend_schema(
+        parameters=[serializers.AvailableRackUnitsFilterSerializer],
+        responses={200: serializers.AvailableRackUnitsSerializer(many=True)}
+    )
+    @action(detail=False, url_path='available-units')
+    def available_units(self, request):
+        """
+        List the units available to accommodate a device of a given height within each rack matching the specified
+        filters. A face may be specified for half-depth devices; otherwise, units must be free on both faces.
+        """
+        serializer = serializers.AvailableRackUnitsFilterSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return Response(serializer.errors, 400)
+        data = serializer.validated_data
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        racks = list(page if page is not None else queryset)
+
+        available_units = Rack.get_bulk_available_units(
+            racks,
+            u_height=data['u_height'],
+            rack_face=data['face'],
+            exclude=data['exclude']
+        )
+        serializer = serializers.AvailableRackUnitsSerializer(
+            [{'rack': rack, 'available_units': units} for rack, units in available_units.items()],
+            many=True,
+            context={'request': request}
+        )
+
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
 
 #
 # Rack reservations
@@ -399,6 +480,15 @@ class DeviceViewSet(
     filterset_class = filtersets.DeviceFilterSet
     pagination_class = StripCountAnnotationsPaginator
 
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        # Instantiate the components of all new devices in bulk
+        with bulk_device_creation():
+            return super().create(request, *args, **kwargs)
+
     def get_serializer_class(self):
         """
         Select the specific serializer based on the request context.
@@ -454,6 +544,15 @@ class ModuleViewSet(NetBoxModelViewSet):
     serializer_class = serializers.ModuleSerializer
     filterset_class = filtersets.ModuleFilterSet
 
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        # Instantiate the components of all new modules in bulk
+        with bulk_module_creation():
+            return super().create(request, *args, **kwargs)
+
 
 #
 # Device components
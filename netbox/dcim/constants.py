@@ -16,6 +16,7 @@ RACK_U_HEIGHT_MAX = 100
 RACK_ELEVATION_BORDER_WIDTH = 2
 RACK_ELEVATION_DEFAULT_LEGEND_WIDTH = 30
 RACK_ELEVATION_DEFAULT_MARGIN_WIDTH = 15
+RACK_ELEVATION_SVG_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 #
@@ -60,6 +61,10 @@ NONCONNECTABLE_IFACE_TYPES = VIRTUAL_IFACE_TYPES + WIRELESS_IFACE_TYPES
 
 MODULE_TOKEN = '{module}'
 
+# Component templates are cached per DeviceType/ModuleType (see get_component_templates())
+COMPONENT_TEMPLATES_CACHE_TIMEOUT = 60 * 60 * 24
+COMPONENT_TEMPLATES_CACHE_MAX_SIZE = 1000
+
 MODULAR_COMPONENT_TEMPLATE_MODELS = Q(
     app_label='dcim',
     model__in=(
@@ -90,6 +95,12 @@ MODULAR_COMPONENT_MODELS = Q(
 #
 
 CABLE_TRACE_SVG_DEFAULT_WIDTH = 400
+CABLE_TRACE_SVG_CACHE_TIMEOUT = 60 * 60 * 24
+
+# CablePath nodes are packed into a signed 64-bit integer: the ContentType ID occupies the high 16 bits and the
+# object ID the low 47 bits
+CABLEPATH_NODE_ID_BITS = 47
+CABLEPATH_NODE_ID_MASK = (1 << CABLEPATH_NODE_ID_BITS) - 1
 
 # Cable endpoint types
 CABLE_TERMINATION_MODELS = Q(
@@ -12,8 +12,8 @@ from tenancy.filtersets import TenancyFilterSet, ContactModelFilterSet
 from tenancy.models import *
 from utilities.choices import ColorChoices
 from utilities.filters import (
-    ContentTypeFilter, MultiValueCharFilter, MultiValueMACAddressFilter, MultiValueNumberFilter, MultiValueWWNFilter,
-    TreeNodeMultipleChoiceFilter,
+    ContentTypeFilter, MultiValueCharFilter, MultiValueDecimalFilter, MultiValueMACAddressFilter, MultiValueNumberFilter,
+    MultiValueWWNFilter, TreeNodeMultipleChoiceFilter,
 )
 from virtualization.models import Cluster
 from wireless.choices import WirelessRoleChoices, WirelessChannelChoices
@@ -1295,6 +1295,12 @@ class PathEndpointFilterSet(django_filters.FilterSet):
     connected = django_filters.BooleanFilter(
         method='filter_connected'
     )
+    path_length = MultiValueDecimalFilter(
+        field_name='_path__total_length'
+    )
+    path_segments = MultiValueNumberFilter(
+        field_name='_path__segment_count'
+    )
 
     def filter_connected(self, queryset, name, value):
         if value:
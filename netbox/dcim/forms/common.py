@@ -3,6 +3,11 @@ from django.utils.translation import gettext as _
 
 from dcim.choices import *
 from dcim.constants import *
+from dcim.models import (
+    ConsolePortTemplate, ConsoleServerPortTemplate, FrontPortTemplate, InterfaceTemplate, PowerOutletTemplate,
+    PowerPortTemplate, RearPortTemplate,
+)
+from dcim.models.devices import get_component_templates
 from utilities.forms import get_field_value
 
 __all__ = (
@@ -86,14 +91,16 @@ class ModuleCommonForm(forms.Form):
             self.instance._disable_replication = True
             return
 
-        for templates, component_attribute in [
-                ("consoleporttemplates", "consoleports"),
-                ("consoleserverporttemplates", "consoleserverports"),
-                ("interfacetemplates", "interfaces"),
-                ("powerporttemplates", "powerports"),
-                ("poweroutlettemplates", "poweroutlets"),
-                ("rearporttemplates", "rearports"),
-                ("frontporttemplates", "frontports")
+        module_templates = get_component_templates([module_type])[module_type.pk]
+
+        for template_model, component_attribute in [
+                (ConsolePortTemplate, "consoleports"),
+                (ConsoleServerPortTemplate, "consoleserverports"),
+                (InterfaceTemplate, "interfaces"),
+                (PowerPortTemplate, "powerports"),
+                (PowerOutletTemplate, "poweroutlets"),
+                (RearPortTemplate, "rearports"),
+                (FrontPortTemplate, "frontports")
         ]:
             # Prefetch installed components
             installed_components = {
@@ -101,7 +108,7 @@ class ModuleCommonForm(forms.Form):
             }
 
             # Get the templates for the module type.
-            for template in getattr(module_type, templates).all():
+            for template in module_templates[template_model]:
                 # Installing modules with placeholders require that the bay has a position value
                 if MODULE_TOKEN in template.name and not module_bay.position:
                     raise forms.ValidationError(
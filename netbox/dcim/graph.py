@@ -0,0 +1,453 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+from dcim.choices import LinkStatusChoices
+from dcim.utils import compile_path_node
+
+__all__ = (
+    'CableGraph',
+)
+
+
+class CableGraph:
+    """
+    An in-memory, read-only snapshot of the cable plant which can be used to trace CablePaths without issuing any
+    further database queries. By default, all cable terminations, pass-through port mappings, and circuit terminations
+    are loaded using a fixed number of queries upon initialization; trace() then walks the resulting adjacency maps.
+
+    If originating terminations are given, only the portion of the cable plant reachable from them is loaded. This is
+    discovered one hop at a time, using a fixed number of queries per hop regardless of the number of cables or
+    port positions involved.
+
+    Paths traced from a CableGraph are identical to those produced by CablePath.trace_from_database() against the
+    state of the database at the time the graph was loaded. A graph should be discarded once the cable plant has been
+    modified.
+
+    :param terminations: Iterable of originating termination objects (optional)
+    """
+    def __init__(self, terminations=None):
+        from circuits.models import CircuitTermination, ProviderNetwork
+        from dcim.models import Cable, FrontPort, Interface, RearPort, Site
+        from wireless.models import WirelessLink
+
+        self.cable_ct = ContentType.objects.get_for_model(Cable).pk
+        self.wirelesslink_ct = ContentType.objects.get_for_model(WirelessLink).pk
+        self.frontport_ct = ContentType.objects.get_for_model(FrontPort).pk
+        self.rearport_ct = ContentType.objects.get_for_model(RearPort).pk
+        self.circuittermination_ct = ContentType.objects.get_for_model(CircuitTermination).pk
+        self.providernetwork_ct = ContentType.objects.get_for_model(ProviderNetwork).pk
+        self.site_ct = ContentType.objects.get_for_model(Site).pk
+        self.interface_ct = ContentType.objects.get_for_model(Interface).pk
+
+        # Cables: {cable ID: (status, normalized length)}
+        self.cables = {}
+
+        # Wireless links: {link ID: (interface A ID, interface B ID, status)}
+        self.wireless_links = {}
+
+        # Cable terminations, indexed both by terminating object and by cable end. Ordering matches that of
+        # CableTermination to ensure far-end terminations are recorded in the same order as trace_from_database().
+        self.termination_ends = {}
+        self.cable_ends = defaultdict(list)
+
+        # Pass-through ports. Each port is assigned a rank reflecting its position under the model's natural ordering
+        # so that sets of ports can be recorded in the same order in which the database would return them.
+        self.rear_ports = {}
+        self.front_ports = {}
+        self.rear_port_mappings = defaultdict(list)
+
+        # Circuit terminations: {termination ID: (circuit ID, term side, site ID, provider network ID, cable ID)}
+        self.circuit_terminations = {}
+        self.circuit_sides = {}
+
+        if terminations is None:
+            self._load_all()
+        else:
+            self._load_reachable(terminations)
+
+    def _load_all(self):
+        """
+        Load the entire cable plant.
+        """
+        from circuits.models import CircuitTermination
+        from dcim.models import Cable, CableTermination, FrontPort, RearPort
+        from wireless.models import WirelessLink
+
+        self._load_cables(Cable.objects.all())
+        self._load_wireless_links(WirelessLink.objects.all())
+        self._load_cable_terminations(CableTermination.objects.all())
+        self._load_rear_ports(RearPort.objects.all())
+        self._load_front_ports(FrontPort.objects.all())
+        self._load_circuit_terminations(CircuitTermination.objects.all())
+
+    def _load_reachable(self, terminations):
+        """
+        Load only the portion of the cable plant reachable from the given originating terminations, following cables
+        through pass-through ports and circuits one hop at a time.
+        """
+        from circuits.models import CircuitTermination
+        from dcim.models import Cable, CableTermination, FrontPort, RearPort
+        from wireless.models import WirelessLink
+
+        wireless_link_ids = {getattr(t, 'wireless_link_id', None) for t in terminations} - {None}
+        if wireless_link_ids:
+            self._load_wireless_links(WirelessLink.objects.filter(pk__in=wireless_link_ids))
+
+        cable_ids = {t.cable_id for t in terminations} - {None}
+        while cable_ids:
+            self._load_cables(Cable.objects.filter(pk__in=cable_ids))
+            ends = self._load_cable_terminations(CableTermination.objects.filter(cable__in=cable_ids))
+
+            # Find the pass-through ports and circuit terminations attached to these cables
+            front_port_ids = {pk for ct_id, pk in ends if ct_id == self.frontport_ct}
+            rear_port_ids = {pk for ct_id, pk in ends if ct_id == self.rearport_ct}
+            circuittermination_ids = {pk for ct_id, pk in ends if ct_id == self.circuittermination_ct}
+
+            # Load the ports on the far side of each pass-through port (i.e. the RearPort of each FrontPort, and every
+            # FrontPort mapped to each RearPort), together with the cables attached to them
+            cable_ids = set()
+            if front_port_ids:
+                cable_ids.update(self._load_front_ports(FrontPort.objects.filter(pk__in=front_port_ids)))
+                rear_port_ids.update(self.front_ports[pk][0] for pk in front_port_ids if pk in self.front_ports)
+            rear_port_ids -= self.rear_ports.keys()
+            if rear_port_ids:
+                cable_ids.update(self._load_rear_ports(RearPort.objects.filter(pk__in=rear_port_ids)))
+                cable_ids.update(self._load_front_ports(FrontPort.objects.filter(rear_port__in=rear_port_ids)))
+
+            # Load both terminations of each circuit
+            if circuittermination_ids:
+                circuits = CircuitTermination.objects.filter(pk__in=circuittermination_ids).values('circuit')
+                cable_ids.update(
+                    self._load_circuit_terminations(CircuitTermination.objects.filter(circuit__in=circuits))
+                )
+
+            cable_ids -= self.cables.keys()
+            cable_ids.discard(None)
+
+        # Ports have been loaded over several queries, so must be ranked anew
+        if self.rear_ports:
+            self._rank_ports()
+
+    def _load_cables(self, queryset):
+        for pk, status, abs_length in queryset.values_list('pk', 'status', '_abs_length'):
+            self.cables[pk] = (status, abs_length)
+
+    def _load_wireless_links(self, queryset):
+        for pk, interface_a_id, interface_b_id, status in queryset.values_list(
+            'pk', 'interface_a_id', 'interface_b_id', 'status'
+        ):
+            self.wireless_links[pk] = (interface_a_id, interface_b_id, status)
+
+    def _load_cable_terminations(self, queryset):
+        """
+        Load the given CableTerminations and return the terminating objects as a list of (ContentType ID, object ID)
+        tuples.
+        """
+        from dcim.models import CableTermination
+
+        ends = []
+        cable_terminations = queryset.order_by(*CableTermination._meta.ordering).values_list(
+            'cable_id', 'cable_end', 'termination_type_id', 'termination_id'
+        )
+        for cable_id, cable_end, ct_id, object_id in cable_terminations:
+            self.termination_ends[(ct_id, object_id)] = cable_end
+            self.cable_ends[(cable_id, cable_end)].append((ct_id, object_id))
+            ends.append((ct_id, object_id))
+        return ends
+
+    def _load_rear_ports(self, queryset):
+        """
+        Load any of the given RearPorts not already loaded, and return the IDs of their cables.
+        """
+        from dcim.models import RearPort
+
+        cable_ids = set()
+        rear_ports = queryset.order_by(*RearPort._meta.ordering).values_list('pk', 'positions', 'cable_id')
+        for pk, positions, cable_id in rear_ports:
+            if pk not in self.rear_ports:
+                self.rear_ports[pk] = (len(self.rear_ports), positions, cable_id)
+                cable_ids.add(cable_id)
+        return cable_ids
+
+    def _load_front_ports(self, queryset):
+        """
+        Load any of the given FrontPorts not already loaded, and return the IDs of their cables.
+        """
+        from dcim.models import FrontPort
+
+        cable_ids = set()
+        front_ports = queryset.order_by(*FrontPort._meta.ordering).values_list(
+            'pk', 'rear_port_id', 'rear_port_position', 'cable_id'
+        )
+        for pk, rear_port_id, rear_port_position, cable_id in front_ports:
+            if pk not in self.front_ports:
+                self.rear_port_mappings[rear_port_id].append((len(self.front_ports), pk, rear_port_position))
+                self.front_ports[pk] = (rear_port_id, rear_port_position, cable_id)
+                cable_ids.add(cable_id)
+        return cable_ids
+
+    def _load_circuit_terminations(self, queryset):
+        """
+        Load any of the given CircuitTerminations not already loaded, and return the IDs of their cables.
+        """
+        cable_ids = set()
+        circuit_terminations = queryset.values_list(
+            'pk', 'circuit_id', 'term_side', 'site_id', 'provider_network_id', 'cable_id'
+        )
+        for pk, circuit_id, term_side, site_id, provider_network_id, cable_id in circuit_terminations:
+            if pk not in self.circuit_terminations:
+                self.circuit_terminations[pk] = (circuit_id, term_side, site_id, provider_network_id, cable_id)
+                self.circuit_sides[(circuit_id, term_side)] = pk
+                cable_ids.add(cable_id)
+        return cable_ids
+
+    def _rank_ports(self):
+        """
+        Rank all loaded pass-through ports under their model's natural ordering using a single query per model.
+        """
+        from dcim.models import FrontPort, RearPort
+
+        rear_port_ids = RearPort.objects.filter(pk__in=list(self.rear_ports)).order_by(
+            *RearPort._meta.ordering
+        ).values_list('pk', flat=True)
+        self.rear_ports = {
+            pk: (rank, *self.rear_ports[pk][1:]) for rank, pk in enumerate(rear_port_ids)
+        }
+
+        front_port_ids = FrontPort.objects.filter(pk__in=list(self.front_ports)).order_by(
+            *FrontPort._meta.ordering
+        ).values_list('pk', flat=True)
+        ranks = {pk: rank for rank, pk in enumerate(front_port_ids)}
+        for rear_port_id, mappings in self.rear_port_mappings.items():
+            self.rear_port_mappings[rear_port_id] = [
+                (ranks[pk], pk, position) for _, pk, position in mappings if pk in ranks
+            ]
+
+    def _get_link(self, ct_id, object_id):
+        """
+        Return the Cable attached to a pass-through port or circuit termination as a (ContentType ID, object ID)
+        tuple, or None.
+        """
+        if ct_id == self.frontport_ct:
+            cable_id = self.front_ports[object_id][2]
+        elif ct_id == self.rearport_ct:
+            cable_id = self.rear_ports[object_id][2]
+        elif ct_id == self.circuittermination_ct:
+            cable_id = self.circuit_terminations[object_id][4]
+        else:
+            cable_id = None
+        if cable_id in self.cables:
+            return self.cable_ct, cable_id
+        return None
+
+    def _exists(self, ct_id, object_id):
+        """
+        Return False if the given object is a pass-through port or circuit termination absent from the snapshot.
+        """
+        if ct_id == self.frontport_ct:
+            return object_id in self.front_ports
+        if ct_id == self.rearport_ct:
+            return object_id in self.rear_ports
+        if ct_id == self.circuittermination_ct:
+            return object_id in self.circuit_terminations
+        return True
+
+    def get_origin_link(self, cable_id, wireless_link_id=None):
+        """
+        Return the link attached to an originating object as a (ContentType ID, object ID) tuple, or None.
+        """
+        # Links absent from the snapshot (e.g. deleted since the origin was retrieved) are disregarded
+        if cable_id in self.cables:
+            return self.cable_ct, cable_id
+        if wireless_link_id in self.wireless_links:
+            return self.wirelesslink_ct, wireless_link_id
+        return None
+
+    def trace(self, terminations):
+        """
+        Return a new (unsaved) CablePath traced from the given termination objects, or None if the terminations are
+        not connected. This is the in-memory equivalent of CablePath.trace_from_database().
+        """
+        from dcim.models import CablePath
+
+        if not terminations:
+            return None
+
+        # Origins are the only objects for which the attached link is read from the instance itself; all subsequent
+        # hops are resolved from the snapshot.
+        ct_id = ContentType.objects.get_for_model(terminations[0]).pk
+        result = self.trace_nodes(
+            ct_id,
+            [t.pk for t in terminations],
+            [self.get_origin_link(t.cable_id, getattr(t, 'wireless_link_id', None)) for t in terminations]
+        )
+        if result is None:
+            return None
+        path, is_complete, is_active, is_split, total_length, is_length_definitive = result
+
+        return CablePath(
+            path=path,
+            is_complete=is_complete,
+            is_active=is_active,
+            is_split=is_split,
+            total_length=total_length,
+            is_length_definitive=is_length_definitive
+        )
+
+    def trace_nodes(self, ct_id, nodes, links):
+        """
+        Trace a path from the given originating nodes, identified by their ContentType ID and a list of object IDs,
+        with `links` holding the link attached to each node (see get_origin_link()). Returns a tuple of
+        (path, is_complete, is_active, is_split, total_length, is_length_definitive), or None if the nodes are not
+        connected.
+
+        This method touches only the in-memory snapshot, so it is safe to call from worker processes forked after the
+        graph has been loaded.
+        """
+        path = []
+        position_stack = []
+        is_complete = False
+        is_active = True
+        is_split = False
+        total_length = None
+        is_length_definitive = True
+
+        while nodes:
+
+            # Check for a split path (e.g. rear port fanning out to multiple front ports with
+            # different cables attached)
+            if len(set(links)) > 1:
+                is_split = True
+                break
+
+            # Step 1: Record the near-end termination object(s)
+            path.append([compile_path_node(ct_id, pk) for pk in nodes])
+
+            # Step 2: Determine the attached link (Cable or WirelessLink), if any
+            link = links[0]
+            if link is None and len(path) == 1:
+                # If this is the start of the path and no link exists, return None
+                return None
+            elif link is None:
+                # Otherwise, halt the trace if no link exists
+                break
+
+            # Step 3: Record the link and update path status if not "connected"
+            link_ct, link_id = link
+            path.append([compile_path_node(link_ct, link_id)])
+
+            # Step 4: Determine the far-end terminations
+            if link_ct == self.cable_ct:
+                status, abs_length = self.cables[link_id]
+                if status != LinkStatusChoices.STATUS_CONNECTED:
+                    is_active = False
+                if abs_length is None:
+                    is_length_definitive = False
+                else:
+                    total_length = (total_length or 0) + abs_length
+                local_cable_end = self.termination_ends.get((ct_id, nodes[0]))
+                if local_cable_end is None:
+                    # The near end is not terminated to the cable, so there is no far end
+                    remote_terminations = []
+                else:
+                    remote_cable_end = 'A' if local_cable_end == 'B' else 'B'
+                    remote_terminations = self.cable_ends.get((link_id, remote_cable_end), [])
+            else:
+                # WirelessLink
+                interface_a_id, interface_b_id, status = self.wireless_links[link_id]
+                if status != LinkStatusChoices.STATUS_CONNECTED:
+                    is_active = False
+                remote_id = interface_b_id if interface_a_id == nodes[0] else interface_a_id
+                remote_terminations = [(self.interface_ct, remote_id)]
+
+            # Disregard any pass-through ports or circuit terminations which no longer exist
+            remote_terminations = [
+                (remote_ct, remote_id) for remote_ct, remote_id in remote_terminations
+                if self._exists(remote_ct, remote_id)
+            ]
+
+            # Step 5: Record the far-end termination object(s)
+            path.append([
+                compile_path_node(remote_ct, remote_id) for remote_ct, remote_id in remote_terminations
+            ])
+
+            # Step 6: Determine the "next hop" terminations, if applicable
+            if not remote_terminations:
+                break
+            remote_ct = remote_terminations[0][0]
+            remote_ids = [remote_id for _, remote_id in remote_terminations]
+
+            if remote_ct == self.frontport_ct:
+                # Follow FrontPorts to their corresponding RearPorts
+                rear_port_ids = sorted(
+                    {self.front_ports[pk][0] for pk in remote_ids} & self.rear_ports.keys(),
+                    key=lambda pk: self.rear_ports[pk][0]
+                )
+                if not rear_port_ids:
+                    break
+                elif len(rear_port_ids) > 1:
+                    assert all(self.rear_ports[pk][1] == 1 for pk in rear_port_ids)
+                elif self.rear_ports[rear_port_ids[0]][1] > 1:
+                    position_stack.append([self.front_ports[pk][1] for pk in remote_ids])
+
+                ct_id = self.rearport_ct
+                nodes = rear_port_ids
+
+            elif remote_ct == self.rearport_ct:
+
+                if len(remote_ids) > 1 or self.rear_ports[remote_ids[0]][1] == 1:
+                    positions = {1}
+                elif position_stack:
+                    positions = set(position_stack.pop())
+                else:
+                    # No position indicated: path has split, so we stop at the RearPorts
+                    is_split = True
+                    break
+
+                front_ports = sorted(
+                    (rank, pk)
+                    for rear_port_id in remote_ids
+                    for rank, pk, position in self.rear_port_mappings[rear_port_id]
+                    if position in positions
+                )
+                ct_id = self.frontport_ct
+                nodes = [pk for _, pk in front_ports]
+
+            elif remote_ct == self.circuittermination_ct:
+                # Follow a CircuitTermination to its corresponding CircuitTermination (A to Z or vice versa)
+                if len(remote_ids) > 1:
+                    is_split = True
+                    break
+                circuit_id, term_side, _, _, _ = self.circuit_terminations[remote_ids[0]]
+                peer_id = self.circuit_sides.get((circuit_id, 'Z' if term_side == 'A' else 'A'))
+                if peer_id is None:
+                    break
+                _, _, site_id, provider_network_id, cable_id = self.circuit_terminations[peer_id]
+                if provider_network_id:
+                    # Circuit terminates to a ProviderNetwork
+                    path.extend([
+                        [compile_path_node(self.circuittermination_ct, peer_id)],
+                        [compile_path_node(self.providernetwork_ct, provider_network_id)],
+                    ])
+                    is_complete = True
+                    break
+                elif site_id and not cable_id:
+                    # Circuit terminates to a Site
+                    path.extend([
+                        [compile_path_node(self.circuittermination_ct, peer_id)],
+                        [compile_path_node(self.site_ct, site_id)],
+                    ])
+                    break
+
+                ct_id = self.circuittermination_ct
+                nodes = [peer_id]
+
+            # Anything else marks the end of the path
+            else:
+                is_complete = True
+                break
+
+            links = [self._get_link(ct_id, pk) for pk in nodes]
+
+        return path, is_complete, is_active, is_split, total_length, is_length_definitive
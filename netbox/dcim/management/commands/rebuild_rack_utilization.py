@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from dcim.models import Rack
+from dcim.utils import update_rack_utilization
+
+
+class Command(BaseCommand):
+    help = "Recalculate the stored space and power utilization of all racks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, dest='batch_size',
+            help="Number of racks to update per batch (default: 500)"
+        )
+
+    def handle(self, *model_names, **options):
+        rack_ids = list(Rack.objects.order_by('pk').values_list('pk', flat=True))
+        batch_size = max(options['batch_size'], 1)
+        self.stdout.write(f'Updating utilization for {len(rack_ids)} racks...')
+
+        for i in range(0, len(rack_ids), batch_size):
+            update_rack_utilization(rack_ids[i:i + batch_size])
+            self.stdout.write(f'  Updated {min(i + batch_size, len(rack_ids))} racks', ending='\r')
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('Finished.'))
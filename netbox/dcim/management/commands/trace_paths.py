@@ -1,10 +1,15 @@
+import itertools
+import multiprocessing
+import time
+
+from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
 from django.core.management.color import no_style
-from django.db import connection
+from django.db import connection, connections, transaction
 from django.db.models import Q
 
+from dcim.graph import CableGraph
 from dcim.models import CablePath, ConsolePort, ConsoleServerPort, Interface, PowerFeed, PowerOutlet, PowerPort
-from dcim.signals import create_cablepath
 
 ENDPOINT_MODELS = (
     ConsolePort,
@@ -15,9 +20,30 @@ ENDPOINT_MODELS = (
     PowerPort
 )
 
+# By default, paths are traced using one worker process per CPU (up to four)
+DEFAULT_WORKERS = min(multiprocessing.cpu_count(), 4)
+
+# The CableGraph snapshot shared (copy-on-write) with forked worker processes
+_graph = None
+
+
+def trace_chunk(chunk):
+    """
+    Trace a path from each origin in the chunk using the shared CableGraph. Returns a list of (origin ID, result)
+    tuples, where result is as returned by CableGraph.trace_nodes().
+    """
+    ct_id, origins = chunk
+    return [
+        (pk, _graph.trace_nodes(ct_id, [pk], [link])) for pk, link in origins
+    ]
+
 
 class Command(BaseCommand):
-    help = "Generate any missing cable paths among all cable termination objects in NetBox"
+    help = (
+        "Generate any missing cable paths among all cable termination objects in NetBox. Paths are written in "
+        "batches, each committed independently; an interrupted run can be resumed by running the command again "
+        "without --force."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -28,6 +54,14 @@ class Command(BaseCommand):
             "--no-input", action='store_true', dest='no_input',
             help="Do not prompt user for any input/confirmation"
         )
+        parser.add_argument(
+            "--workers", type=int, default=DEFAULT_WORKERS,
+            help=f"Number of worker processes to use for tracing paths (default: {DEFAULT_WORKERS})"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, dest='batch_size',
+            help="Number of paths to trace and write per batch (default: 1000)"
+        )
 
     def draw_progress_bar(self, percentage):
         """
@@ -66,25 +100,89 @@ class Command(BaseCommand):
                 for sql in sequence_sql:
                     cursor.execute(sql)
 
+        # Load a snapshot of the entire cable plant from which to trace paths
+        global _graph
+        self.stdout.write('Loading cable graph...')
+        _graph = CableGraph()
+
         # Retrace paths
-        for model in ENDPOINT_MODELS:
-            params = Q(cable__isnull=False)
-            if hasattr(model, 'wireless_link'):
-                params |= Q(wireless_link__isnull=False)
-            origins = model.objects.filter(params)
-            if not options['force']:
-                origins = origins.filter(_path__isnull=True)
-            origins_count = origins.count()
-            if not origins_count:
-                self.stdout.write(f'Found no missing {model._meta.verbose_name} paths; skipping')
-                continue
-            self.stdout.write(f'Retracing {origins_count} cabled {model._meta.verbose_name_plural}...')
-            i = 0
-            for i, obj in enumerate(origins, start=1):
-                create_cablepath([obj])
-                if not i % 100:
+        workers = max(options['workers'], 1)
+        batch_size = max(options['batch_size'], 1)
+        pool = None
+        if workers > 1:
+            # Close database connections before forking so that worker processes do not inherit them
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
+
+        try:
+            for model in ENDPOINT_MODELS:
+                params = Q(cable__isnull=False)
+                fields = ['pk', 'cable_id']
+                if hasattr(model, 'wireless_link'):
+                    params |= Q(wireless_link__isnull=False)
+                    fields.append('wireless_link_id')
+                origins = model.objects.filter(params)
+                if not options['force']:
+                    origins = origins.filter(_path__isnull=True)
+                origins = [
+                    (pk, _graph.get_origin_link(*links)) for pk, *links in origins.order_by('pk').values_list(*fields)
+                ]
+                origins_count = len(origins)
+                if not origins_count:
+                    self.stdout.write(f'Found no missing {model._meta.verbose_name} paths; skipping')
+                    continue
+                self.stdout.write(f'Retracing {origins_count} cabled {model._meta.verbose_name_plural}...')
+
+                ct_id = ContentType.objects.get_for_model(model).pk
+                chunks = [
+                    (ct_id, origins[i:i + batch_size]) for i in range(0, origins_count, batch_size)
+                ]
+                results = pool.imap(trace_chunk, chunks) if pool else map(trace_chunk, chunks)
+
+                i = 0
+                start_time = time.monotonic()
+                for chunk_results in results:
+                    self.save_paths(model, chunk_results)
+                    i += len(chunk_results)
                     self.draw_progress_bar(i * 100 / origins_count)
-            self.draw_progress_bar(100)
-            self.stdout.write(self.style.SUCCESS(f'\n  Retraced {i} {model._meta.verbose_name_plural}'))
+                elapsed = time.monotonic() - start_time
+                rate = i / elapsed if elapsed else i
+                self.stdout.write(self.style.SUCCESS(
+                    f'\n  Retraced {i} {model._meta.verbose_name_plural} in {elapsed:.2f}s ({rate:.1f} paths/sec)'
+                ))
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
 
         self.stdout.write(self.style.SUCCESS('Finished.'))
+
+    def save_paths(self, model, results):
+        """
+        Write the traced CablePaths for a batch of origins using bulk inserts, and record each new path on its
+        originating object.
+        """
+        origin_ids = []
+        cable_paths = []
+        for pk, result in results:
+            if result is None:
+                continue
+            path, is_complete, is_active, is_split, total_length, is_length_definitive = result
+            origin_ids.append(pk)
+            cable_paths.append(CablePath(
+                path=path,
+                is_complete=is_complete,
+                is_active=is_active,
+                is_split=is_split,
+                total_length=total_length,
+                is_length_definitive=is_length_definitive,
+                segment_count=len(path) // 3,
+                _nodes=list(itertools.chain(*path))
+            ))
+
+        with transaction.atomic():
+            CablePath.objects.bulk_create(cable_paths)
+            model.objects.bulk_update(
+                [model(pk=pk, _path_id=cp.pk) for pk, cp in zip(origin_ids, cable_paths)],
+                fields=['_path']
+            )
@@ -1,6 +1,9 @@
 from django.db import migrations
 
-from dcim.utils import compile_path_node
+
+def compile_path_node(ct_id, object_id):
+    # Path nodes were originally represented as strings in the form <ContentType ID>:<Object ID>
+    return f'{ct_id}:{object_id}'
 
 
 def populate_cable_paths(apps, schema_editor):
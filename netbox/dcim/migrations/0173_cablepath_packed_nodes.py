@@ -0,0 +1,77 @@
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+import dcim.fields
+
+# Path nodes are converted from strings in the form <ContentType ID>:<Object ID> to a single integer, with the
+# ContentType ID held in the high bits and the object ID in the low 47 bits (see CABLEPATH_NODE_ID_BITS).
+
+PACK_NODE = "((split_part({0}, ':', 1)::bigint << 47) | split_part({0}, ':', 2)::bigint)"
+UNPACK_NODE = "(({0} >> 47)::text || ':' || ({0} & 140737488355327)::text)"
+
+PACK_NODES_SQL = f"""
+CREATE FUNCTION pg_temp.dcim_pack_path_nodes(nodes varchar[]) RETURNS bigint[] AS $$
+    SELECT coalesce(array_agg({PACK_NODE.format('n')} ORDER BY i), '{{}}')
+    FROM unnest(nodes) WITH ORDINALITY AS t(n, i)
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE dcim_cablepath ALTER COLUMN _nodes TYPE bigint[] USING pg_temp.dcim_pack_path_nodes(_nodes);
+
+UPDATE dcim_cablepath SET path = (
+    SELECT coalesce(jsonb_agg((
+        SELECT coalesce(jsonb_agg({PACK_NODE.format('n')} ORDER BY j), '[]'::jsonb)
+        FROM jsonb_array_elements_text(step) WITH ORDINALITY AS u(n, j)
+    ) ORDER BY i), '[]'::jsonb)
+    FROM jsonb_array_elements(path) WITH ORDINALITY AS t(step, i)
+);
+
+DROP FUNCTION pg_temp.dcim_pack_path_nodes(varchar[]);
+"""
+
+UNPACK_NODES_SQL = f"""
+CREATE FUNCTION pg_temp.dcim_unpack_path_nodes(nodes bigint[]) RETURNS varchar(40)[] AS $$
+    SELECT coalesce(array_agg({UNPACK_NODE.format('n')} ORDER BY i), '{{}}')
+    FROM unnest(nodes) WITH ORDINALITY AS t(n, i)
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE dcim_cablepath ALTER COLUMN _nodes TYPE varchar(40)[] USING pg_temp.dcim_unpack_path_nodes(_nodes);
+
+UPDATE dcim_cablepath SET path = (
+    SELECT coalesce(jsonb_agg((
+        SELECT coalesce(jsonb_agg({UNPACK_NODE.format('n::bigint')} ORDER BY j), '[]'::jsonb)
+        FROM jsonb_array_elements_text(step) WITH ORDINALITY AS u(n, j)
+    ) ORDER BY i), '[]'::jsonb)
+    FROM jsonb_array_elements(path) WITH ORDINALITY AS t(step, i)
+);
+
+DROP FUNCTION pg_temp.dcim_unpack_path_nodes(bigint[]);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dcim', '0172_larger_power_draw_values'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=PACK_NODES_SQL,
+                    reverse_sql=UNPACK_NODES_SQL
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='cablepath',
+                    name='_nodes',
+                    field=dcim.fields.PathField(base_field=models.BigIntegerField(), size=None),
+                ),
+            ]
+        ),
+        migrations.AddIndex(
+            model_name='cablepath',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['_nodes'], name='dcim_cablepath_nodes'),
+        ),
+    ]
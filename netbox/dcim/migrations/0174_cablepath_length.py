@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+POPULATE_CABLEPATH_LENGTH_SQL = """
+UPDATE dcim_cablepath SET
+    segment_count = jsonb_array_length(path) / 3,
+    total_length = (
+        SELECT sum(c._abs_length) FROM dcim_cable c
+        WHERE c.id IN (
+            SELECT n & 140737488355327 FROM unnest(_nodes) AS n WHERE n >> 47 = %(ct)s
+        )
+    ),
+    is_length_definitive = (
+        SELECT count(*) FROM unnest(_nodes) AS n WHERE n >> 47 = %(ct)s
+    ) = (
+        SELECT count(*) FROM dcim_cable c
+        WHERE c._abs_length IS NOT NULL AND c.id IN (
+            SELECT n & 140737488355327 FROM unnest(_nodes) AS n WHERE n >> 47 = %(ct)s
+        )
+    )
+"""
+
+
+def populate_cablepath_length(apps, schema_editor):
+    """
+    Calculate the total length & segment count of all existing CablePaths.
+    """
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    cable_ct = ContentType.objects.filter(app_label='dcim', model='cable').first()
+    if cable_ct is None:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(POPULATE_CABLEPATH_LENGTH_SQL, {'ct': cable_ct.pk})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('dcim', '0173_cablepath_packed_nodes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cablepath',
+            name='total_length',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='cablepath',
+            name='is_length_definitive',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='cablepath',
+            name='segment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            code=populate_cablepath_length,
+            reverse_code=migrations.RunPython.noop
+        ),
+    ]
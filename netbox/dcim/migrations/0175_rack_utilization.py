@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dcim', '0174_cablepath_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rack',
+            name='_utilization',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='rack',
+            name='_power_utilization',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=8),
+        ),
+    ]
@@ -3,9 +3,9 @@ from collections import defaultdict
 
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Sum
 from django.dispatch import Signal
 from django.urls import reverse
 
@@ -91,8 +91,9 @@ class Cable(PrimaryModel):
         # A copy of the PK to be used by __str__ in case the object is deleted
         self._pk = self.pk
 
-        # Cache the original status so we can check later if it's been changed
+        # Cache the original status and length so we can check later if they've been changed
         self._orig_status = self.status
+        self._orig_abs_length = self._abs_length
 
         self._terminations_modified = False
 
@@ -399,7 +400,15 @@ class CablePath(models.Model):
     if the instance represents a complete end-to-end path from origin(s) to destination(s). `is_split` is True if the
     path diverges across multiple cables.
 
-    `_nodes` retains a flattened list of all nodes within the path to enable simple filtering.
+    `total_length` holds the sum of the lengths (in meters) of all cables within the path, and `is_length_definitive`
+    is False if any of those cables has no defined length. `segment_count` records the number of links within the
+    path. These are calculated as the path is traced, and stored to allow filtering and ordering of paths by length.
+
+    Each node is represented as a single integer packing the ContentType ID of the object into its high bits and the
+    object's ID into its low bits (see dcim.utils.compile_path_node()).
+
+    `_nodes` retains a flattened list of all nodes within the path to enable simple filtering. It is backed by a GIN
+    index to support efficient containment lookups.
     """
     path = models.JSONField(
         default=list
@@ -413,8 +422,25 @@ class CablePath(models.Model):
     is_split = models.BooleanField(
         default=False
     )
+    total_length = models.DecimalField(
+        max_digits=12,
+        decimal_places=4,
+        blank=True,
+        null=True
+    )
+    is_length_definitive = models.BooleanField(
+        default=True
+    )
+    segment_count = models.PositiveIntegerField(
+        default=0
+    )
     _nodes = PathField()
 
+    class Meta:
+        indexes = (
+            GinIndex(fields=('_nodes',), name='dcim_cablepath_nodes'),
+        )
+
     def __str__(self):
         return f"Path #{self.pk}: {len(self.path)} hops"
 
@@ -422,6 +448,7 @@ class CablePath(models.Model):
 
         # Save the flattened nodes list
         self._nodes = list(itertools.chain(*self.path))
+        self.segment_count = len(self.path) // 3
 
         super().save(*args, **kwargs)
 
@@ -467,16 +494,31 @@ class CablePath(models.Model):
             return []
         return self.path_objects[-1]
 
-    @property
-    def segment_count(self):
-        return int(len(self.path) / 3)
-
     @classmethod
-    def from_origin(cls, terminations):
+    def from_origin(cls, terminations, graph=None):
         """
         Create a new CablePath instance as traced from the given termination objects. These can be any object to which a
         Cable or WirelessLink connects (interfaces, console ports, circuit termination, etc.). All terminations must be
         of the same type and must belong to the same parent object.
+
+        The path is traced in memory from a CableGraph. If none is passed, a graph holding only the portion of the
+        cable plant reachable from the terminations is loaded.
+        """
+        from dcim.graph import CableGraph
+
+        if not terminations:
+            return None
+
+        if graph is None:
+            graph = CableGraph(terminations)
+
+        return graph.trace(terminations)
+
+    @classmethod
+    def trace_from_database(cls, terminations):
+        """
+        Create a new CablePath instance as traced from the given termination objects by querying the database at each
+        hop. This serves as the reference implementation for CableGraph.trace().
         """
         from circuits.models import CircuitTermination
 
@@ -492,6 +534,8 @@ class CablePath(models.Model):
         is_complete = False
         is_active = True
         is_split = False
+        total_length = None
+        is_length_definitive = True
 
         while terminations:
 
@@ -523,6 +567,11 @@ class CablePath(models.Model):
             path.append([object_to_path_node(link)])
             if hasattr(link, 'status') and link.status != LinkStatusChoices.STATUS_CONNECTED:
                 is_active = False
+            if isinstance(link, Cable):
+                if link._abs_length is None:
+                    is_length_definitive = False
+                else:
+                    total_length = (total_length or 0) + link._abs_length
 
             # Step 4: Determine the far-end terminations
             if isinstance(link, Cable):
@@ -621,19 +670,25 @@ class CablePath(models.Model):
             path=path,
             is_complete=is_complete,
             is_active=is_active,
-            is_split=is_split
+            is_split=is_split,
+            total_length=total_length,
+            is_length_definitive=is_length_definitive
         )
 
-    def retrace(self):
+    def retrace(self, graph=None):
         """
         Retrace the path from the currently-defined originating termination(s)
+
+        :param graph: A CableGraph from which to trace the path (optional)
         """
-        _new = self.from_origin(self.origins)
+        _new = self.from_origin(self.origins, graph=graph)
         if _new:
             self.path = _new.path
             self.is_complete = _new.is_complete
             self.is_active = _new.is_active
             self.is_split = _new.is_split
+            self.total_length = _new.total_length
+            self.is_length_definitive = _new.is_length_definitive
             self.save()
         else:
             self.delete()
@@ -642,11 +697,28 @@ class CablePath(models.Model):
         """
         Return the path as a list of prefetched objects.
         """
+        return self._replicate_path(self._prefetch_nodes(self._nodes))
+
+    @classmethod
+    def prefetch_path_objects(cls, cablepaths):
+        """
+        Populate path_objects on each of the given CablePaths, retrieving the objects for all paths using one query
+        per model type.
+        """
+        prefetched = cls._prefetch_nodes(itertools.chain.from_iterable(cp._nodes for cp in cablepaths))
+        for cablepath in cablepaths:
+            cablepath._path_objects = cablepath._replicate_path(prefetched)
+
+    @staticmethod
+    def _prefetch_nodes(nodes):
+        """
+        Return a mapping of ContentType IDs to {object ID: object} for the given path nodes.
+        """
         # Compile a list of IDs to prefetch for each type of model in the path
-        to_prefetch = defaultdict(list)
-        for node in self._nodes:
+        to_prefetch = defaultdict(set)
+        for node in nodes:
             ct_id, object_id = decompile_path_node(node)
-            to_prefetch[ct_id].append(object_id)
+            to_prefetch[ct_id].add(object_id)
 
         # Prefetch path objects using one query per model type. Prefetch related devices where appropriate.
         prefetched = {}
@@ -659,7 +731,12 @@ class CablePath(models.Model):
                 obj.id: obj for obj in queryset
             }
 
-        # Replicate the path using the prefetched objects.
+        return prefetched
+
+    def _replicate_path(self, prefetched):
+        """
+        Replicate the path using the prefetched objects.
+        """
         path = []
         for step in self.path:
             nodes = []
@@ -693,12 +770,7 @@ class CablePath(models.Model):
         Return a tuple containing the sum of the length of each cable in the path
         and a flag indicating whether the length is definitive.
         """
-        cable_ids = self.get_cable_ids()
-        cables = Cable.objects.filter(id__in=cable_ids, _abs_length__isnull=False)
-        total_length = cables.aggregate(total=Sum('_abs_length'))['total']
-        is_definitive = len(cables) == len(cable_ids)
-
-        return total_length, is_definitive
+        return self.total_length, self.is_length_definitive
 
     def get_split_nodes(self):
         """
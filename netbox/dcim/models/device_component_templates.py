@@ -316,10 +316,17 @@ class PowerOutletTemplate(ModularComponentTemplateModel):
                     f"Parent power port ({self.power_port}) must belong to the same module type"
                 )
 
-    def instantiate(self, **kwargs):
+    def instantiate(self, power_ports=None, **kwargs):
+        """
+        Instantiate a new PowerOutlet. If `power_ports` is specified (a dictionary mapping names to PowerPorts), the
+        parent power port will be resolved from it rather than retrieved from the database.
+        """
         if self.power_port:
             power_port_name = self.power_port.resolve_name(kwargs.get('module'))
-            power_port = PowerPort.objects.get(name=power_port_name, **kwargs)
+            if power_ports is not None:
+                power_port = power_ports[power_port_name]
+            else:
+                power_port = PowerPort.objects.get(name=power_port_name, **kwargs)
         else:
             power_port = None
         return self.component_model(
@@ -492,10 +499,17 @@ class FrontPortTemplate(ModularComponentTemplateModel):
         except RearPortTemplate.DoesNotExist:
             pass
 
-    def instantiate(self, **kwargs):
+    def instantiate(self, rear_ports=None, **kwargs):
+        """
+        Instantiate a new FrontPort. If `rear_ports` is specified (a dictionary mapping names to RearPorts), the
+        corresponding rear port will be resolved from it rather than retrieved from the database.
+        """
         if self.rear_port:
             rear_port_name = self.rear_port.resolve_name(kwargs.get('module'))
-            rear_port = RearPort.objects.get(name=rear_port_name, **kwargs)
+            if rear_ports is not None:
+                rear_port = rear_ports[rear_port_name]
+            else:
+                rear_port = RearPort.objects.get(name=rear_port_name, **kwargs)
         else:
             rear_port = None
         return self.component_model(
@@ -679,11 +693,26 @@ class InventoryItemTemplate(MPTTModel, ComponentTemplateModel):
             ),
         )
 
-    def instantiate(self, **kwargs):
-        parent = InventoryItem.objects.get(name=self.parent.name, **kwargs) if self.parent else None
+    def instantiate(self, parents=None, components=None, **kwargs):
+        """
+        Instantiate a new InventoryItem. Optionally, the parent item and assigned component may be resolved from
+        existing instances rather than retrieved from the database:
+
+        :param parents: Dictionary mapping InventoryItemTemplate IDs to their instantiated InventoryItems
+        :param components: Dictionary mapping (model, name) to instantiated components
+        """
+        if not self.parent_id:
+            parent = None
+        elif parents is not None:
+            parent = parents[self.parent_id]
+        else:
+            parent = InventoryItem.objects.get(name=self.parent.name, **kwargs)
         if self.component:
             model = self.component.component_model
-            component = model.objects.get(name=self.component.name, **kwargs)
+            if components is not None:
+                component = components[(model, self.component.name)]
+            else:
+                component = model.objects.get(name=self.component.name, **kwargs)
         else:
             component = None
         return self.component_model(
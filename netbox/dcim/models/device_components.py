@@ -225,33 +225,74 @@ class PathEndpoint(models.Model):
         abstract = True
 
     def trace(self):
-        origin = self
-        path = []
+        return self.trace_endpoints([self])[self.pk]
 
-        # Construct the complete path (including e.g. bridged interfaces)
-        while origin is not None:
-
-            if origin._path is None:
-                break
-
-            path.extend(origin._path.path_objects)
+    @staticmethod
+    def trace_endpoints(endpoints):
+        """
+        Trace the complete paths (including e.g. bridged interfaces) of multiple endpoints of the same type at once.
+        The CablePaths of all endpoints, and the objects within them, are retrieved collectively at each bridging
+        step. Returns a dictionary mapping each endpoint's ID to its path, expressed as a list of three-tuples
+        (A termination(s), cable(s), B termination(s)). The CablePath of each endpoint is cached on the endpoint.
+        """
+        from dcim.models import CablePath
 
-            # If the path ends at a non-connected pass-through port, pad out the link and far-end terminations
-            if len(path) % 3 == 1:
-                path.extend(([], []))
-            # If the path ends at a site or provider network, inject a null "link" to render an attachment
-            elif len(path) % 3 == 2:
-                path.insert(-1, [])
+        paths = {endpoint.pk: [] for endpoint in endpoints}
+        origins = {endpoint.pk: endpoint for endpoint in endpoints}
+        path_field = PathEndpoint._meta.get_field('_path')
 
-            # Check for a bridged relationship to continue the trace
-            destinations = origin._path.destinations
-            if len(destinations) == 1:
-                origin = getattr(destinations[0], 'bridge', None)
-            else:
-                origin = None
+        while origins:
 
-        # Return the path as a list of three-tuples (A termination(s), cable(s), B termination(s))
-        return list(zip(*[iter(path)] * 3))
+            # Retrieve the CablePaths of all current origins which have not already been cached
+            cablepaths = {
+                origin._path_id: origin._path for origin in origins.values() if path_field.is_cached(origin)
+            }
+            missing_ids = {
+                origin._path_id for origin in origins.values() if origin._path_id and origin._path_id not in cablepaths
+            }
+            if missing_ids:
+                cablepaths.update(CablePath.objects.in_bulk(missing_ids))
+            CablePath.prefetch_path_objects([cp for cp in cablepaths.values() if cp is not None])
+
+            # Cache each origin's CablePath so that it can be accessed (e.g. via the path property) without a query
+            for origin in origins.values():
+                if not path_field.is_cached(origin):
+                    path_field.set_cached_value(origin, cablepaths.get(origin._path_id))
+
+            bridges = {}
+            for pk, origin in origins.items():
+                cablepath = cablepaths.get(origin._path_id)
+                if cablepath is None:
+                    continue
+                path = paths[pk]
+                path.extend(cablepath.path_objects)
+
+                # If the path ends at a non-connected pass-through port, pad out the link and far-end terminations
+                if len(path) % 3 == 1:
+                    path.extend(([], []))
+                # If the path ends at a site or provider network, inject a null "link" to render an attachment
+                elif len(path) % 3 == 2:
+                    path.insert(-1, [])
+
+                # Check for a bridged relationship to continue the trace
+                destinations = cablepath.destinations
+                if len(destinations) == 1 and getattr(destinations[0], 'bridge_id', None):
+                    bridges[pk] = destinations[0]
+
+            # Retrieve all bridged interfaces to serve as the origins for the next step
+            origins = {}
+            if bridges:
+                model = type(next(iter(bridges.values())))
+                bridged = model.objects.in_bulk({destination.bridge_id for destination in bridges.values()})
+                origins = {
+                    pk: bridged[destination.bridge_id] for pk, destination in bridges.items()
+                    if destination.bridge_id in bridged
+                }
+
+        # Return each path as a list of three-tuples (A termination(s), cable(s), B termination(s))
+        return {
+            pk: list(zip(*[iter(path)] * 3)) for pk, path in paths.items()
+        }
 
     @property
     def path(self):
@@ -1,16 +1,20 @@
 import decimal
+import time
 import yaml
 
+from collections import defaultdict
 from functools import cached_property
 
 from django.contrib.contenttypes.fields import GenericRelation
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import F, ProtectedError
+from django.db.models import F, Max, ProtectedError
 from django.db.models.functions import Lower
 from django.db.models.signals import post_save
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _
 
@@ -19,9 +23,12 @@ from dcim.constants import *
 from extras.models import ConfigContextModel
 from extras.querysets import ConfigContextModelQuerySet
 from netbox.config import ConfigItem
+from netbox.context import current_request, device_components_queue, module_components_queue
 from netbox.models import OrganizationalModel, PrimaryModel
 from utilities.choices import ColorChoices
+from utilities.exceptions import AbortRequest
 from utilities.fields import ColorField, NaturalOrderingField
+from .device_component_templates import *
 from .device_components import *
 from .mixins import WeightMixin
 
@@ -243,12 +250,9 @@ class DeviceType(PrimaryModel, WeightMixin):
         if self.pk and self.u_height > self._original_u_height:
             for d in Device.objects.filter(device_type=self, position__isnull=False):
                 face_required = None if self.is_full_depth else d.face
-                u_available = d.rack.get_available_units(
-                    u_height=self.u_height,
-                    rack_face=face_required,
-                    exclude=[d.pk]
-                )
-                if d.position not in u_available:
+                if not d.rack.get_occupancy(exclude=[d.pk]).is_available(
+                    d.position, u_height=self.u_height, face=face_required
+                ):
                     raise ValidationError({
                         'u_height': "Device {} in rack {} does not have sufficient space to accommodate a height of "
                                     "{}U".format(d, d.rack, self.u_height)
@@ -468,18 +472,337 @@ class Platform(OrganizationalModel):
         return reverse('dcim:platform', args=[self.pk])
 
 
-def update_interface_bridges(device, interface_templates, module=None):
+# Component template models instantiated for a new Device or Module (in order), and the related fields to retrieve
+# with them
+DEVICE_COMPONENT_TEMPLATES = (
+    (ConsolePortTemplate, ()),
+    (ConsoleServerPortTemplate, ()),
+    (PowerPortTemplate, ()),
+    (PowerOutletTemplate, ('power_port',)),
+    (InterfaceTemplate, ('bridge',)),
+    (RearPortTemplate, ()),
+    (FrontPortTemplate, ('rear_port',)),
+    (ModuleBayTemplate, ()),
+    (DeviceBayTemplate, ()),
+    (InventoryItemTemplate, ('role', 'manufacturer')),
+)
+MODULE_COMPONENT_TEMPLATES = (
+    (ConsolePortTemplate, ()),
+    (ConsoleServerPortTemplate, ()),
+    (PowerPortTemplate, ()),
+    (PowerOutletTemplate, ('power_port',)),
+    (InterfaceTemplate, ('bridge',)),
+    (RearPortTemplate, ()),
+    (FrontPortTemplate, ('rear_port',)),
+)
+
+COMPONENT_TEMPLATES_CACHE_KEY = 'component_templates_{}_{}_{}_{}'
+COMPONENT_TEMPLATES_VERSION_KEY = 'component_templates_version_{}_{}'
+
+# In-process cache of component templates, keyed by their (versioned) shared cache key
+_component_templates_cache = {}
+
+
+def invalidate_component_templates(parent_model, pks):
     """
-    Used for device and module instantiation. Iterates all InterfaceTemplates with a bridge assigned
-    and applies it to the actual interfaces.
+    Invalidate the cached component templates for the specified DeviceTypes or ModuleTypes by assigning each a new
+    version. The in-process caches of other workers are invalidated as they observe the new version.
+
+    :param parent_model: DeviceType or ModuleType
+    :param pks: Iterable of DeviceType or ModuleType IDs
     """
-    for interface_template in interface_templates.exclude(bridge=None):
-        interface = Interface.objects.get(device=device, name=interface_template.resolve_name(module=module))
+    version = time.time_ns()
+    cache.set_many({
+        COMPONENT_TEMPLATES_VERSION_KEY.format(parent_model._meta.model_name, pk): version for pk in pks if pk
+    }, None)
+
 
-        if interface_template.bridge:
-            interface.bridge = Interface.objects.get(device=device, name=interface_template.bridge.resolve_name(module=module))
-            interface.full_clean()
-            interface.save()
+def get_component_templates(parent_types):
+    """
+    Return the component templates assigned to each of the specified DeviceTypes or ModuleTypes, as a dictionary
+    mapping each type's ID to a dictionary of {template model: [templates]}.
+
+    Templates are cached both in-process and in the shared cache under the current version of each type (see
+    invalidate_component_templates()), so instantiating a type whose templates are cached requires no database
+    queries. Templates for any uncached types are retrieved using a single query per template model.
+
+    The cache is invalidated by the post_save and post_delete signals of each template model. Templates must not be
+    modified using QuerySet.update() or bulk_update() (which send no signals) without subsequently calling
+    invalidate_component_templates() for the affected types.
+
+    :param parent_types: Iterable of DeviceType or ModuleType instances (of a single model)
+    """
+    parent_types = {parent_type.pk: parent_type for parent_type in parent_types}
+    if not parent_types:
+        return {}
+    parent_model = next(iter(parent_types.values()))._meta.model
+    model_name = parent_model._meta.model_name
+    if parent_model is ModuleType:
+        parent_field, template_models = 'module_type', MODULE_COMPONENT_TEMPLATES
+    else:
+        parent_field, template_models = 'device_type', DEVICE_COMPONENT_TEMPLATES
+    pks = set(parent_types)
+
+    # Determine the current version of each type, initializing any which are unknown
+    version_keys = {pk: COMPONENT_TEMPLATES_VERSION_KEY.format(model_name, pk) for pk in pks}
+    versions = cache.get_many(version_keys.values())
+    missing_keys = [key for key in version_keys.values() if key not in versions]
+    if missing_keys:
+        version = time.time_ns()
+        for key in missing_keys:
+            cache.add(key, version, None)
+        versions.update(cache.get_many(missing_keys))
+
+    # The creation time of each type is included in its cache key to guard against the reuse of IDs (e.g. following
+    # the restoration of a database)
+    cache_keys = {
+        pk: COMPONENT_TEMPLATES_CACHE_KEY.format(
+            model_name,
+            pk,
+            parent_types[pk].created.timestamp() if parent_types[pk].created else None,
+            versions.get(version_keys[pk])
+        ) for pk in pks
+    }
+
+    # Retrieve templates from the in-process cache, then from the shared cache
+    templates = {
+        pk: _component_templates_cache[cache_key]
+        for pk, cache_key in cache_keys.items() if cache_key in _component_templates_cache
+    }
+    shared_keys = [cache_keys[pk] for pk in pks if pk not in templates]
+    if shared_keys:
+        cached = cache.get_many(shared_keys)
+        for pk in pks:
+            if pk not in templates and cache_keys[pk] in cached:
+                templates[pk] = _component_templates_cache[cache_keys[pk]] = cached[cache_keys[pk]]
+
+    # Retrieve any remaining templates from the database
+    uncached_pks = pks - set(templates)
+    if uncached_pks:
+        retrieved = {
+            pk: {template_model: [] for template_model, related_fields in template_models} for pk in uncached_pks
+        }
+        for template_model, related_fields in template_models:
+            queryset = template_model.objects.filter(**{f'{parent_field}__in': uncached_pks})
+            queryset = queryset.select_related(*related_fields)
+            if template_model is InventoryItemTemplate:
+                queryset = queryset.prefetch_related('component')
+            for template in queryset:
+                retrieved[getattr(template, f'{parent_field}_id')][template_model].append(template)
+        cache.set_many(
+            {cache_keys[pk]: pk_templates for pk, pk_templates in retrieved.items()},
+            COMPONENT_TEMPLATES_CACHE_TIMEOUT
+        )
+        if len(_component_templates_cache) >= COMPONENT_TEMPLATES_CACHE_MAX_SIZE:
+            _component_templates_cache.clear()
+        for pk, pk_templates in retrieved.items():
+            templates[pk] = _component_templates_cache[cache_keys[pk]] = pk_templates
+
+    return templates
+
+
+def instantiate_device_components(devices):
+    """
+    Instantiate all components for the specified (newly created) Devices per their DeviceTypes. Templates are
+    retrieved only once for all devices, and components are created using a single bulk_create() per component model.
+    The post_save signal is sent for each new component once all components have been created.
+    """
+    if not devices:
+        return
+    templates = get_component_templates(device.device_type for device in devices)
+
+    # Record instantiated components by (device ID, model) and name for resolving related components
+    instantiated = defaultdict(dict)
+    created = []
+
+    for template_model, related_fields in DEVICE_COMPONENT_TEMPLATES:
+        if template_model is InventoryItemTemplate:
+            continue
+        component_model = template_model.component_model
+        components = []
+        for device in devices:
+            for template in templates[device.device_type_id][template_model]:
+                if template_model is PowerOutletTemplate:
+                    component = template.instantiate(device=device, power_ports=instantiated[(device.pk, PowerPort)])
+                elif template_model is FrontPortTemplate:
+                    component = template.instantiate(device=device, rear_ports=instantiated[(device.pk, RearPort)])
+                else:
+                    component = template.instantiate(device=device)
+                instantiated[(device.pk, component_model)][component.name] = component
+                components.append(component)
+        component_model.objects.bulk_create(components)
+        created.append((component_model, components))
+
+    # Interface bridges have to be set after interface instantiation
+    bridged_interfaces = []
+    for device in devices:
+        interfaces = instantiated[(device.pk, Interface)]
+        for template in templates[device.device_type_id][InterfaceTemplate]:
+            if template.bridge:
+                interface = interfaces[template.name]
+                interface.bridge = interfaces[template.bridge.name]
+                bridged_interfaces.append(interface)
+    Interface.objects.bulk_update(bridged_interfaces, ['bridge'])
+
+    # Inventory items are created one tree level at a time, as each item must reference its (saved) parent. MPTT
+    # attributes are copied from the templates, as each device's inventory mirrors the shape of its template trees.
+    inventory_items = defaultdict(list)
+    next_tree_id = None
+    for device in devices:
+        device_templates = templates[device.device_type_id][InventoryItemTemplate]
+        if not device_templates:
+            continue
+        if next_tree_id is None:
+            next_tree_id = (InventoryItem.objects.aggregate(Max('tree_id'))['tree_id__max'] or 0) + 1
+        components = {
+            (model, name): component
+            for (device_id, model), named_components in instantiated.items() if device_id == device.pk
+            for name, component in named_components.items()
+        }
+        parents = {}
+        tree_ids = {}
+        for template in device_templates:
+            item = template.instantiate(device=device, parents=parents, components=components)
+            if template.tree_id not in tree_ids:
+                tree_ids[template.tree_id] = next_tree_id
+                next_tree_id += 1
+            item.tree_id = tree_ids[template.tree_id]
+            item.lft = template.lft
+            item.rght = template.rght
+            item.level = template.level
+            parents[template.pk] = item
+            inventory_items[item.level].append(item)
+    for level in sorted(inventory_items):
+        InventoryItem.objects.bulk_create(inventory_items[level])
+    created.append((InventoryItem, [item for level in sorted(inventory_items) for item in inventory_items[level]]))
+
+    # Manually send the post_save signal for each of the newly created components
+    for component_model, components in created:
+        for component in components:
+            post_save.send(
+                sender=component_model,
+                instance=component,
+                created=True,
+                raw=False,
+                using='default',
+                update_fields=None
+            )
+
+
+def instantiate_module_components(modules):
+    """
+    Instantiate (or adopt) all components for the specified (newly created) Modules per their ModuleTypes. Templates
+    are retrieved only once for all modules. For each component model, existing components eligible for adoption are
+    retrieved using a single query, and components are created and adopted using a single bulk_create() and
+    bulk_update() respectively. The post_save signal is sent for each affected component once all modules have been
+    processed.
+
+    Raises AbortRequest if two of the modules would claim a component of the same name on a device.
+    """
+    modules = [
+        module for module in modules
+        if getattr(module, '_adopt_components', False) or not getattr(module, '_disable_replication', False)
+    ]
+    if not modules:
+        return
+    templates = get_component_templates(module.module_type for module in modules)
+    device_ids = {module.device_id for module in modules}
+    adopting = any(getattr(module, '_adopt_components', False) for module in modules)
+
+    # Record the components of each module by (module ID, model) and name for resolving related components
+    module_components = defaultdict(dict)
+    created = []
+    adopted = []
+
+    for template_model, related_fields in MODULE_COMPONENT_TEMPLATES:
+        component_model = template_model.component_model
+        create_instances = []
+        update_instances = []
+
+        # Record the names of the components claimed by all modules on each device. Each module has already been
+        # validated against the existing components of its device, but not against the other modules created with it.
+        claimed_names = set()
+
+        # Retrieve all unassigned components which might be adopted by any of the modules
+        installed_components = {}
+        if adopting:
+            installed_components = {
+                (component.device_id, component.name): component
+                for component in component_model.objects.filter(device__in=device_ids, module__isnull=True)
+            }
+
+        for module in modules:
+            components = module_components[(module.pk, component_model)]
+            for template in templates[module.module_type_id][template_model]:
+                name = template.resolve_name(module)
+                if (module.device_id, name) in claimed_names:
+                    raise AbortRequest(f"{component_model.__name__} - {name} already exists")
+                claimed_names.add((module.device_id, name))
+
+                # Adopt an existing component with the same name, if any
+                if getattr(module, '_adopt_components', False):
+                    existing_item = installed_components.pop((module.device_id, name), None)
+                    if existing_item:
+                        existing_item.module = module
+                        components[name] = existing_item
+                        update_instances.append(existing_item)
+                        continue
+
+                # Only create new components if replication is enabled
+                if getattr(module, '_disable_replication', False):
+                    continue
+                if template_model is PowerOutletTemplate:
+                    component = template.instantiate(
+                        device=module.device, module=module, power_ports=module_components[(module.pk, PowerPort)]
+                    )
+                elif template_model is FrontPortTemplate:
+                    component = template.instantiate(
+                        device=module.device, module=module, rear_ports=module_components[(module.pk, RearPort)]
+                    )
+                else:
+                    component = template.instantiate(device=module.device, module=module)
+                components[name] = component
+                create_instances.append(component)
+
+        component_model.objects.bulk_create(create_instances)
+        component_model.objects.bulk_update(update_instances, ['module'])
+        created.append((component_model, create_instances))
+        adopted.append((component_model, update_instances))
+
+    # Interface bridges have to be set after interface instantiation
+    bridged_interfaces = []
+    for module in modules:
+        interfaces = module_components[(module.pk, Interface)]
+        for template in templates[module.module_type_id][InterfaceTemplate]:
+            interface = interfaces.get(template.resolve_name(module))
+            if template.bridge and interface is not None:
+                bridge = interfaces.get(template.bridge.resolve_name(module))
+                if bridge is not None:
+                    interface.bridge = bridge
+                    bridged_interfaces.append(interface)
+    Interface.objects.bulk_update(bridged_interfaces, ['bridge'])
+
+    # Manually send the post_save signal for each of the new and adopted components
+    for component_model, components in created:
+        for component in components:
+            post_save.send(
+                sender=component_model,
+                instance=component,
+                created=True,
+                raw=False,
+                using='default',
+                update_fields=None
+            )
+    for component_model, components in adopted:
+        for component in components:
+            post_save.send(
+                sender=component_model,
+                instance=component,
+                created=False,
+                raw=False,
+                using='default',
+                update_fields=['module']
+            )
 
 
 class Device(PrimaryModel, ConfigContextModel):
@@ -681,6 +1004,12 @@ class Device(PrimaryModel, ConfigContextModel):
             ),
         )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Cache the original rack assignment so that the utilization of both racks can be updated if it changes
+        self._orig_rack_id = self.__dict__.get('rack_id')
+
     def __str__(self):
         if self.name and self.asset_tag:
             return f'{self.name} ({self.asset_tag})'
@@ -761,10 +1090,9 @@ class Device(PrimaryModel, ConfigContextModel):
                 # Validate rack space
                 rack_face = self.face if not self.device_type.is_full_depth else None
                 exclude_list = [self.pk] if self.pk else []
-                available_units = self.rack.get_available_units(
-                    u_height=self.device_type.u_height, rack_face=rack_face, exclude=exclude_list
-                )
-                if self.position and self.position not in available_units:
+                if self.position and not self.rack.get_occupancy(exclude=exclude_list).is_available(
+                    self.position, u_height=self.device_type.u_height, face=rack_face
+                ):
                     raise ValidationError({
                         'position': f"U{self.position} is already occupied or does not have sufficient space to "
                                     f"accommodate this device type: {self.device_type} ({self.device_type.u_height}U)"
@@ -822,35 +1150,6 @@ class Device(PrimaryModel, ConfigContextModel):
                 'vc_position': "A device assigned to a virtual chassis must have its position defined."
             })
 
-    def _instantiate_components(self, queryset, bulk_create=True):
-        """
-        Instantiate components for the device from the specified component templates.
-
-        Args:
-            bulk_create: If True, bulk_create() will be called to create all components in a single query
-                         (default). Otherwise, save() will be called on each instance individually.
-        """
-        if bulk_create:
-            components = [obj.instantiate(device=self) for obj in queryset]
-            if not components:
-                return
-            model = components[0]._meta.model
-            model.objects.bulk_create(components)
-            # Manually send the post_save signal for each of the newly created components
-            for component in components:
-                post_save.send(
-                    sender=model,
-                    instance=component,
-                    created=True,
-                    raw=False,
-                    using='default',
-                    update_fields=None
-                )
-        else:
-            for obj in queryset:
-                component = obj.instantiate(device=self)
-                component.save()
-
     def save(self, *args, **kwargs):
         is_new = not bool(self.pk)
 
@@ -868,29 +1167,79 @@ class Device(PrimaryModel, ConfigContextModel):
 
         super().save(*args, **kwargs)
 
-        # If this is a new Device, instantiate all the related components per the DeviceType definition
+        # If this is a new Device, instantiate all the related components per the DeviceType definition. During bulk
+        # creation, this is deferred so that the components of all new devices are created together. (Devices with
+        # device bays are excluded, as subsequent devices may need to be installed within them.)
         if is_new:
-            self._instantiate_components(self.device_type.consoleporttemplates.all())
-            self._instantiate_components(self.device_type.consoleserverporttemplates.all())
-            self._instantiate_components(self.device_type.powerporttemplates.all())
-            self._instantiate_components(self.device_type.poweroutlettemplates.all())
-            self._instantiate_components(self.device_type.interfacetemplates.all())
-            self._instantiate_components(self.device_type.rearporttemplates.all())
-            self._instantiate_components(self.device_type.frontporttemplates.all())
-            self._instantiate_components(self.device_type.modulebaytemplates.all())
-            self._instantiate_components(self.device_type.devicebaytemplates.all())
-            # Disable bulk_create to accommodate MPTT
-            self._instantiate_components(self.device_type.inventoryitemtemplates.all(), bulk_create=False)
-            # Interface bridges have to be set after interface instantiation
-            update_interface_bridges(self, self.device_type.interfacetemplates.all())
+            queue = device_components_queue.get()
+            if queue is not None and not self._has_device_bay_templates():
+                queue.append(self)
+            else:
+                instantiate_device_components([self])
 
         # Update Site and Rack assignment for any child Devices
-        devices = Device.objects.filter(parent_bay__device=self)
+        if not is_new:
+            self._update_child_devices()
+
+    def _has_device_bay_templates(self):
+        """
+        Return True if the DeviceType defines any device bays. The (cached) templates are consulted in addition to the
+        subdevice role, as the role alone does not guarantee that no device bay templates exist.
+        """
+        if self.device_type.is_parent_device:
+            return True
+        return bool(get_component_templates([self.device_type])[self.device_type_id][DeviceBayTemplate])
+
+    def _update_child_devices(self):
+        """
+        Propagate the Site, Location, and Rack assignment of this Device to all of its descendants (the Devices
+        installed within its device bays, and any installed within theirs). Descendants are identified one tier at a
+        time, and all devices requiring modification are updated using a single query. The post_save signal is then
+        sent for each updated device, so that a single change is recorded for each.
+        """
+        descendant_ids = []
+        parent_ids = [self.pk]
+        while parent_ids:
+            parent_ids = list(
+                Device.objects.filter(parent_bay__device__in=parent_ids).values_list('pk', flat=True)
+            )
+            descendant_ids.extend(parent_ids)
+        if not descendant_ids:
+            return
+
+        devices = list(Device.objects.filter(pk__in=descendant_ids).exclude(
+            site=self.site_id,
+            location=self.location_id,
+            rack=self.rack_id
+        ))
+        if not devices:
+            return
+
+        now = timezone.now()
         for device in devices:
+            if current_request.get() is not None:
+                device.snapshot()
             device.site = self.site
-            device.rack = self.rack
             device.location = self.location
-            device.save()
+            device.rack = self.rack
+            device.last_updated = now
+        Device.objects.filter(pk__in=[device.pk for device in devices]).update(
+            site=self.site,
+            location=self.location,
+            rack=self.rack,
+            last_updated=now
+        )
+
+        update_fields = ['site', 'location', 'rack', 'last_updated']
+        for device in devices:
+            post_save.send(
+                sender=Device,
+                instance=device,
+                created=False,
+                raw=False,
+                using='default',
+                update_fields=update_fields
+            )
 
     @property
     def identifier(self):
@@ -1049,78 +1398,16 @@ class Module(PrimaryModel, ConfigContextModel):
 
         super().save(*args, **kwargs)
 
-        adopt_components = getattr(self, '_adopt_components', False)
-        disable_replication = getattr(self, '_disable_replication', False)
-
-        # We skip adding components if the module is being edited or
-        # both replication and component adoption is disabled
-        if not is_new or (disable_replication and not adopt_components):
+        # Components are only instantiated for new modules
+        if not is_new:
             return
 
-        # Iterate all component types
-        for templates, component_attribute, component_model in [
-            ("consoleporttemplates", "consoleports", ConsolePort),
-            ("consoleserverporttemplates", "consoleserverports", ConsoleServerPort),
-            ("interfacetemplates", "interfaces", Interface),
-            ("powerporttemplates", "powerports", PowerPort),
-            ("poweroutlettemplates", "poweroutlets", PowerOutlet),
-            ("rearporttemplates", "rearports", RearPort),
-            ("frontporttemplates", "frontports", FrontPort)
-        ]:
-            create_instances = []
-            update_instances = []
-
-            # Prefetch installed components
-            installed_components = {
-                component.name: component
-                for component in getattr(self.device, component_attribute).filter(module__isnull=True)
-            }
-
-            # Get the template for the module type.
-            for template in getattr(self.module_type, templates).all():
-                template_instance = template.instantiate(device=self.device, module=self)
-
-                if adopt_components:
-                    existing_item = installed_components.get(template_instance.name)
-
-                    # Check if there's a component with the same name already
-                    if existing_item:
-                        # Assign it to the module
-                        existing_item.module = self
-                        update_instances.append(existing_item)
-                        continue
-
-                # Only create new components if replication is enabled
-                if not disable_replication:
-                    create_instances.append(template_instance)
-
-            component_model.objects.bulk_create(create_instances)
-            # Emit the post_save signal for each newly created object
-            for component in create_instances:
-                post_save.send(
-                    sender=component_model,
-                    instance=component,
-                    created=True,
-                    raw=False,
-                    using='default',
-                    update_fields=None
-                )
-
-            update_fields = ['module']
-            component_model.objects.bulk_update(update_instances, update_fields)
-            # Emit the post_save signal for each updated object
-            for component in update_instances:
-                post_save.send(
-                    sender=component_model,
-                    instance=component,
-                    created=False,
-                    raw=False,
-                    using='default',
-                    update_fields=update_fields
-                )
-
-        # Interface bridges have to be set after interface instantiation
-        update_interface_bridges(self.device, self.module_type.interfacetemplates, self)
+        # Defer the instantiation of components if the module is being created in bulk
+        queue = module_components_queue.get()
+        if queue is not None:
+            queue.append(self)
+        else:
+            instantiate_module_components([self])
 
 
 #
@@ -149,6 +149,12 @@ class PowerFeed(PrimaryModel, PathEndpoint, CabledObjectModel):
             ),
         )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Cache the original rack assignment so that the utilization of both racks can be updated if it changes
+        self._orig_rack_id = self.__dict__.get('rack_id')
+
     def __str__(self):
         return self.name
 
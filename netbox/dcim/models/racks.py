@@ -13,6 +13,7 @@ from django.utils.translation import gettext as _
 
 from dcim.choices import *
 from dcim.constants import *
+from dcim.occupancy import RackOccupancy, get_rack_occupancies
 from dcim.svg import RackElevationSVG
 from netbox.models import OrganizationalModel, PrimaryModel
 from utilities.choices import ColorChoices
@@ -167,6 +168,17 @@ class Rack(PrimaryModel, WeightMixin):
               'distance between the front and rear rails.')
         )
     )
+    # Stores the space & power utilization (as percentages) for display and database ordering; maintained by signals
+    _utilization = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0
+    )
+    _power_utilization = models.DecimalField(
+        max_digits=8,
+        decimal_places=1,
+        default=0
+    )
 
     # Generic relations
     vlan_groups = GenericRelation(
@@ -275,7 +287,8 @@ class Rack(PrimaryModel, WeightMixin):
     def get_status_color(self):
         return RackStatusChoices.colors.get(self.status)
 
-    def get_rack_units(self, user=None, face=DeviceFaceChoices.FACE_FRONT, exclude=None, expand_devices=True):
+    def get_rack_units(self, user=None, face=DeviceFaceChoices.FACE_FRONT, exclude=None, expand_devices=True,
+                       devices=None):
         """
         Return a list of rack units as dictionaries. Example: {'device': None, 'face': 0, 'id': 48, 'name': 'U48'}
         Each key 'device' is either a Device or None. By default, multi-U devices are repeated for each U they occupy.
@@ -287,6 +300,8 @@ class Rack(PrimaryModel, WeightMixin):
         :param expand_devices: When True, all units that a device occupies will be listed with each containing a
             reference to the device. When False, only the bottom most unit for a device is included and that unit
             contains a height attribute for the device
+        :param devices: Iterable of the devices installed within the rack (optional). If not specified, devices will be
+            retrieved from the database.
         """
         elevation = {}
         for u in self.units:
@@ -303,21 +318,27 @@ class Rack(PrimaryModel, WeightMixin):
         if self.pk:
 
             # Retrieve all devices installed within the rack
-            devices = Device.objects.prefetch_related(
-                'device_type',
-                'device_type__manufacturer',
-                'device_role'
-            ).annotate(
-                devicebay_count=Count('devicebays')
-            ).exclude(
-                pk=exclude
-            ).filter(
-                rack=self,
-                position__gt=0,
-                device_type__u_height__gt=0
-            ).filter(
-                Q(face=face) | Q(device_type__is_full_depth=True)
-            )
+            if devices is None:
+                devices = Device.objects.prefetch_related(
+                    'device_type',
+                    'device_type__manufacturer',
+                    'device_role'
+                ).annotate(
+                    devicebay_count=Count('devicebays')
+                ).exclude(
+                    pk=exclude
+                ).filter(
+                    rack=self,
+                    position__gt=0,
+                    device_type__u_height__gt=0
+                ).filter(
+                    Q(face=face) | Q(device_type__is_full_depth=True)
+                )
+            else:
+                devices = [
+                    device for device in devices
+                    if device.pk != exclude and (device.face == face or device.device_type.is_full_depth)
+                ]
 
             # Determine which devices the user has permission to view
             permitted_device_ids = []
@@ -338,6 +359,21 @@ class Rack(PrimaryModel, WeightMixin):
 
         return [u for u in elevation.values()]
 
+    def get_occupancy(self, exclude=None):
+        """
+        Return a RackOccupancy representing the space consumed by all devices installed within the rack.
+
+        :param exclude: List of devices IDs to exclude (useful when moving a device within a rack)
+        """
+        devices = self.devices.filter(position__gte=1)
+        if exclude is not None:
+            devices = devices.exclude(pk__in=exclude)
+
+        return RackOccupancy.from_devices(
+            self.u_height,
+            devices.values_list('position', 'face', 'device_type__u_height', 'device_type__is_full_depth')
+        )
+
     def get_available_units(self, u_height=1, rack_face=None, exclude=None):
         """
         Return a list of units within the rack available to accommodate a device of a given U height (default 1).
@@ -348,31 +384,37 @@ class Rack(PrimaryModel, WeightMixin):
         :param rack_face: The face of the rack (front or rear) required; 'None' if device is full depth
         :param exclude: List of devices IDs to exclude (useful when moving a device within a rack)
         """
-        # Gather all devices which consume U space within the rack
-        devices = self.devices.prefetch_related('device_type').filter(position__gte=1)
-        if exclude is not None:
-            devices = devices.exclude(pk__in=exclude)
+        available_units = self.get_occupancy(exclude=exclude).get_available_units(u_height=u_height, face=rack_face)
 
-        # Initialize the rack unit skeleton
-        units = list(self.units)
+        # Order available units to match the numbering of the rack
+        if self.desc_units:
+            available_units.reverse()
 
-        # Remove units consumed by installed devices
-        for d in devices:
-            if rack_face is None or d.face == rack_face or d.device_type.is_full_depth:
-                for u in drange(d.position, d.position + d.device_type.u_height, 0.5):
-                    try:
-                        units.remove(u)
-                    except ValueError:
-                        # Found overlapping devices in the rack!
-                        pass
+        return available_units
 
-        # Remove units without enough space above them to accommodate a device of the specified height
-        available_units = []
-        for u in units:
-            if set(drange(u, u + decimal.Decimal(u_height), 0.5)).issubset(units):
-                available_units.append(u)
+    @classmethod
+    def get_bulk_available_units(cls, racks, u_height=1, rack_face=None, exclude=None):
+        """
+        Return a dictionary mapping each of the given racks to the list of its units available to accommodate a device
+        of a given U height, as returned by get_available_units(). Installed devices for all racks are retrieved using a
+        single query.
 
-        return list(reversed(available_units))
+        :param racks: Iterable of Rack instances
+        :param u_height: Minimum number of contiguous free units required
+        :param rack_face: The face of the rack (front or rear) required; 'None' if device is full depth
+        :param exclude: List of devices IDs to exclude
+        """
+        racks = list(racks)
+        occupancies = get_rack_occupancies(racks, exclude=exclude)
+
+        available_units = {}
+        for rack in racks:
+            units = occupancies[rack.pk].get_available_units(u_height=u_height, face=rack_face)
+            if rack.desc_units:
+                units.reverse()
+            available_units[rack] = units
+
+        return available_units
 
     def get_reserved_units(self):
         """
@@ -432,20 +474,10 @@ class Rack(PrimaryModel, WeightMixin):
         Determine the utilization rate of the rack and return it as a percentage. Occupied and reserved units both count
         as utilized.
         """
-        # Determine unoccupied units
-        total_units = len(list(self.units))
-        available_units = self.get_available_units(u_height=0.5)
-
-        # Remove reserved units
-        for ru in self.get_reserved_units():
-            for u in drange(ru, ru + 1, 0.5):
-                if u in available_units:
-                    available_units.remove(u)
-
-        occupied_unit_count = total_units - len(available_units)
-        percentage = float(occupied_unit_count) / total_units * 100
+        occupancy = self.get_occupancy()
+        occupancy.reserve(self.get_reserved_units())
 
-        return percentage
+        return occupancy.get_utilization()
 
     def get_power_utilization(self):
         """
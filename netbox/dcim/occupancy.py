@@ -0,0 +1,159 @@
+import decimal
+
+__all__ = (
+    'RackOccupancy',
+    'get_rack_occupancies',
+)
+
+
+class RackOccupancy:
+    """
+    A compact representation of the space consumed within a Rack. Occupancy is recorded as a bitmap of half-unit slots
+    for each rack face, where bit 0 represents the lower half of U1, bit 1 the upper half of U1, and so on. Full-depth
+    devices and reservations are tracked in bitmaps of their own, as they consume space on both faces.
+
+    Because each bitmap is a plain integer, the free space within a rack (or across a set of racks) can be computed
+    without querying the database once the occupying devices have been recorded.
+    """
+    def __init__(self, u_height):
+        self.u_height = u_height
+        self.slot_count = int(u_height * 2)
+        self.faces = {}
+        self.full_depth = 0
+        self.reserved = 0
+
+    @classmethod
+    def from_devices(cls, u_height, devices):
+        """
+        Create a new RackOccupancy for a rack of the given height from an iterable of devices, each expressed as a
+        tuple of (position, face, u_height, is_full_depth).
+        """
+        occupancy = cls(u_height)
+        for position, face, device_u_height, is_full_depth in devices:
+            occupancy.occupy(position, device_u_height, face=face, is_full_depth=is_full_depth)
+        return occupancy
+
+    @property
+    def _full_mask(self):
+        return (1 << self.slot_count) - 1
+
+    @staticmethod
+    def _slots(position, u_height):
+        """
+        Return a bitmap of the slots covered by an object of the given height installed at the given position.
+        """
+        start = int((decimal.Decimal(position) - 1) * 2)
+        count = int(decimal.Decimal(u_height) * 2)
+        if start < 0 or count <= 0:
+            return 0
+        return ((1 << count) - 1) << start
+
+    @staticmethod
+    def _slot_to_unit(slot):
+        return decimal.Decimal(1) + decimal.Decimal(0.5) * slot
+
+    def occupy(self, position, u_height, face='', is_full_depth=False):
+        """
+        Mark the space consumed by a device of the given height at the given position as occupied.
+        """
+        slots = self._slots(position, u_height) & self._full_mask
+        if is_full_depth:
+            self.full_depth |= slots
+        else:
+            self.faces[face] = self.faces.get(face, 0) | slots
+
+    def reserve(self, units):
+        """
+        Mark each of the given (whole) units as reserved.
+        """
+        for u in units:
+            self.reserved |= self._slots(u, 1) & self._full_mask
+
+    def get_mask(self, face=None, include_reserved=False):
+        """
+        Return a bitmap of all occupied slots on the given face, or on any face if None.
+        """
+        if face is None:
+            mask = self.full_depth
+            for face_mask in self.faces.values():
+                mask |= face_mask
+        else:
+            mask = self.full_depth | self.faces.get(face, 0)
+        if include_reserved:
+            mask |= self.reserved
+        return mask
+
+    def get_available_slots(self, u_height=1, face=None):
+        """
+        Return a bitmap of the slots at which an object of the given height can be installed on the given face, or on
+        both faces (i.e. full depth) if None.
+        """
+        available = free = ~self.get_mask(face) & self._full_mask
+        for i in range(1, int(decimal.Decimal(u_height) * 2)):
+            available &= free >> i
+        return available
+
+    def get_available_units(self, u_height=1, face=None):
+        """
+        Return the list of positions (in ascending order) at which an object of the given height can be installed on
+        the given face, or on both faces (i.e. full depth) if None.
+        """
+        available = self.get_available_slots(u_height, face)
+        units = []
+        slot = 0
+        while available:
+            if available & 1:
+                units.append(self._slot_to_unit(slot))
+            available >>= 1
+            slot += 1
+        return units
+
+    def is_available(self, position, u_height=1, face=None):
+        """
+        Return True if an object of the given height can be installed at the given position on the given face, or on
+        both faces (i.e. full depth) if None. This is equivalent to testing for the position's inclusion in the list
+        returned by get_available_units().
+        """
+        if decimal.Decimal(position) % decimal.Decimal(0.5):
+            return False
+        slots = self._slots(position, u_height)
+        if not slots or slots & ~self._full_mask:
+            return False
+        return not slots & self.get_mask(face)
+
+    def get_occupied_slot_count(self, face=None, include_reserved=False):
+        return bin(self.get_mask(face, include_reserved=include_reserved) & self._full_mask).count('1')
+
+    def get_utilization(self):
+        """
+        Return the percentage of the rack's space consumed by devices or reservations on either face.
+        """
+        if not self.slot_count:
+            return 0
+        return float(self.get_occupied_slot_count(include_reserved=True)) / self.slot_count * 100
+
+
+def get_rack_occupancies(racks, exclude=None):
+    """
+    Return a dictionary mapping the ID of each of the given racks to its RackOccupancy. Installed devices for all racks
+    are retrieved using a single query.
+
+    :param racks: Iterable of Rack instances
+    :param exclude: List of devices IDs to exclude
+    """
+    from dcim.models import Device
+
+    occupancies = {rack.pk: RackOccupancy(rack.u_height) for rack in racks}
+    if not occupancies:
+        return occupancies
+
+    devices = Device.objects.filter(rack__in=list(occupancies), position__gte=1)
+    if exclude is not None:
+        devices = devices.exclude(pk__in=exclude)
+    devices = devices.values_list(
+        'rack_id', 'position', 'face', 'device_type__u_height', 'device_type__is_full_depth'
+    )
+    for rack_id, position, face, u_height, is_full_depth in devices:
+        occupancies[rack_id].occupy(position, u_height, face=face, is_full_depth=is_full_depth)
+
+    return occupancies
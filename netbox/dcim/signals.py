@@ -1,14 +1,24 @@
 import logging
 
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 
 from .choices import CableEndChoices, LinkStatusChoices
 from .models import (
-    Cable, CablePath, CableTermination, Device, FrontPort, PathEndpoint, PowerPanel, Rack, Location, VirtualChassis,
+    Cable, CablePath, CableTermination, ConsolePortTemplate, ConsoleServerPortTemplate, Device, DeviceBay,
+    DeviceBayTemplate, DeviceRole, DeviceType, FrontPort, FrontPortTemplate, InterfaceTemplate, InventoryItemTemplate,
+    Manufacturer, ModuleBayTemplate, ModuleType, PathEndpoint, PowerFeed, PowerOutlet, PowerOutletTemplate, PowerPanel,
+    PowerPort, PowerPortTemplate, Rack, RackReservation, RearPortTemplate, Location, Site, VirtualChassis,
 )
 from .models.cables import trace_paths
-from .utils import create_cablepath, rebuild_paths
+from .models.devices import invalidate_component_templates
+from .svg import CableTraceSVG, RackElevationSVG
+from .utils import (
+    compile_path_node, enqueue_cablepath, enqueue_rack_utilization, enqueue_retrace, get_power_feed_rack_ids,
+    object_to_path_node,
+)
 
 
 #
@@ -39,6 +49,212 @@ def handle_rack_site_change(instance, created, **kwargs):
         Device.objects.filter(rack=instance).update(site=instance.site, location=instance.location)
 
 
+#
+# Rack utilization
+#
+# The space and power utilization stored on each Rack is recalculated once the current transaction has been committed
+# for any rack affected by a change (see dcim.utils.enqueue_rack_utilization()).
+#
+
+@receiver(post_save, sender=Rack)
+def update_rack_utilization(instance, raw=False, **kwargs):
+    """
+    Update the utilization of a Rack when it is saved (e.g. its height has changed).
+    """
+    if not raw:
+        enqueue_rack_utilization([instance.pk])
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+@receiver(post_save, sender=PowerFeed)
+@receiver(post_delete, sender=PowerFeed)
+def update_assigned_rack_utilization(instance, raw=False, **kwargs):
+    """
+    Update the utilization of the Rack to which a Device or PowerFeed is (or was) assigned.
+    """
+    if not raw:
+        enqueue_rack_utilization([instance.rack_id, instance._orig_rack_id])
+
+
+@receiver(post_save, sender=RackReservation)
+@receiver(post_delete, sender=RackReservation)
+def update_reserved_rack_utilization(instance, raw=False, **kwargs):
+    """
+    Update the utilization of a Rack when a reservation is created, modified, or deleted.
+    """
+    if not raw:
+        enqueue_rack_utilization([instance.rack_id])
+
+
+@receiver(post_save, sender=DeviceType)
+def update_device_type_rack_utilization(instance, created, raw=False, **kwargs):
+    """
+    Update the utilization of all Racks containing instances of a DeviceType whose height has changed.
+    """
+    if not created and not raw and instance.u_height != instance._original_u_height:
+        enqueue_rack_utilization(
+            Device.objects.filter(device_type=instance, rack__isnull=False).values_list('rack_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=PowerPort)
+@receiver(post_delete, sender=PowerPort)
+def update_powerport_rack_utilization(instance, raw=False, **kwargs):
+    """
+    Update the power utilization of any Racks supplied (directly or via a PowerOutlet) by a PowerPort's cable.
+    """
+    if not raw:
+        enqueue_rack_utilization(get_power_feed_rack_ids([instance.cable_id]))
+
+
+@receiver(post_save, sender=PowerOutlet)
+@receiver(post_delete, sender=PowerOutlet)
+def update_poweroutlet_rack_utilization(instance, raw=False, **kwargs):
+    """
+    Update the power utilization of any Racks supplying the parent PowerPort of a PowerOutlet.
+    """
+    if not raw and instance.power_port_id:
+        cable_ids = PowerPort.objects.filter(pk=instance.power_port_id).values_list('cable_id', flat=True)
+        enqueue_rack_utilization(get_power_feed_rack_ids(cable_ids))
+
+
+@receiver(post_save, sender=CableTermination)
+@receiver(post_delete, sender=CableTermination)
+def update_cabled_rack_utilization(instance, raw=False, **kwargs):
+    """
+    Update the power utilization of any Racks affected by the connection or disconnection of a PowerFeed, PowerPort,
+    or PowerOutlet.
+    """
+    if raw:
+        return
+    model = instance.termination_type.model_class()
+    if model is PowerFeed:
+        rack_ids = PowerFeed.objects.filter(pk=instance.termination_id).values_list('rack_id', flat=True)
+    elif model is PowerPort:
+        rack_ids = get_power_feed_rack_ids([instance.cable_id])
+    elif model is PowerOutlet:
+        cable_ids = PowerPort.objects.filter(poweroutlets=instance.termination_id).values_list('cable_id', flat=True)
+        rack_ids = get_power_feed_rack_ids(cable_ids)
+    else:
+        return
+    enqueue_rack_utilization(rack_ids)
+
+
+#
+# Rack elevations
+#
+# Cached rack elevation SVGs are invalidated once the current transaction has been committed, either for the affected
+# racks or (for changes to objects shared among many racks) for all racks.
+#
+
+@receiver(post_save, sender=Rack)
+@receiver(post_save, sender=RackReservation)
+@receiver(post_delete, sender=RackReservation)
+def invalidate_rack_elevation(instance, **kwargs):
+    """
+    Invalidate the cached elevations of a Rack when it or one of its reservations is modified.
+    """
+    rack_id = instance.pk if isinstance(instance, Rack) else instance.rack_id
+    transaction.on_commit(lambda: RackElevationSVG.invalidate_cache([rack_id]))
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device_rack_elevation(instance, **kwargs):
+    """
+    Invalidate the cached elevations of the Rack to which a Device is (or was) assigned.
+    """
+    rack_ids = [instance.rack_id, instance._orig_rack_id]
+    transaction.on_commit(lambda: RackElevationSVG.invalidate_cache(rack_ids))
+
+
+@receiver(post_save, sender=DeviceBay)
+def invalidate_devicebay_rack_elevation(instance, **kwargs):
+    """
+    Invalidate the cached elevations of a parent Device's Rack when a child device is installed or removed.
+    """
+    rack_ids = list(Device.objects.filter(pk=instance.device_id).values_list('rack_id', flat=True))
+    transaction.on_commit(lambda: RackElevationSVG.invalidate_cache(rack_ids))
+
+
+@receiver(post_save, sender=DeviceType)
+@receiver(post_save, sender=DeviceRole)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=VirtualChassis)
+def invalidate_all_rack_elevations(instance, **kwargs):
+    """
+    Invalidate the cached elevations of all Racks when an object which determines the appearance of devices (e.g. a
+    DeviceType's images or a DeviceRole's color) is modified.
+    """
+    transaction.on_commit(RackElevationSVG.invalidate_cache)
+
+
+#
+# Cable traces
+#
+# Cached cable trace SVGs are keyed on the objects within each trace and their parent objects (see
+# CableTraceSVG.get_cache_key()). All are invalidated once the current transaction has been committed in response to
+# changes to any other object which determines their labels or colors.
+#
+
+@receiver(post_save, sender=DeviceType)
+@receiver(post_save, sender=DeviceRole)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=Site)
+@receiver(post_save, sender=Location)
+@receiver(post_save, sender=Rack)
+def invalidate_all_cable_traces(instance, **kwargs):
+    """
+    Invalidate all cached cable traces when an object which determines the labels or colors of the devices within
+    them (e.g. a DeviceType's model or a DeviceRole's color) is modified.
+    """
+    transaction.on_commit(CableTraceSVG.invalidate_cache)
+
+
+#
+# Component templates
+#
+# The cached component templates of a DeviceType or ModuleType are invalidated whenever any of its templates are
+# modified. The cache is invalidated both immediately (for the current transaction) and once the transaction has been
+# committed (in case another worker has cached the templates in the interim).
+#
+
+def invalidate_templates(parent_model, pks):
+    invalidate_component_templates(parent_model, pks)
+    transaction.on_commit(lambda: invalidate_component_templates(parent_model, pks))
+
+
+@receiver(post_save, sender=ConsolePortTemplate)
+@receiver(post_save, sender=ConsoleServerPortTemplate)
+@receiver(post_save, sender=PowerPortTemplate)
+@receiver(post_save, sender=PowerOutletTemplate)
+@receiver(post_save, sender=InterfaceTemplate)
+@receiver(post_save, sender=RearPortTemplate)
+@receiver(post_save, sender=FrontPortTemplate)
+@receiver(post_save, sender=ModuleBayTemplate)
+@receiver(post_save, sender=DeviceBayTemplate)
+@receiver(post_save, sender=InventoryItemTemplate)
+@receiver(post_delete, sender=ConsolePortTemplate)
+@receiver(post_delete, sender=ConsoleServerPortTemplate)
+@receiver(post_delete, sender=PowerPortTemplate)
+@receiver(post_delete, sender=PowerOutletTemplate)
+@receiver(post_delete, sender=InterfaceTemplate)
+@receiver(post_delete, sender=RearPortTemplate)
+@receiver(post_delete, sender=FrontPortTemplate)
+@receiver(post_delete, sender=ModuleBayTemplate)
+@receiver(post_delete, sender=DeviceBayTemplate)
+@receiver(post_delete, sender=InventoryItemTemplate)
+def invalidate_type_component_templates(instance, **kwargs):
+    """
+    Invalidate the cached component templates of a DeviceType or ModuleType when one of its templates is modified.
+    """
+    if instance.device_type_id:
+        invalidate_templates(DeviceType, [instance.device_type_id])
+    if getattr(instance, 'module_type_id', None):
+        invalidate_templates(ModuleType, [instance.module_type_id])
+
+
 #
 # Virtual chassis
 #
@@ -70,6 +286,10 @@ def clear_virtualchassis_members(instance, **kwargs):
 #
 # Cables
 #
+# Cable paths affected by changes to cables and their terminations are not retraced immediately. Rather, they are
+# queued and retraced once when the current transaction is committed (see dcim.utils.CablePathQueue). Wrap changes in
+# dcim.utils.synchronous_tracing() to retrace paths immediately.
+#
 
 @receiver(trace_paths, sender=Cable)
 def update_connected_endpoints(instance, created, raw=False, **kwargs):
@@ -95,16 +315,20 @@ def update_connected_endpoints(instance, created, raw=False, **kwargs):
             if not nodes:
                 continue
             if isinstance(nodes[0], PathEndpoint):
-                create_cablepath(nodes)
+                enqueue_cablepath(nodes)
             else:
-                rebuild_paths(nodes)
+                enqueue_retrace([object_to_path_node(node) for node in nodes])
 
     # Update status of CablePaths if Cable status has been changed
     elif instance.status != instance._orig_status:
         if instance.status != LinkStatusChoices.STATUS_CONNECTED:
             CablePath.objects.filter(_nodes__contains=instance).update(is_active=False)
         else:
-            rebuild_paths([instance])
+            enqueue_retrace([object_to_path_node(instance)])
+
+    # Retrace CablePaths to update their total length if Cable length has been changed
+    if not instance._terminations_modified and instance._abs_length != instance._orig_abs_length:
+        enqueue_retrace([object_to_path_node(instance)])
 
 
 @receiver(post_delete, sender=Cable)
@@ -112,8 +336,7 @@ def retrace_cable_paths(instance, **kwargs):
     """
     When a Cable is deleted, check for and update its connected endpoints
     """
-    for cablepath in CablePath.objects.filter(_nodes__contains=instance):
-        cablepath.retrace()
+    enqueue_retrace([object_to_path_node(instance)])
 
 
 @receiver(post_delete, sender=CableTermination)
@@ -124,11 +347,13 @@ def nullify_connected_endpoints(instance, **kwargs):
     model = instance.termination_type.model_class()
     model.objects.filter(pk=instance.termination_id).update(cable=None, cable_end='')
 
-    for cablepath in CablePath.objects.filter(_nodes__contains=instance.cable):
-        # Remove the deleted CableTermination if it's one of the path's originating nodes
-        if instance.termination in cablepath.origins:
-            cablepath.origins.remove(instance.termination)
-        cablepath.retrace()
+    # Retrace paths which traverse the Cable, removing the deleted CableTermination if it's one of the path's
+    # originating nodes
+    cable_ct = ContentType.objects.get_for_model(Cable)
+    enqueue_retrace(
+        [compile_path_node(cable_ct.pk, instance.cable_id)],
+        exclude_origins=[compile_path_node(instance.termination_type_id, instance.termination_id)]
+    )
 
 
 @receiver(post_save, sender=FrontPort)
@@ -137,6 +362,20 @@ def extend_rearport_cable_paths(instance, created, raw, **kwargs):
     When a new FrontPort is created, add it to any CablePaths which end at its corresponding RearPort.
     """
     if created and not raw:
-        rearport = instance.rear_port
-        for cablepath in CablePath.objects.filter(_nodes__contains=rearport):
-            cablepath.retrace()
+        enqueue_retrace([object_to_path_node(instance.rear_port)])
+
+
+#
+# Original values
+#
+# This receiver is registered last so that it runs after all other post_save receivers for these models.
+#
+
+@receiver(post_save, sender=Device)
+@receiver(post_save, sender=PowerFeed)
+def reset_original_rack(instance, **kwargs):
+    """
+    Reset the original Rack of a Device or PowerFeed now that all post_save receivers have run, so that a subsequent
+    save of the same instance is compared against the Rack to which it was last saved.
+    """
+    instance._orig_rack_id = instance.rack_id
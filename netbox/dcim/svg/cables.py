@@ -1,11 +1,19 @@
+import hashlib
+import json
+import time
+
 import svgwrite
 from svgwrite.container import Group, Hyperlink
 from svgwrite.shapes import Line, Polyline, Rect
 from svgwrite.text import Text
 
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Max
 
-from dcim.constants import CABLE_TRACE_SVG_DEFAULT_WIDTH
+from dcim.constants import CABLE_TRACE_SVG_CACHE_TIMEOUT, CABLE_TRACE_SVG_DEFAULT_WIDTH
+from dcim.utils import decompile_path_node
 from utilities.utils import foreground_color
 
 
@@ -20,6 +28,9 @@ LINE_HEIGHT = 20
 FANOUT_HEIGHT = 35
 FANOUT_LEG_HEIGHT = 15
 
+# Cache key holding the current generation of cached cable trace SVGs
+CACHE_GENERATION_KEY = 'cable_trace_svg_generation'
+
 
 class Node(Hyperlink):
     """
@@ -134,6 +145,104 @@ class CableTraceSVG:
     def center(self):
         return self.width / 2
 
+    @classmethod
+    def invalidate_cache(cls):
+        """
+        Invalidate all cached cable trace SVGs by advancing the cache generation. Called in response to changes to
+        objects which determine the labels and colors of the objects within a trace (e.g. a DeviceType or DeviceRole)
+        but which are not themselves part of it.
+        """
+        cache.set(CACHE_GENERATION_KEY, time.time_ns(), None)
+
+    def _get_cablepaths(self):
+        """
+        Return the CablePaths which make up the complete trace from the origin: its own path, followed by the path of
+        each bridged interface through which the trace continues (see PathEndpoint.trace_endpoints()).
+        """
+        from dcim.models import CablePath
+
+        cablepaths = []
+        cablepath = self.origin.path
+        while cablepath is not None and cablepath.pk not in {cp.pk for cp in cablepaths}:
+            cablepaths.append(cablepath)
+
+            # Continue the trace from a single destination with a bridge (if any)
+            destinations = cablepath.path[-1] if cablepath.is_complete else []
+            if len(destinations) != 1:
+                break
+            ct_id, object_id = decompile_path_node(destinations[0])
+            model = ContentType.objects.get_for_id(ct_id).model_class()
+            if not hasattr(model, 'bridge'):
+                break
+            cablepath = CablePath.objects.filter(
+                pk__in=model.objects.filter(pk=object_id).values('bridge___path')
+            ).first()
+
+        return cablepaths
+
+    @staticmethod
+    def _get_last_updated(cablepaths):
+        """
+        Return the most recent modification time among all objects in the given paths and their parent objects, using
+        one query per model type.
+        """
+        to_check = {}
+        for cablepath in cablepaths:
+            for node in cablepath._nodes:
+                ct_id, object_id = decompile_path_node(node)
+                to_check.setdefault(ct_id, set()).add(object_id)
+
+        timestamps = []
+        for ct_id, object_ids in to_check.items():
+            model = ContentType.objects.get_for_id(ct_id).model_class()
+            aggregates = {'last_updated': Max('last_updated')}
+            for parent in ('device', 'circuit', 'power_panel'):
+                if hasattr(model, parent):
+                    aggregates[f'{parent}_last_updated'] = Max(f'{parent}__last_updated')
+            result = model.objects.filter(pk__in=object_ids).aggregate(**aggregates)
+            timestamps.extend(ts for ts in result.values() if ts is not None)
+
+        return max(timestamps) if timestamps else None
+
+    def get_cache_key(self):
+        """
+        Return the cache key for the rendered trace. The key is derived from the contents of the CablePaths which make
+        up the trace (including any bridged paths), the most recent modification time of the objects within them and
+        their parent objects, and the current cache generation. Returns None if the origin has no path.
+        """
+        cablepaths = self._get_cablepaths()
+        if not cablepaths:
+            return None
+
+        token = json.dumps([
+            settings.VERSION,
+            cache.get(CACHE_GENERATION_KEY),
+            ContentType.objects.get_for_model(self.origin).pk,
+            self.origin.pk,
+            self.width,
+            self.base_url,
+            [(cablepath.pk, cablepath.path) for cablepath in cablepaths],
+            str(self._get_last_updated(cablepaths)),
+        ])
+
+        return f'cable_trace_svg_{hashlib.sha256(token.encode()).hexdigest()}'
+
+    def render_cached(self):
+        """
+        Return the rendered SVG document as a string, retrieving it from the cache if possible.
+        """
+        cache_key = self.get_cache_key()
+        if cache_key is not None:
+            svg = cache.get(cache_key)
+            if svg is not None:
+                return svg
+
+        svg = self.render().tostring()
+        if cache_key is not None:
+            cache.set(cache_key, svg, CABLE_TRACE_SVG_CACHE_TIMEOUT)
+
+        return svg
+
     @classmethod
     def _get_labels(cls, instance):
         """
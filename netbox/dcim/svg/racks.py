@@ -1,4 +1,8 @@
 import decimal
+import hashlib
+import json
+import time
+
 import svgwrite
 from svgwrite.container import Hyperlink
 from svgwrite.image import Image
@@ -7,15 +11,17 @@ from svgwrite.shapes import Rect
 from svgwrite.text import Text
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import FieldError
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.http import urlencode
 
 from netbox.config import get_config
 from utilities.utils import foreground_color, array_to_ranges
-from dcim.constants import RACK_ELEVATION_BORDER_WIDTH
+from dcim.constants import RACK_ELEVATION_BORDER_WIDTH, RACK_ELEVATION_SVG_CACHE_TIMEOUT
 
 
 __all__ = (
@@ -27,6 +33,10 @@ GRADIENT_OCCUPIED = '#d7d7d7'
 GRADIENT_BLOCKED = '#ffc0c0'
 STROKE_RESERVED = '#4d4dff'
 
+# Cache keys holding the current generation of cached rack elevation SVGs, for all racks and for each rack
+CACHE_GENERATION_KEY = 'rack_elevation_svg_generation'
+RACK_CACHE_GENERATION_KEY = 'rack_elevation_svg_generation_{}'
+
 
 def get_device_name(device):
     if device.virtual_chassis:
@@ -36,7 +46,10 @@ def get_device_name(device):
     else:
         name = str(device.device_type)
     if device.devicebay_count:
-        name += ' ({}/{})'.format(device.get_children().count(), device.devicebay_count)
+        child_count = getattr(device, 'child_count', None)
+        if child_count is None:
+            child_count = device.get_children().count()
+        name += ' ({}/{})'.format(child_count, device.devicebay_count)
 
     return name
 
@@ -110,6 +123,80 @@ class RackElevationSVG:
             except FieldError:
                 pass
 
+    @cached_property
+    def devices(self):
+        """
+        Return all devices installed within the rack, annotated with their numbers of device bays and installed child
+        devices so that these need not be counted for each device.
+        """
+        from dcim.models import Device
+
+        return list(Device.objects.filter(
+            rack=self.rack,
+            position__gt=0,
+            device_type__u_height__gt=0
+        ).select_related(
+            'device_type__manufacturer', 'device_role', 'virtual_chassis'
+        ).annotate(
+            devicebay_count=Count('devicebays'),
+            child_count=Count('devicebays__installed_device')
+        ))
+
+    @classmethod
+    def invalidate_cache(cls, rack_ids=None):
+        """
+        Invalidate the cached elevation SVGs of the specified racks by advancing their cache generation. If no racks
+        are specified, the cached elevations of all racks are invalidated.
+        """
+        generation = time.time_ns()
+        if rack_ids is None:
+            cache.set(CACHE_GENERATION_KEY, generation, None)
+        else:
+            cache.set_many({RACK_CACHE_GENERATION_KEY.format(pk): generation for pk in rack_ids if pk}, None)
+
+    def get_cache_key(self, face):
+        """
+        Return the cache key for the rendered elevation of the specified face. The key is derived from the rack, the
+        render options, the devices visible to the user, and the current cache generations; it also serves as the
+        elevation's ETag.
+        """
+        rack_generation_key = RACK_CACHE_GENERATION_KEY.format(self.rack.pk)
+        generations = cache.get_many([CACHE_GENERATION_KEY, rack_generation_key])
+
+        token = json.dumps([
+            settings.VERSION,
+            generations.get(CACHE_GENERATION_KEY),
+            generations.get(rack_generation_key),
+            self.rack.pk,
+            str(self.rack.last_updated),
+            face,
+            self.unit_width,
+            self.unit_height,
+            self.legend_width,
+            self.margin_width,
+            self.include_images,
+            self.base_url,
+            sorted(self.permitted_device_ids),
+            sorted(device.pk for device in self.highlight_devices),
+        ])
+
+        return f'rack_elevation_svg_{hashlib.sha256(token.encode()).hexdigest()}'
+
+    def render_cached(self, face, cache_key=None):
+        """
+        Return the rendered SVG document for the specified face as a string, retrieving it from the cache if possible.
+
+        :param face: The rack face to render
+        :param cache_key: A cache key previously obtained from get_cache_key() (optional)
+        """
+        cache_key = cache_key or self.get_cache_key(face)
+        svg = cache.get(cache_key)
+        if svg is None:
+            svg = self.render(face).tostring()
+            cache.set(cache_key, svg, RACK_ELEVATION_SVG_CACHE_TIMEOUT)
+
+        return svg
+
     @staticmethod
     def _add_gradient(drawing, id_, color):
         gradient = LinearGradient(
@@ -294,7 +381,7 @@ class RackElevationSVG:
         """
         Draw any occupied rack units for the specified rack face.
         """
-        for unit in self.rack.get_rack_units(face=face, expand_devices=False):
+        for unit in self.rack.get_rack_units(face=face, expand_devices=False, devices=self.devices):
 
             # Loop through all units in the elevation
             device = unit['device']
@@ -66,11 +66,11 @@ class RackTable(TenancyColumnsMixin, ContactsColumnMixin, NetBoxTable):
         verbose_name='Devices'
     )
     get_utilization = columns.UtilizationColumn(
-        orderable=False,
+        accessor='_utilization',
         verbose_name='Space'
     )
     get_power_utilization = columns.UtilizationColumn(
-        orderable=False,
+        accessor='_power_utilization',
         verbose_name='Power'
     )
     tags = columns.TagColumn(
@@ -15,6 +15,11 @@ CABLE_LENGTH = """
 {% if record.length %}{{ record.length|floatformat:"-2" }} {{ record.length_unit }}{% endif %}
 """
 
+CABLEPATH_LENGTH = """
+{% load helpers %}
+{% if record.path.total_length is not None %}{{ record.path.total_length|floatformat:"-2" }}{% if not record.path.is_length_definitive %}+{% endif %} Meters{% endif %}
+"""
+
 WEIGHT = """
 {% load helpers %}
 {% if value %}{{ value|floatformat:"-2" }} {{ record.weight_unit }}{% endif %}
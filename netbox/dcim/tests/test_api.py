@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
@@ -47,7 +49,8 @@ class Mixins:
                 name='Peer Termination'
             )
             cable = Cable(a_terminations=[obj], b_terminations=[peer_obj], label='Cable 1')
-            cable.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                cable.save()
 
             self.add_permissions(f'dcim.view_{self.model._meta.model_name}')
             url = reverse(f'dcim-api:{self.model._meta.model_name}-trace', kwargs={'pk': obj.pk})
@@ -60,6 +63,74 @@ class Mixins:
             self.assertEqual(segment1[1]['label'], cable.label)
             self.assertEqual(segment1[2][0]['name'], peer_obj.name)
 
+        def test_bulk_trace(self):
+            """
+            Test tracing the attached cables of multiple device components in a single request.
+            """
+            objs = list(self.model.objects.all()[:2])
+            peer_device = Device.objects.create(
+                site=Site.objects.first(),
+                device_type=DeviceType.objects.first(),
+                device_role=DeviceRole.objects.first(),
+                name='Peer Device'
+            )
+            if self.peer_termination_type is None:
+                raise NotImplementedError("Test case must set peer_termination_type")
+            with self.captureOnCommitCallbacks(execute=True):
+                for i, obj in enumerate(objs, start=1):
+                    peer_obj = self.peer_termination_type.objects.create(
+                        device=peer_device,
+                        name=f'Peer Termination {i}'
+                    )
+                    Cable(a_terminations=[obj], b_terminations=[peer_obj], label=f'Cable {i}').save()
+
+            self.add_permissions(f'dcim.view_{self.model._meta.model_name}')
+            url = reverse(f'dcim-api:{self.model._meta.model_name}-bulk-trace')
+            response = self.client.get(f'{url}?id={objs[0].pk}&id={objs[1].pk}', **self.header)
+
+            self.assertHttpStatus(response, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 2)
+            for result in response.data['results']:
+                self.assertEqual(len(result['trace']), 1)
+                segment1 = result['trace'][0]
+                self.assertEqual(segment1[0][0]['id'], result['id'])
+                self.assertTrue(segment1[1]['label'].startswith('Cable '))
+                self.assertTrue(segment1[2][0]['name'].startswith('Peer Termination '))
+
+        def test_bulk_trace_queries(self):
+            """
+            Test that the number of queries made to trace multiple device components does not depend on their number.
+            """
+            objs = list(self.model.objects.all()[:3])
+            peer_device = Device.objects.create(
+                site=Site.objects.first(),
+                device_type=DeviceType.objects.first(),
+                device_role=DeviceRole.objects.first(),
+                name='Peer Device'
+            )
+            if self.peer_termination_type is None:
+                raise NotImplementedError("Test case must set peer_termination_type")
+            with self.captureOnCommitCallbacks(execute=True):
+                for i, obj in enumerate(objs, start=1):
+                    peer_obj = self.peer_termination_type.objects.create(
+                        device=peer_device,
+                        name=f'Peer Termination {i}'
+                    )
+                    Cable(a_terminations=[obj], b_terminations=[peer_obj], label=f'Cable {i}').save()
+
+            self.add_permissions(f'dcim.view_{self.model._meta.model_name}')
+            url = reverse(f'dcim-api:{self.model._meta.model_name}-bulk-trace')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'{url}?id={objs[0].pk}', **self.header)
+            self.assertEqual(response.data['count'], 1)
+
+            query = '&'.join(f'id={obj.pk}' for obj in objs)
+            with self.assertNumQueries(len(queries)):
+                response = self.client.get(f'{url}?{query}', **self.header)
+            self.assertEqual(response.data['count'], 3)
+            for result in response.data['results']:
+                self.assertEqual(result['segment_count'], 1)
+
 
 class RegionTest(APIViewTestCases.APIViewTestCase):
     model = Region
@@ -353,6 +424,73 @@ class RackTest(APIViewTestCases.APIViewTestCase):
         self.assertHttpStatus(response, status.HTTP_200_OK)
         self.assertEqual(response.get('Content-Type'), 'image/svg+xml')
 
+    def test_get_rack_elevation_svg_etag(self):
+        """
+        GET a cached rack elevation in SVG format, using an ETag to check whether it has changed.
+        """
+        rack = Rack.objects.first()
+        self.add_permissions('dcim.view_rack')
+        url = '{}?render=svg'.format(reverse('dcim-api:rack-elevation', kwargs={'pk': rack.pk}))
+
+        response = self.client.get(url, **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        etag = response.get('ETag')
+        self.assertIsNotNone(etag)
+
+        # Elevation has not changed
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.header)
+        self.assertHttpStatus(response, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.get('ETag'), etag)
+
+        # Install a device in the rack
+        manufacturer = Manufacturer.objects.create(name='Manufacturer 1', slug='manufacturer-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Device.objects.create(
+                device_type=DeviceType.objects.create(
+                    manufacturer=manufacturer, model='Device Type 1', slug='device-type-1'
+                ),
+                device_role=DeviceRole.objects.create(name='Device Role 1', slug='device-role-1'),
+                site=rack.site,
+                rack=rack,
+                position=1,
+                face=DeviceFaceChoices.FACE_FRONT
+            )
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertNotEqual(response.get('ETag'), etag)
+
+    def test_get_available_units(self):
+        """
+        GET the units available to accommodate a device within multiple racks.
+        """
+        rack1 = Rack.objects.get(name='Rack 1')
+        rack2 = Rack.objects.get(name='Rack 2')
+        manufacturer = Manufacturer.objects.create(name='Manufacturer 1', slug='manufacturer-1')
+        Device.objects.create(
+            device_type=DeviceType.objects.create(
+                manufacturer=manufacturer, model='Device Type 1', slug='device-type-1', u_height=4
+            ),
+            device_role=DeviceRole.objects.create(name='Device Role 1', slug='device-role-1'),
+            site=rack1.site,
+            rack=rack1,
+            position=1,
+            face=DeviceFaceChoices.FACE_FRONT
+        )
+        self.add_permissions('dcim.view_rack')
+        url = reverse('dcim-api:rack-available-units')
+
+        response = self.client.get(f'{url}?u_height=4&id={rack1.pk}&id={rack2.pk}', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        available_units = {
+            result['rack']['id']: result['available_units'] for result in response.data['results']
+        }
+        self.assertEqual(len(available_units[rack1.pk]), 69)
+        self.assertEqual(available_units[rack1.pk][0], 5)
+        self.assertEqual(len(available_units[rack2.pk]), 77)
+        self.assertEqual(available_units[rack2.pk][-1], 39)
+
 
 class RackReservationTest(APIViewTestCases.APIViewTestCase):
     model = RackReservation
@@ -1,10 +1,16 @@
-from django.test import TestCase
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from circuits.models import *
-from dcim.choices import LinkStatusChoices
+from dcim.choices import CableLengthUnitChoices, LinkStatusChoices
+from dcim.graph import CableGraph
 from dcim.models import *
 from dcim.svg import CableTraceSVG
-from dcim.utils import object_to_path_node
+from dcim.utils import object_to_path_node, synchronous_tracing
 
 
 class CablePathTestCase(TestCase):
@@ -33,6 +39,12 @@ class CablePathTestCase(TestCase):
         circuit_type = CircuitType.objects.create(name='Circuit Type', slug='circuit-type')
         cls.circuit = Circuit.objects.create(provider=provider, type=circuit_type, cid='Circuit 1')
 
+    def setUp(self):
+        # Trace paths immediately rather than deferring them until the (never committed) test transaction ends
+        tracing = synchronous_tracing()
+        tracing.__enter__()
+        self.addCleanup(tracing.__exit__, None, None, None)
+
     def assertPathExists(self, nodes, **kwargs):
         """
         Assert that a CablePath from origin to destination with a specific intermediate path exists.
@@ -77,6 +89,25 @@ class CablePathTestCase(TestCase):
             msg = f"Path #{origin._path_id} set as origin on {origin}; should be None!"
         self.assertIsNone(origin._path_id, msg=msg)
 
+    def assertGraphTracesMatch(self):
+        """
+        Assert that retracing every existing CablePath from an in-memory CableGraph (holding either the entire cable
+        plant or only the portion reachable from the path's origins) or from the database produces an identical path.
+        """
+        graph = CableGraph()
+        cablepaths = [(cp, cp.origins) for cp in CablePath.objects.all()]
+        for cablepath, origins in cablepaths:
+            with self.assertNumQueries(0):
+                traced = graph.trace(origins)
+            for result in (traced, CableGraph(origins).trace(origins), CablePath.trace_from_database(origins)):
+                self.assertIsNotNone(result, msg=f"No path traced from {origins}")
+                self.assertEqual(result.path, cablepath.path)
+                self.assertEqual(result.is_complete, cablepath.is_complete)
+                self.assertEqual(result.is_active, cablepath.is_active)
+                self.assertEqual(result.is_split, cablepath.is_split)
+                self.assertEqual(result.total_length, cablepath.total_length)
+                self.assertEqual(result.is_length_definitive, cablepath.is_length_definitive)
+
     def test_101_interface_to_interface(self):
         """
         [IF1] --C1-- [IF2]
@@ -110,6 +141,19 @@ class CablePathTestCase(TestCase):
         # Test SVG generation
         CableTraceSVG(interface1).render()
 
+        # Test SVG caching
+        svg = CableTraceSVG(interface1).render_cached()
+        with patch.object(CableTraceSVG, 'render') as render:
+            self.assertEqual(CableTraceSVG(interface1).render_cached(), svg)
+            render.assert_not_called()
+
+        # Modifying the DeviceRole should invalidate the cached SVG
+        cache_key = CableTraceSVG(interface1).get_cache_key()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.device.device_role.color = '00ff00'
+            self.device.device_role.save()
+        self.assertNotEqual(CableTraceSVG(interface1).get_cache_key(), cache_key)
+
         # Delete cable 1
         cable1.delete()
 
@@ -655,6 +699,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 4)
+        self.assertGraphTracesMatch()
 
         # Delete cable 3
         cable3.delete()
@@ -786,6 +831,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 4)
+        self.assertGraphTracesMatch()
 
         # Delete cable 3
         cable3.delete()
@@ -913,6 +959,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 4)
+        self.assertGraphTracesMatch()
 
         # Delete cable 5
         cable5.delete()
@@ -1016,6 +1063,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 4)
+        self.assertGraphTracesMatch()
 
         # Delete cable 3
         cable3.delete()
@@ -1075,6 +1123,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 3)
+        self.assertGraphTracesMatch()
 
         # Delete cable 1
         cable1.delete()
@@ -1117,6 +1166,7 @@ class CablePathTestCase(TestCase):
             is_complete=False
         )
         self.assertEqual(CablePath.objects.count(), 1)
+        self.assertGraphTracesMatch()
 
     def test_210_interface_to_circuittermination(self):
         """
@@ -1194,6 +1244,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 2)
+        self.assertGraphTracesMatch()
 
         # Delete cable 2
         cable2.delete()
@@ -1296,6 +1347,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 1)
+        self.assertGraphTracesMatch()
 
         # Delete cable 1
         cable1.delete()
@@ -1323,6 +1375,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 1)
+        self.assertGraphTracesMatch()
         self.assertTrue(CablePath.objects.first().is_complete)
 
         # Delete cable 1
@@ -1421,6 +1474,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 4)
+        self.assertGraphTracesMatch()
 
         # Delete cables 3-4
         cable3.delete()
@@ -1679,6 +1733,7 @@ class CablePathTestCase(TestCase):
             is_active=True
         )
         self.assertEqual(CablePath.objects.count(), 4)
+        self.assertGraphTracesMatch()
 
         # Delete cable 3
         cable3.delete()
@@ -1788,6 +1843,7 @@ class CablePathTestCase(TestCase):
             is_active=False
         )
         self.assertEqual(CablePath.objects.count(), 2)
+        self.assertGraphTracesMatch()
 
         # Change cable 2's status to "connected"
         cable2 = Cable.objects.get(pk=cable2.pk)
@@ -1845,3 +1901,266 @@ class CablePathTestCase(TestCase):
             is_complete=True,
             is_active=True
         )
+
+    def test_304_update_path_length_on_cable_length_change(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [IF2]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=1)
+        frontport1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1', rear_port=rearport1, rear_port_position=1
+        )
+
+        # Create cables 1 and 2; only cable 1 has a defined length
+        cable1 = Cable(
+            a_terminations=[interface1],
+            b_terminations=[frontport1],
+            length=10,
+            length_unit=CableLengthUnitChoices.UNIT_METER
+        )
+        cable1.save()
+        cable2 = Cable(
+            a_terminations=[rearport1],
+            b_terminations=[interface2]
+        )
+        cable2.save()
+        path1 = self.assertPathExists(
+            (interface1, cable1, frontport1, rearport1, cable2, interface2),
+            is_complete=True,
+            total_length=10,
+            is_length_definitive=False,
+            segment_count=2
+        )
+        self.assertEqual(path1.get_total_length(), (10, False))
+        self.assertGraphTracesMatch()
+
+        # Define the length of cable 2
+        cable2 = Cable.objects.get(pk=cable2.pk)
+        cable2.length = 500
+        cable2.length_unit = CableLengthUnitChoices.UNIT_CENTIMETER
+        cable2.save()
+        self.assertPathExists(
+            (interface1, cable1, frontport1, rearport1, cable2, interface2),
+            is_complete=True,
+            total_length=15,
+            is_length_definitive=True,
+            segment_count=2
+        )
+        self.assertGraphTracesMatch()
+
+
+class DeferredCablePathTestCase(TestCase):
+    """
+    Test the deferral and coalescing of CablePath changes until the current transaction is committed.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        site = Site.objects.create(name='Site', slug='site')
+        manufacturer = Manufacturer.objects.create(name='Generic', slug='generic')
+        device_type = DeviceType.objects.create(manufacturer=manufacturer, model='Test Device')
+        device_role = DeviceRole.objects.create(name='Device Role', slug='device-role')
+        cls.device = Device.objects.create(site=site, device_type=device_type, device_role=device_role, name='Test Device')
+
+    def test_paths_created_on_commit(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [IF2]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=1)
+        frontport1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1', rear_port=rearport1, rear_port_position=1
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cable1 = Cable(a_terminations=[interface1], b_terminations=[frontport1])
+            cable1.save()
+            cable2 = Cable(a_terminations=[rearport1], b_terminations=[interface2])
+            cable2.save()
+            self.assertEqual(CablePath.objects.count(), 0)
+
+        self.assertEqual(CablePath.objects.filter(is_complete=True).count(), 2)
+        interface1.refresh_from_db()
+        self.assertEqual(
+            interface1._path.path,
+            [
+                [object_to_path_node(interface1)],
+                [object_to_path_node(cable1)],
+                [object_to_path_node(frontport1)],
+                [object_to_path_node(rearport1)],
+                [object_to_path_node(cable2)],
+                [object_to_path_node(interface2)],
+            ]
+        )
+
+    def test_retraces_coalesced(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [RP2] [FP2] --C3-- [IF2]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=1)
+        rearport2 = RearPort.objects.create(device=self.device, name='Rear Port 2', positions=1)
+        frontport1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1', rear_port=rearport1, rear_port_position=1
+        )
+        frontport2 = FrontPort.objects.create(
+            device=self.device, name='Front Port 2', rear_port=rearport2, rear_port_position=1
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            cable1 = Cable(a_terminations=[interface1], b_terminations=[frontport1])
+            cable1.save()
+            cable2 = Cable(a_terminations=[rearport1], b_terminations=[rearport2])
+            cable2.save()
+            cable3 = Cable(a_terminations=[frontport2], b_terminations=[interface2])
+            cable3.save()
+        self.assertEqual(CablePath.objects.filter(is_complete=True).count(), 2)
+
+        # Changing the status of all three cables should retrace each path only once
+        with patch.object(CablePath, 'retrace', autospec=True, side_effect=CablePath.retrace) as retrace:
+            with self.captureOnCommitCallbacks(execute=True):
+                for cable in Cable.objects.all():
+                    cable.status = LinkStatusChoices.STATUS_PLANNED
+                    cable.save()
+                for cable in Cable.objects.all():
+                    cable.status = LinkStatusChoices.STATUS_CONNECTED
+                    cable.save()
+                self.assertEqual(retrace.call_count, 0)
+            self.assertEqual(retrace.call_count, 2)
+        self.assertEqual(CablePath.objects.filter(is_active=True).count(), 2)
+
+    def test_rolled_back_changes_discarded(self):
+        """
+        [IF1] --C1-- [IF2]
+        [IF3] --C2-- [IF4]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        interface3 = Interface.objects.create(device=self.device, name='Interface 3')
+        interface4 = Interface.objects.create(device=self.device, name='Interface 4')
+        with self.captureOnCommitCallbacks(execute=True):
+            cable1 = Cable(a_terminations=[interface1], b_terminations=[interface2])
+            cable1.save()
+        self.assertEqual(CablePath.objects.count(), 2)
+
+        # Delete cable 1 within a transaction which is rolled back
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                Cable.objects.get(pk=cable1.pk).delete()
+                transaction.set_rollback(True)
+        self.assertEqual(len(callbacks), 0)
+
+        # Committing an unrelated cable change must not act upon the rolled back deletion
+        with self.captureOnCommitCallbacks(execute=True):
+            cable2 = Cable(a_terminations=[interface3], b_terminations=[interface4])
+            cable2.save()
+        self.assertEqual(CablePath.objects.count(), 4)
+        interface1.refresh_from_db()
+        self.assertEqual(
+            interface1._path.path,
+            [
+                [object_to_path_node(interface1)],
+                [object_to_path_node(cable1)],
+                [object_to_path_node(interface2)],
+            ]
+        )
+
+    def test_flush_errors_logged(self):
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+
+        with patch.object(CablePath, 'save', side_effect=ValueError):
+            with self.assertLogs('netbox.dcim.cable', level='ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Cable(a_terminations=[interface1], b_terminations=[interface2]).save()
+        self.assertEqual(CablePath.objects.count(), 0)
+
+    @override_settings(DEBUG=True)
+    def test_flush_errors_raised_in_debug(self):
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+
+        with patch.object(CablePath, 'save', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                with self.captureOnCommitCallbacks(execute=True):
+                    Cable(a_terminations=[interface1], b_terminations=[interface2]).save()
+
+    def test_synchronous_tracing(self):
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+
+        with synchronous_tracing():
+            Cable(a_terminations=[interface1], b_terminations=[interface2]).save()
+        self.assertEqual(CablePath.objects.filter(is_complete=True).count(), 2)
+
+    def test_graph_missing_objects(self):
+        """
+        [IF1] --C1-- [FP1] [RP1] --C2-- [IF2]
+        """
+        interface1 = Interface.objects.create(device=self.device, name='Interface 1')
+        interface2 = Interface.objects.create(device=self.device, name='Interface 2')
+        rearport1 = RearPort.objects.create(device=self.device, name='Rear Port 1', positions=1)
+        frontport1 = FrontPort.objects.create(
+            device=self.device, name='Front Port 1', rear_port=rearport1, rear_port_position=1
+        )
+        cable1 = Cable(a_terminations=[interface1], b_terminations=[frontport1])
+        cable1.save()
+        graph = CableGraph([interface1])
+
+        # Tracing from a graph which lacks the origin's cable should find no path
+        cable2 = Cable(a_terminations=[rearport1], b_terminations=[interface2])
+        cable2.save()
+        interface2.refresh_from_db()
+        self.assertIsNone(graph.trace([interface2]))
+
+        # Tracing from a graph which lacks the origin's cable termination should halt at the cable
+        interface3 = Interface.objects.create(device=self.device, name='Interface 3')
+        interface3.cable = cable1
+        traced = graph.trace([interface3])
+        self.assertEqual(traced.path, [
+            [object_to_path_node(interface3)],
+            [object_to_path_node(cable1)],
+            [],
+        ])
+        self.assertFalse(traced.is_complete)
+
+
+class TracePathsTestCase(TransactionTestCase):
+    """
+    Test the generation of CablePaths by the trace_paths management command.
+    """
+    def setUp(self):
+        site = Site.objects.create(name='Site', slug='site')
+        manufacturer = Manufacturer.objects.create(name='Generic', slug='generic')
+        device_type = DeviceType.objects.create(manufacturer=manufacturer, model='Test Device')
+        device_role = DeviceRole.objects.create(name='Device Role', slug='device-role')
+        device = Device.objects.create(site=site, device_type=device_type, device_role=device_role, name='Test Device')
+        self.interfaces = [
+            Interface.objects.create(device=device, name=f'Interface {i}') for i in range(1, 7)
+        ]
+        for interface1, interface2 in zip(self.interfaces[::2], self.interfaces[1::2]):
+            Cable(a_terminations=[interface1], b_terminations=[interface2]).save()
+
+    def assertPathsTraced(self):
+        self.assertEqual(CablePath.objects.filter(is_complete=True).count(), len(self.interfaces))
+        for interface in Interface.objects.all():
+            self.assertTrue(interface._path.is_complete)
+            self.assertEqual(interface._path.origins, [interface])
+
+    def test_trace_paths(self):
+        self.assertPathsTraced()
+
+        # Trace paths in batches of two using a single process
+        call_command('trace_paths', force=True, no_input=True, workers=1, batch_size=2, stdout=StringIO())
+        self.assertPathsTraced()
+
+    def test_trace_paths_workers(self):
+
+        # Trace missing paths in batches of one using multiple worker processes
+        path_ids = Interface.objects.filter(pk__in=[i.pk for i in self.interfaces[:3]]).values('_path_id')
+        CablePath.objects.filter(pk__in=path_ids).delete()
+        self.assertEqual(CablePath.objects.count(), len(self.interfaces) - 3)
+        call_command('trace_paths', no_input=True, workers=2, batch_size=1, stdout=StringIO())
+        self.assertPathsTraced()
@@ -2113,8 +2113,9 @@ class ConsolePortTestCase(TestCase, DeviceComponentFilterSetTests, ChangeLoggedF
         ConsolePort.objects.bulk_create(console_ports)
 
         # Cables
-        Cable(a_terminations=[console_ports[0]], b_terminations=[console_server_ports[0]]).save()
-        Cable(a_terminations=[console_ports[1]], b_terminations=[console_server_ports[1]]).save()
+        with cls.captureOnCommitCallbacks(execute=True):
+            Cable(a_terminations=[console_ports[0]], b_terminations=[console_server_ports[0]]).save()
+            Cable(a_terminations=[console_ports[1]], b_terminations=[console_server_ports[1]]).save()
         # Third port is not connected
 
     def test_name(self):
@@ -2293,8 +2294,9 @@ class ConsoleServerPortTestCase(TestCase, DeviceComponentFilterSetTests, ChangeL
         ConsoleServerPort.objects.bulk_create(console_server_ports)
 
         # Cables
-        Cable(a_terminations=[console_server_ports[0]], b_terminations=[console_ports[0]]).save()
-        Cable(a_terminations=[console_server_ports[1]], b_terminations=[console_ports[1]]).save()
+        with cls.captureOnCommitCallbacks(execute=True):
+            Cable(a_terminations=[console_server_ports[0]], b_terminations=[console_ports[0]]).save()
+            Cable(a_terminations=[console_server_ports[1]], b_terminations=[console_ports[1]]).save()
         # Third port is not connected
 
     def test_name(self):
@@ -2473,8 +2475,9 @@ class PowerPortTestCase(TestCase, DeviceComponentFilterSetTests, ChangeLoggedFil
         PowerPort.objects.bulk_create(power_ports)
 
         # Cables
-        Cable(a_terminations=[power_ports[0]], b_terminations=[power_outlets[0]]).save()
-        Cable(a_terminations=[power_ports[1]], b_terminations=[power_outlets[1]]).save()
+        with cls.captureOnCommitCallbacks(execute=True):
+            Cable(a_terminations=[power_ports[0]], b_terminations=[power_outlets[0]]).save()
+            Cable(a_terminations=[power_ports[1]], b_terminations=[power_outlets[1]]).save()
         # Third port is not connected
 
     def test_name(self):
@@ -2661,8 +2664,9 @@ class PowerOutletTestCase(TestCase, DeviceComponentFilterSetTests, ChangeLoggedF
         PowerOutlet.objects.bulk_create(power_outlets)
 
         # Cables
-        Cable(a_terminations=[power_outlets[0]], b_terminations=[power_ports[0]]).save()
-        Cable(a_terminations=[power_outlets[1]], b_terminations=[power_ports[1]]).save()
+        with cls.captureOnCommitCallbacks(execute=True):
+            Cable(a_terminations=[power_outlets[0]], b_terminations=[power_ports[0]]).save()
+            Cable(a_terminations=[power_outlets[1]], b_terminations=[power_ports[1]]).save()
         # Third port is not connected
 
     def test_name(self):
@@ -2964,8 +2968,9 @@ class InterfaceTestCase(TestCase, DeviceComponentFilterSetTests, ChangeLoggedFil
         interfaces[7].vdcs.set([vdcs[1]])
 
         # Cables
-        Cable(a_terminations=[interfaces[0]], b_terminations=[interfaces[3]]).save()
-        Cable(a_terminations=[interfaces[1]], b_terminations=[interfaces[4]]).save()
+        with cls.captureOnCommitCallbacks(execute=True):
+            Cable(a_terminations=[interfaces[0]], b_terminations=[interfaces[3]]).save()
+            Cable(a_terminations=[interfaces[1]], b_terminations=[interfaces[4]]).save()
         # Third pair is not connected
 
     def test_name(self):
@@ -4435,8 +4440,9 @@ class PowerFeedTestCase(TestCase, ChangeLoggedFilterSetTests):
             PowerPort(device=device, name='Power Port 2'),
         ]
         PowerPort.objects.bulk_create(power_ports)
-        Cable(a_terminations=[power_feeds[0]], b_terminations=[power_ports[0]]).save()
-        Cable(a_terminations=[power_feeds[1]], b_terminations=[power_ports[1]]).save()
+        with cls.captureOnCommitCallbacks(execute=True):
+            Cable(a_terminations=[power_feeds[0]], b_terminations=[power_ports[0]]).save()
+            Cable(a_terminations=[power_feeds[1]], b_terminations=[power_ports[1]]).save()
 
     def test_name(self):
         params = {'name': ['Power Feed 1', 'Power Feed 2']}
@@ -1,10 +1,27 @@
+import decimal
+import uuid
+from unittest.mock import Mock, patch
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.test import RequestFactory, TestCase
 
 from circuits.models import *
 from dcim.choices import *
 from dcim.models import *
+from dcim.models.devices import get_component_templates, invalidate_component_templates
+from dcim.svg import RackElevationSVG
+from dcim.svg.racks import get_device_name
+from dcim.utils import bulk_device_creation, bulk_module_creation
+from extras.choices import ObjectChangeActionChoices
+from extras.context_managers import change_logging
+from extras.models import ObjectChange
+from netbox.context import rack_utilization_queue
 from tenancy.models import Tenant
+from utilities.exceptions import AbortRequest
 from utilities.utils import drange
 
 
@@ -213,6 +230,190 @@ class RackTestCase(TestCase):
 
         self.assertEqual(len(rack.get_available_units()), rack.u_height * 2 - 3)
 
+    def test_get_available_units(self):
+        rack = Rack.objects.first()
+        device_type = DeviceType.objects.get(model='Device Type 1')
+        half_depth_device_type = DeviceType.objects.create(
+            manufacturer=device_type.manufacturer,
+            model='Device Type 4',
+            slug='device-type-4',
+            u_height=2,
+            is_full_depth=False
+        )
+        attrs = {
+            'device_role': DeviceRole.objects.first(),
+            'site': Site.objects.first(),
+            'rack': rack,
+        }
+        Device(
+            name='Device 1', device_type=device_type, position=10, face=DeviceFaceChoices.FACE_FRONT, **attrs
+        ).save()
+        device2 = Device(
+            name='Device 2', device_type=half_depth_device_type, position=20, face=DeviceFaceChoices.FACE_REAR, **attrs
+        )
+        device2.save()
+
+        # Full-depth devices occupy both faces
+        units = rack.get_available_units(u_height=1, rack_face=DeviceFaceChoices.FACE_FRONT)
+        self.assertNotIn(9.5, units)
+        self.assertNotIn(10, units)
+        self.assertIn(20, units)
+        self.assertEqual(units[0], 1)
+        self.assertEqual(units[-1], 42)
+
+        # Half-depth devices occupy only their own face
+        units = rack.get_available_units(u_height=2, rack_face=DeviceFaceChoices.FACE_REAR)
+        self.assertIn(18, units)
+        for u in (18.5, 19, 20, 21.5):
+            self.assertNotIn(u, units)
+        self.assertIn(22, units)
+        self.assertEqual(units[-1], 41)
+        self.assertIn(20, rack.get_available_units(
+            u_height=2, rack_face=DeviceFaceChoices.FACE_REAR, exclude=[device2.pk]
+        ))
+
+        # Testing a single position agrees with the list of available units
+        occupancy = rack.get_occupancy()
+        for u_height, face in ((1, DeviceFaceChoices.FACE_FRONT), (2, DeviceFaceChoices.FACE_REAR), (2, None)):
+            units = rack.get_available_units(u_height=u_height, rack_face=face)
+            for position in drange(1, 43.5, 0.5):
+                self.assertEqual(
+                    occupancy.is_available(position, u_height=u_height, face=face), position in units, msg=position
+                )
+
+        # Available units follow the rack's unit numbering
+        rack.desc_units = True
+        units = rack.get_available_units(u_height=1)
+        self.assertEqual(units[0], 42)
+        self.assertEqual(units[-1], 1)
+
+    def test_get_utilization(self):
+        rack = Rack.objects.first()
+        attrs = {
+            'device_type': DeviceType.objects.get(model='Device Type 1'),
+            'device_role': DeviceRole.objects.first(),
+            'site': Site.objects.first(),
+            'rack': rack,
+            'face': DeviceFaceChoices.FACE_FRONT,
+        }
+        Device(name='Device 1', position=1, **attrs).save()
+        Device(name='Device 2', position=2, **attrs).save()
+        RackReservation.objects.create(
+            rack=rack,
+            units=[2, 3],
+            user=User.objects.create(username='User 1'),
+            description='Reservation 1'
+        )
+
+        # Units 1-3 are occupied or reserved
+        self.assertEqual(rack.get_utilization(), 6 / 84 * 100)
+
+    def test_update_stored_utilization(self):
+        site = Site.objects.first()
+        rack = Rack.objects.first()
+
+        # Install a device
+        with self.captureOnCommitCallbacks(execute=True):
+            device = Device.objects.create(
+                name='Device 1',
+                device_type=DeviceType.objects.get(model='Device Type 1'),
+                device_role=DeviceRole.objects.first(),
+                site=site,
+                rack=rack,
+                position=1,
+                face=DeviceFaceChoices.FACE_FRONT
+            )
+        rack.refresh_from_db()
+        self.assertEqual(rack._utilization, round(decimal.Decimal(2 / 84 * 100), 2))
+        self.assertEqual(rack._power_utilization, 0)
+
+        # Connect the device to a power feed within the rack
+        powerport = PowerPort.objects.create(device=device, name='Power Port 1', allocated_draw=960)
+        with self.captureOnCommitCallbacks(execute=True):
+            powerfeed = PowerFeed.objects.create(
+                power_panel=PowerPanel.objects.create(site=site, name='Power Panel 1'),
+                rack=rack,
+                name='Power Feed 1',
+                voltage=120,
+                amperage=20,
+                max_utilization=80
+            )
+            Cable(a_terminations=[powerport], b_terminations=[powerfeed]).save()
+        rack.refresh_from_db()
+        self.assertEqual(rack._power_utilization, 50)
+
+        # Change the power port's allocated draw
+        powerport.allocated_draw = 480
+        with self.captureOnCommitCallbacks(execute=True):
+            powerport.save()
+        rack.refresh_from_db()
+        self.assertEqual(rack._power_utilization, 25)
+
+        # Move the device to another rack and back again, saving the same instance each time
+        rack2 = Rack.objects.create(name='Rack 2', site=site, u_height=42)
+        for new_rack in (rack2, rack):
+            device.rack = new_rack
+            with self.captureOnCommitCallbacks(execute=True):
+                device.save()
+        rack2.refresh_from_db()
+        self.assertEqual(rack2._utilization, 0)
+
+        # Delete the device
+        with self.captureOnCommitCallbacks(execute=True):
+            device.delete()
+        rack.refresh_from_db()
+        self.assertEqual(rack._utilization, 0)
+        self.assertEqual(rack._power_utilization, 0)
+
+    def test_rolled_back_utilization_discarded(self):
+        rack1 = Rack.objects.first()
+        rack2 = Rack.objects.create(name='Rack 2', site=rack1.site, u_height=42)
+        # Discard any queue populated prior to the test
+        rack_utilization_queue.set(None)
+
+        with patch('dcim.utils.update_rack_utilization') as update_rack_utilization:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with transaction.atomic():
+                    rack1.save()
+                    rack1.save()
+                    transaction.set_rollback(True)
+                rack2.save()
+                rack2.save()
+        self.assertEqual(len(callbacks), 1)
+        update_rack_utilization.assert_called_once_with({rack2.pk})
+
+    def test_render_elevation(self):
+        site = Site.objects.first()
+        rack = Rack.objects.first()
+        manufacturer = Manufacturer.objects.first()
+        parent_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model='Parent Device Type', slug='parent-device-type',
+            subdevice_role=SubdeviceRoleChoices.ROLE_PARENT
+        )
+        DeviceBayTemplate.objects.create(device_type=parent_type, name='Device Bay 1')
+        DeviceBayTemplate.objects.create(device_type=parent_type, name='Device Bay 2')
+        child_type = DeviceType.objects.create(
+            manufacturer=manufacturer, model='Child Device Type', slug='child-device-type', u_height=0,
+            subdevice_role=SubdeviceRoleChoices.ROLE_CHILD
+        )
+        attrs = {
+            'device_role': DeviceRole.objects.first(),
+            'site': site,
+        }
+        parent = Device.objects.create(
+            name='Device 1', device_type=parent_type, rack=rack, position=1, face=DeviceFaceChoices.FACE_FRONT, **attrs
+        )
+        device_bay = parent.devicebays.get(name='Device Bay 1')
+        device_bay.installed_device = Device.objects.create(name='Device 2', device_type=child_type, **attrs)
+        device_bay.save()
+
+        # Installed child devices are counted along with the devices in the rack
+        drawing = RackElevationSVG(rack, include_images=False)
+        self.assertEqual([(d.devicebay_count, d.child_count) for d in drawing.devices], [(2, 1)])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_device_name(drawing.devices[0]), 'Device 1 (1/2)')
+        self.assertIn('Device 1 (1/2)', drawing.render(DeviceFaceChoices.FACE_FRONT).tostring())
+
     def test_change_rack_site(self):
         """
         Check that child Devices get updated when a Rack is moved to a new Site.
@@ -380,6 +581,254 @@ class DeviceTestCase(TestCase):
             name='Device Bay 1'
         )
 
+    def test_bulk_device_creation(self):
+        """
+        Ensure that components are instantiated for all Devices created in bulk.
+        """
+        device_type = DeviceType.objects.create(
+            manufacturer=Manufacturer.objects.first(), model='Test Device Type 2', slug='test-device-type-2'
+        )
+        ConsolePortTemplate.objects.create(device_type=device_type, name='Console Port 1')
+        ConsoleServerPortTemplate.objects.create(device_type=device_type, name='Console Server Port 1')
+        ModuleBayTemplate.objects.create(device_type=device_type, name='Module Bay 1')
+        power_port = PowerPortTemplate.objects.create(device_type=device_type, name='Power Port 1')
+        PowerOutletTemplate.objects.create(device_type=device_type, name='Power Outlet 1', power_port=power_port)
+        rear_port = RearPortTemplate.objects.create(
+            device_type=device_type, name='Rear Port 1', type=PortTypeChoices.TYPE_8P8C
+        )
+        FrontPortTemplate.objects.create(
+            device_type=device_type, name='Front Port 1', type=PortTypeChoices.TYPE_8P8C, rear_port=rear_port
+        )
+        bridge = InterfaceTemplate.objects.create(
+            device_type=device_type, name='Bridge 1', type=InterfaceTypeChoices.TYPE_BRIDGE
+        )
+        InterfaceTemplate.objects.create(
+            device_type=device_type, name='Interface 1', type=InterfaceTypeChoices.TYPE_1GE_FIXED, bridge=bridge
+        )
+        item_templates = (
+            InventoryItemTemplate(device_type=device_type, name='Inventory Item 1'),
+            InventoryItemTemplate(device_type=device_type, name='Inventory Item 2'),
+        )
+        for item_template in item_templates:
+            item_template.save()
+        InventoryItemTemplate(
+            device_type=device_type,
+            parent=item_templates[0],
+            name='Inventory Item 1A',
+            component=power_port
+        ).save()
+
+        with bulk_device_creation():
+            devices = [
+                Device.objects.create(
+                    site=Site.objects.first(),
+                    device_type=device_type,
+                    device_role=DeviceRole.objects.first(),
+                    name=f'Test Device {i}'
+                ) for i in range(1, 4)
+            ]
+            # Component instantiation is deferred until the block exits
+            self.assertFalse(Interface.objects.filter(device__in=devices).exists())
+
+            # Except for devices with device bays, whose components are instantiated immediately
+            parent_device = Device.objects.create(
+                site=Site.objects.first(),
+                device_type=DeviceType.objects.get(model='Test Device Type 1'),
+                device_role=DeviceRole.objects.first(),
+                name='Test Parent Device'
+            )
+            self.assertEqual(parent_device.devicebays.count(), 1)
+
+        for device in devices:
+            self.assertEqual(device.consoleports.count(), 1)
+            self.assertEqual(device.consoleserverports.count(), 1)
+            self.assertEqual(device.modulebays.count(), 1)
+            self.assertEqual(device.devicebays.count(), 0)
+            power_port = device.powerports.get()
+            self.assertEqual(device.poweroutlets.get().power_port, power_port)
+            rear_port = device.rearports.get()
+            self.assertEqual(device.frontports.get().rear_port, rear_port)
+            interface = device.interfaces.get(name='Interface 1')
+            self.assertEqual(interface.bridge, device.interfaces.get(name='Bridge 1'))
+
+            # Validate the inventory item trees
+            item1 = device.inventoryitems.get(name='Inventory Item 1')
+            item2 = device.inventoryitems.get(name='Inventory Item 2')
+            self.assertEqual(list(item1.get_children()), [device.inventoryitems.get(name='Inventory Item 1A')])
+            self.assertEqual(item1.get_children().get().component, power_port)
+            self.assertTrue(item2.is_leaf_node())
+            self.assertNotEqual(item1.tree_id, item2.tree_id)
+        self.assertEqual(InventoryItem.objects.values('tree_id').distinct().count(), 6)
+
+    def test_component_template_cache(self):
+        device_type = DeviceType.objects.create(
+            manufacturer=Manufacturer.objects.first(), model='Test Device Type 2', slug='test-device-type-2'
+        )
+        ConsolePortTemplate.objects.create(device_type=device_type, name='Console Port 1')
+        templates = get_component_templates([device_type])[device_type.pk]
+        self.assertEqual([t.name for t in templates[ConsolePortTemplate]], ['Console Port 1'])
+
+        # Templates should now be served from the cache
+        with self.assertNumQueries(0):
+            get_component_templates([device_type])
+
+        # Modifying a template invalidates the cache
+        ConsolePortTemplate.objects.create(device_type=device_type, name='Console Port 2')
+        templates = get_component_templates([device_type])[device_type.pk]
+        self.assertEqual([t.name for t in templates[ConsolePortTemplate]], ['Console Port 1', 'Console Port 2'])
+
+        # Templates modified using QuerySet.update() (which sends no signals) must be invalidated explicitly
+        ConsolePortTemplate.objects.filter(device_type=device_type).update(label='Label')
+        templates = get_component_templates([device_type])[device_type.pk]
+        self.assertEqual([t.label for t in templates[ConsolePortTemplate]], ['', ''])
+        invalidate_component_templates(DeviceType, [device_type.pk])
+        templates = get_component_templates([device_type])[device_type.pk]
+        self.assertEqual([t.label for t in templates[ConsolePortTemplate]], ['Label', 'Label'])
+
+    def test_update_child_devices(self):
+        """
+        Check that the site, location, and rack of a parent device are propagated to its child devices.
+        """
+        manufacturer = Manufacturer.objects.first()
+        parent_type = DeviceType.objects.create(
+            manufacturer=manufacturer,
+            model='Parent Device Type',
+            slug='parent-device-type',
+            subdevice_role=SubdeviceRoleChoices.ROLE_PARENT
+        )
+        DeviceBayTemplate.objects.create(device_type=parent_type, name='Bay 1')
+        DeviceBayTemplate.objects.create(device_type=parent_type, name='Bay 2')
+        child_type = DeviceType.objects.create(
+            manufacturer=manufacturer,
+            model='Child Device Type',
+            slug='child-device-type',
+            u_height=0,
+            subdevice_role=SubdeviceRoleChoices.ROLE_CHILD
+        )
+        site1 = Site.objects.first()
+        device_role = DeviceRole.objects.first()
+        parent = Device.objects.create(
+            site=site1, device_type=parent_type, device_role=device_role, name='Parent Device'
+        )
+        children = []
+        for device_bay in parent.devicebays.all():
+            child = Device.objects.create(
+                site=site1, device_type=child_type, device_role=device_role, name=f'Child {device_bay.name}'
+            )
+            device_bay.installed_device = child
+            device_bay.save()
+            children.append(child)
+
+        # Move the parent device to a rack in another site
+        site2 = Site.objects.create(name='Test Site 2', slug='test-site-2')
+        location = Location.objects.create(site=site2, name='Location 1', slug='location-1')
+        rack = Rack.objects.create(site=site2, location=location, name='Rack 1')
+        parent.site = site2
+        parent.rack = rack
+        request = RequestFactory().get('/')
+        request.id = uuid.uuid4()
+        request.user = User.objects.create(username='User 1')
+        receiver = Mock()
+        post_save.connect(receiver, sender=Device, weak=False)
+        self.addCleanup(post_save.disconnect, receiver, sender=Device)
+        with patch('extras.context_managers.flush_webhooks'), change_logging(request):
+            parent.save()
+
+        # post_save is sent once for each child device
+        self.assertCountEqual(
+            [call.kwargs['instance'].pk for call in receiver.call_args_list],
+            [parent.pk, *[child.pk for child in children]]
+        )
+        for call in receiver.call_args_list:
+            if call.kwargs['instance'].pk != parent.pk:
+                self.assertFalse(call.kwargs['created'])
+                self.assertIn('site', call.kwargs['update_fields'])
+
+        for child in children:
+            child.refresh_from_db()
+            self.assertEqual(child.site, site2)
+            self.assertEqual(child.location, location)
+            self.assertEqual(child.rack, rack)
+
+            # A single change is recorded for each child device, including its prior assignment
+            objectchange = ObjectChange.objects.get(
+                changed_object_type=ContentType.objects.get_for_model(Device),
+                changed_object_id=child.pk
+            )
+            self.assertEqual(objectchange.action, ObjectChangeActionChoices.ACTION_UPDATE)
+            self.assertEqual(objectchange.request_id, request.id)
+            self.assertEqual(objectchange.prechange_data['site'], site1.pk)
+            self.assertEqual(objectchange.postchange_data['site'], site2.pk)
+            self.assertEqual(objectchange.postchange_data['rack'], rack.pk)
+
+    def test_bulk_module_creation(self):
+        """
+        Ensure that components are instantiated (or adopted) for all Modules created in bulk.
+        """
+        module_type = ModuleType.objects.create(manufacturer=Manufacturer.objects.first(), model='Test Module Type 1')
+        power_port = PowerPortTemplate.objects.create(module_type=module_type, name='Power Port {module}')
+        PowerOutletTemplate.objects.create(
+            module_type=module_type, name='Power Outlet {module}', power_port=power_port
+        )
+        bridge = InterfaceTemplate.objects.create(
+            module_type=module_type, name='Bridge {module}', type=InterfaceTypeChoices.TYPE_BRIDGE
+        )
+        InterfaceTemplate.objects.create(
+            module_type=module_type, name='Interface {module}', type=InterfaceTypeChoices.TYPE_1GE_FIXED, bridge=bridge
+        )
+        device = Device.objects.create(
+            site=Site.objects.first(),
+            device_type=DeviceType.objects.first(),
+            device_role=DeviceRole.objects.first(),
+            name='Test Device 1'
+        )
+        module_bays = [
+            ModuleBay.objects.create(device=device, name=f'Slot {i}', position=str(i)) for i in range(1, 4)
+        ]
+
+        # Create an interface to be adopted
+        interface = Interface.objects.create(
+            device=device, name='Interface 1', type=InterfaceTypeChoices.TYPE_1GE_FIXED
+        )
+
+        with bulk_module_creation():
+            modules = []
+            for module_bay in module_bays:
+                module = Module(device=device, module_bay=module_bay, module_type=module_type)
+                module._adopt_components = True
+                module.save()
+                modules.append(module)
+            # Component instantiation is deferred until the block exits
+            self.assertFalse(Interface.objects.filter(module__in=modules).exists())
+
+        interface.refresh_from_db()
+        self.assertEqual(interface.module, modules[0])
+        for i, module in enumerate(modules, start=1):
+            self.assertEqual(module.poweroutlets.get().power_port, module.powerports.get())
+            bridge = module.interfaces.get(name=f'Bridge {i}')
+            self.assertEqual(module.interfaces.get(name=f'Interface {i}').bridge, bridge)
+
+    def test_bulk_module_creation_name_collision(self):
+        """
+        Ensure that Modules created in bulk cannot claim components of the same name on a device.
+        """
+        module_type = ModuleType.objects.create(manufacturer=Manufacturer.objects.first(), model='Test Module Type 1')
+        ConsolePortTemplate.objects.create(module_type=module_type, name='Console Port 1')
+        device = Device.objects.create(
+            site=Site.objects.first(),
+            device_type=DeviceType.objects.first(),
+            device_role=DeviceRole.objects.first(),
+            name='Test Device 1'
+        )
+        module_bays = [
+            ModuleBay.objects.create(device=device, name=f'Slot {i}', position=str(i)) for i in range(1, 3)
+        ]
+
+        with self.assertRaisesMessage(AbortRequest, 'ConsolePort - Console Port 1 already exists'):
+            with bulk_module_creation():
+                for module_bay in module_bays:
+                    Module.objects.create(device=device, module_bay=module_bay, module_type=module_type)
+
     def test_multiple_unnamed_devices(self):
 
         device1 = Device(
@@ -1734,6 +1734,45 @@ class DeviceTestCase(ViewTestCases.PrimaryObjectViewTestCase):
             'status': DeviceStatusChoices.STATUS_DECOMMISSIONING,
         }
 
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_import_parent_and_child_devices(self):
+        self.add_permissions('dcim.add_device')
+        manufacturer = Manufacturer.objects.first()
+        parent_type = DeviceType.objects.create(
+            manufacturer=manufacturer,
+            model='Parent Device Type',
+            slug='parent-device-type',
+            subdevice_role=SubdeviceRoleChoices.ROLE_PARENT
+        )
+        DeviceBayTemplate.objects.create(device_type=parent_type, name='Device Bay 1')
+        child_type = DeviceType.objects.create(
+            manufacturer=manufacturer,
+            model='Child Device Type',
+            slug='child-device-type',
+            u_height=0,
+            subdevice_role=SubdeviceRoleChoices.ROLE_CHILD
+        )
+        ConsolePortTemplate.objects.create(device_type=child_type, name='Console Port 1')
+
+        # Install a child device within a parent device created by an earlier row of the same import
+        csv_data = (
+            "device_role,manufacturer,device_type,status,name,site,parent,device_bay",
+            "Device Role 1,Manufacturer 1,Parent Device Type,active,Parent Device,Site 1,,",
+            "Device Role 1,Manufacturer 1,Child Device Type,active,Child Device,Site 1,Parent Device,Device Bay 1",
+        )
+        request = {
+            'path': self._get_url('import'),
+            'data': {
+                'data': '\n'.join(csv_data),
+                'format': ImportFormatChoices.CSV,
+            }
+        }
+        self.assertHttpStatus(self.client.post(**request), 302)
+
+        child_device = Device.objects.get(name='Child Device')
+        self.assertEqual(child_device.parent_bay.device.name, 'Parent Device')
+        self.assertEqual(child_device.consoleports.count(), 1)
+
     @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
     def test_device_consoleports(self):
         device = Device.objects.first()
@@ -2035,6 +2074,36 @@ class ModuleTestCase(
         self.assertEqual(Module.objects.count(), initial_count + len(csv_data) - 1)
         self.assertEqual(Interface.objects.filter(device=device).count(), 5)
 
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
+    def test_module_bulk_replication_name_collision(self):
+        self.add_permissions('dcim.add_module')
+
+        # Add an InterfaceTemplate with a fixed name to a ModuleType
+        module_type = ModuleType.objects.first()
+        InterfaceTemplate(module_type=module_type, name='Interface 1').save()
+
+        # Attempt to install two modules replicating the same interface into one device
+        device = Device.objects.get(name='Device 2')
+        csv_data = [
+            "device,module_bay,module_type,status,replicate_components",
+            f"{device.name},Module Bay 4,{module_type.model},active,true",
+            f"{device.name},Module Bay 5,{module_type.model},active,true",
+        ]
+        request = {
+            'path': self._get_url('import'),
+            'data': {
+                'data': '\n'.join(csv_data),
+                'format': ImportFormatChoices.CSV,
+            }
+        }
+
+        initial_count = Module.objects.count()
+        response = self.client.post(**request)
+        self.assertHttpStatus(response, 200)
+        self.assertContains(response, 'Interface - Interface 1 already exists')
+        self.assertEqual(Module.objects.count(), initial_count)
+        self.assertEqual(Interface.objects.filter(device=device).count(), 0)
+
     @override_settings(EXEMPT_VIEW_PERMISSIONS=['*'])
     def test_module_component_adoption(self):
         self.add_permissions('dcim.add_module')
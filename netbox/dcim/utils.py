@@ -1,22 +1,32 @@
 import itertools
+import logging
+from contextlib import contextmanager
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
+from django.db.models import Q
+
+from netbox.context import (
+    cablepath_queue, device_components_queue, module_components_queue, rack_utilization_queue,
+    synchronous_path_tracing,
+)
+from utilities.transactions import TransactionQueue
+from .constants import CABLEPATH_NODE_ID_BITS, CABLEPATH_NODE_ID_MASK
 
 
 def compile_path_node(ct_id, object_id):
-    return f'{ct_id}:{object_id}'
+    return (ct_id << CABLEPATH_NODE_ID_BITS) | object_id
 
 
 def decompile_path_node(repr):
-    ct_id, object_id = repr.split(':')
-    return int(ct_id), int(object_id)
+    return repr >> CABLEPATH_NODE_ID_BITS, repr & CABLEPATH_NODE_ID_MASK
 
 
 def object_to_path_node(obj):
     """
-    Return a representation of an object suitable for inclusion in a CablePath path. Node representation is in the
-    form <ContentType ID>:<Object ID>.
+    Return a representation of an object suitable for inclusion in a CablePath path. Nodes are represented as a single
+    integer, with the object's ContentType ID packed into the high bits and its ID into the low bits.
     """
     ct = ContentType.objects.get_for_model(obj)
     return compile_path_node(ct.pk, obj.pk)
@@ -24,7 +34,7 @@ def object_to_path_node(obj):
 
 def path_node_to_object(repr):
     """
-    Given the string representation of a path node, return the corresponding instance. If the object no longer
+    Given the representation of a path node, return the corresponding instance. If the object no longer
     exists, return None.
     """
     ct_id, object_id = decompile_path_node(repr)
@@ -32,15 +42,16 @@ def path_node_to_object(repr):
     return ct.model_class().objects.filter(pk=object_id).first()
 
 
-def create_cablepath(terminations):
+def create_cablepath(terminations, graph=None):
     """
     Create CablePaths for all paths originating from the specified set of nodes.
 
     :param terminations: Iterable of CableTermination objects
+    :param graph: A CableGraph from which to trace the path (optional)
     """
     from dcim.models import CablePath
 
-    cp = CablePath.from_origin(terminations)
+    cp = CablePath.from_origin(terminations, graph=graph)
     if cp:
         cp.save()
 
@@ -58,3 +69,267 @@ def rebuild_paths(terminations):
             for cp in cable_paths:
                 cp.delete()
                 create_cablepath(cp.origins)
+
+
+class CablePathQueue(TransactionQueue):
+    """
+    Collects the CablePath changes resulting from cable modifications within a transaction so that each affected path
+    is traced only once, when the transaction is committed.
+
+    `origins` maps sets of originating nodes from which new paths are to be created to their model; `nodes` holds the
+    nodes (e.g. cables or rear ports) whose existing paths must be retraced; `excluded_origins` holds nodes which must
+    be removed from the originating nodes of any retraced path (e.g. because their cable has been removed).
+    """
+    context_var = cablepath_queue
+
+    def __init__(self):
+        super().__init__()
+        self.origins = {}
+        self.nodes = set()
+        self.excluded_origins = set()
+
+    def __bool__(self):
+        return bool(self.origins or self.nodes)
+
+    def on_commit(self):
+        """
+        Flush the queue upon commit of the transaction for which it was created. As the transaction has already been
+        committed, any error is logged rather than raised (except in DEBUG mode). Paths left stale as a result can be
+        repaired using the trace_paths management command.
+        """
+        try:
+            super().on_commit()
+        except Exception:
+            if settings.DEBUG:
+                raise
+            logger = logging.getLogger('netbox.dcim.cable')
+            logger.exception("Failed to trace the cable paths affected by a committed transaction")
+
+    def add_origins(self, terminations):
+        ct = ContentType.objects.get_for_model(terminations[0])
+        self.origins[(ct.pk, tuple(t.pk for t in terminations))] = ct.model_class()
+
+    def flush(self):
+        """
+        Retrace all existing CablePaths which traverse a queued node, and create new CablePaths from all queued
+        origins. Each affected path is traced exactly once.
+        """
+        from dcim.graph import CableGraph
+        from dcim.models import CablePath
+
+        with transaction.atomic():
+
+            # Determine the origins of existing paths to be retraced
+            cablepaths = []
+            if self.nodes:
+                cablepaths = list(CablePath.objects.filter(_nodes__overlap=list(self.nodes)))
+                CablePath.prefetch_path_objects(cablepaths)
+                for cablepath in cablepaths:
+                    # An excluded origin which remains attached to the path's first link is retained, as the change
+                    # which excluded it may have been rolled back to a savepoint
+                    link_nodes = cablepath.path[1] if len(cablepath.path) > 1 else []
+                    for origin in list(cablepath.origins):
+                        if object_to_path_node(origin) not in self.excluded_origins:
+                            continue
+                        link = origin.link
+                        if link is None or object_to_path_node(link) not in link_nodes:
+                            cablepath.origins.remove(origin)
+
+            # Retrieve the origins of new paths anew to reflect any changes made since they were queued, ordered as they
+            # were originally specified
+            new_origins = []
+            for (ct_id, object_ids), model in self.origins.items():
+                terminations = {t.pk: t for t in model.objects.filter(pk__in=object_ids)}
+                new_origins.append([terminations[pk] for pk in object_ids if pk in terminations])
+
+            # Load the portion of the cable plant reachable from all origins once, and trace each path from it
+            graph = CableGraph([
+                *itertools.chain.from_iterable(cp.origins for cp in cablepaths),
+                *itertools.chain.from_iterable(new_origins),
+            ])
+            for cablepath in cablepaths:
+                cablepath.retrace(graph=graph)
+            for terminations in new_origins:
+                create_cablepath(terminations, graph=graph)
+
+
+def get_cablepath_queue():
+    """
+    Return the CablePathQueue for the current transaction (see TransactionQueue.get_current()). If synchronous tracing
+    has been enabled or no transaction is active, a new queue is returned instead, to be flushed immediately by schedule_cablepath_queue().
+    """
+    queue = None if synchronous_path_tracing.get() else CablePathQueue.get_current()
+    if queue is None:
+        return CablePathQueue()
+
+    return queue
+
+
+def schedule_cablepath_queue(queue):
+    """
+    Flush the given CablePathQueue immediately if it is not bound to a transaction (i.e. synchronous tracing has been
+    enabled or no transaction is active). Otherwise, it is flushed once the transaction has been committed.
+    """
+    if cablepath_queue.get() is not queue:
+        queue.flush()
+
+
+def enqueue_cablepath(terminations):
+    """
+    Schedule the creation of a CablePath originating from the specified set of nodes once the current transaction has
+    been committed.
+
+    :param terminations: Iterable of CableTermination objects
+    """
+    queue = get_cablepath_queue()
+    queue.add_origins(terminations)
+    schedule_cablepath_queue(queue)
+
+
+def enqueue_retrace(nodes, exclude_origins=None):
+    """
+    Schedule the retracing of all CablePaths which traverse the specified nodes once the current transaction has been
+    committed.
+
+    :param nodes: Iterable of path nodes (as returned by object_to_path_node())
+    :param exclude_origins: Iterable of path nodes to be removed from the originating nodes of any retraced path
+    """
+    queue = get_cablepath_queue()
+    queue.nodes.update(nodes)
+    queue.excluded_origins.update(exclude_origins or [])
+    schedule_cablepath_queue(queue)
+
+
+@contextmanager
+def synchronous_tracing():
+    """
+    Trace CablePaths immediately in response to cable changes, rather than deferring them until the current
+    transaction has been committed. Intended for code which must inspect the resulting paths prior to committing.
+    """
+    token = synchronous_path_tracing.set(True)
+    try:
+        yield
+    finally:
+        synchronous_path_tracing.reset(token)
+
+
+@contextmanager
+def bulk_device_creation():
+    """
+    Defer the instantiation of components for Devices created within the block until it exits, at which point the
+    components of all new devices are created in bulk. Change logging and search caching for all new objects are
+    likewise processed in bulk. Intended to wrap the creation of many devices within a single transaction.
+    """
+    from dcim.models.devices import instantiate_device_components
+    from extras.context_managers import deferred_change_logging
+
+    with deferred_change_logging():
+        token = device_components_queue.set([])
+        try:
+            yield
+            devices = device_components_queue.get()
+        finally:
+            device_components_queue.reset(token)
+
+        instantiate_device_components(devices)
+
+
+@contextmanager
+def bulk_module_creation():
+    """
+    Defer the instantiation and adoption of components for Modules created within the block until it exits, at which
+    point the components of all new modules are resolved in bulk. Change logging and search caching for all new
+    objects are likewise processed in bulk.
+    """
+    from dcim.models.devices import instantiate_module_components
+    from extras.context_managers import deferred_change_logging
+
+    with deferred_change_logging():
+        token = module_components_queue.set([])
+        try:
+            yield
+            modules = module_components_queue.get()
+        finally:
+            module_components_queue.reset(token)
+
+        instantiate_module_components(modules)
+
+
+def update_rack_utilization(rack_ids):
+    """
+    Recalculate and store the space and power utilization of the specified racks. Installed devices and reservations
+    for all racks are retrieved in bulk.
+
+    :param rack_ids: Iterable of Rack IDs
+    """
+    from dcim.models import Rack, RackReservation
+    from dcim.occupancy import get_rack_occupancies
+
+    racks = list(Rack.objects.filter(pk__in=rack_ids))
+    occupancies = get_rack_occupancies(racks)
+    for rack_id, units in RackReservation.objects.filter(rack__in=racks).values_list('rack_id', 'units'):
+        occupancies[rack_id].reserve(units)
+
+    for rack in racks:
+        rack._utilization = round(occupancies[rack.pk].get_utilization(), 2)
+        rack._power_utilization = rack.get_power_utilization()
+    Rack.objects.bulk_update(racks, fields=['_utilization', '_power_utilization'])
+
+
+def get_power_feed_rack_ids(cable_ids):
+    """
+    Return the IDs of all racks containing a PowerFeed which supplies power via any of the specified cables, either
+    directly or through a PowerPort feeding a PowerOutlet attached to one of the cables.
+
+    :param cable_ids: Iterable of Cable IDs
+    """
+    from dcim.models import PowerFeed, PowerPort
+
+    cable_ids = {pk for pk in cable_ids if pk}
+    if not cable_ids:
+        return set()
+    upstream_cable_ids = PowerPort.objects.filter(
+        poweroutlets__cable__in=cable_ids,
+        cable__isnull=False
+    ).values('cable_id')
+
+    return set(PowerFeed.objects.filter(
+        Q(cable__in=cable_ids) | Q(cable__in=upstream_cable_ids),
+        rack__isnull=False
+    ).values_list('rack_id', flat=True))
+
+
+class RackUtilizationQueue(TransactionQueue):
+    """
+    Collects the IDs of racks whose utilization is to be recalculated once the current transaction has been committed.
+    """
+    context_var = rack_utilization_queue
+
+    def __init__(self):
+        super().__init__()
+        self.rack_ids = set()
+
+    def __bool__(self):
+        return bool(self.rack_ids)
+
+    def flush(self):
+        update_rack_utilization(self.rack_ids)
+
+
+def enqueue_rack_utilization(rack_ids):
+    """
+    Schedule the recalculation of the space and power utilization of the specified racks once the current transaction
+    has been committed. Each rack is updated only once per transaction. If no transaction is active, the racks are
+    updated immediately.
+
+    :param rack_ids: Iterable of Rack IDs (null values are ignored)
+    """
+    rack_ids = {pk for pk in rack_ids if pk}
+    if not rack_ids:
+        return
+
+    queue = RackUtilizationQueue.get_current()
+    if queue is None:
+        update_rack_utilization(rack_ids)
+    else:
+        queue.rack_ids.update(rack_ids)
@@ -30,6 +30,7 @@ from virtualization.models import VirtualMachine
 from . import filtersets, forms, tables
 from .choices import DeviceFaceChoices
 from .models import *
+from .utils import bulk_device_creation, bulk_module_creation
 
 CABLE_TERMINATION_TYPES = {
     'dcim.consoleport': ConsolePort,
@@ -2088,6 +2089,11 @@ class DeviceBulkImportView(generic.BulkImportView):
     queryset = Device.objects.all()
     model_form = forms.DeviceImportForm
 
+    def create_and_update_objects(self, form, request):
+        # Instantiate the components of all new devices in bulk
+        with bulk_device_creation():
+            return super().create_and_update_objects(form, request)
+
     def save_object(self, object_form, request):
         obj = object_form.save()
 
@@ -2170,6 +2176,11 @@ class ModuleBulkImportView(generic.BulkImportView):
     queryset = Module.objects.all()
     model_form = forms.ModuleImportForm
 
+    def create_and_update_objects(self, form, request):
+        # Instantiate the components of all new modules in bulk
+        with bulk_module_creation():
+            return super().create_and_update_objects(form, request)
+
 
 class ModuleBulkEditView(generic.BulkEditView):
     queryset = Module.objects.prefetch_related('module_type__manufacturer')
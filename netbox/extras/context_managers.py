@@ -1,7 +1,11 @@
+from collections import defaultdict
 from contextlib import contextmanager
 
-from netbox.context import current_request, webhooks_queue
-from .webhooks import flush_webhooks
+from django_prometheus.models import model_inserts
+
+from netbox.context import cablepath_queue, current_request, deferred_changes_queue, webhooks_queue
+from .choices import ObjectChangeActionChoices
+from .webhooks import enqueue_object, flush_webhooks
 
 
 @contextmanager
@@ -14,12 +18,101 @@ def change_logging(request):
     """
     current_request.set(request)
     webhooks_queue.set([])
+    cablepath_queue.set(None)
 
     yield
 
     # Flush queued webhooks to RQ
     flush_webhooks(webhooks_queue.get())
 
-    # Clear context vars
+    # Clear context vars. A CablePathQueue remaining at this point belongs to a transaction which was rolled back.
     current_request.set(None)
     webhooks_queue.set([])
+    cablepath_queue.set(None)
+
+
+@contextmanager
+def deferred_change_logging():
+    """
+    Defer the change logging and search caching of objects created within the block until it exits, at which point
+    they are processed in bulk for each model. Subsequent changes to those objects within the block are folded into
+    the creation record. Nothing is recorded if an exception is raised.
+    """
+    # Defer to the enclosing context (if any)
+    if deferred_changes_queue.get() is not None:
+        yield
+        return
+
+    token = deferred_changes_queue.set({})
+    try:
+        yield
+        instances = list(deferred_changes_queue.get().values())
+    finally:
+        deferred_changes_queue.reset(token)
+
+    record_created_objects(instances)
+
+
+def defer_object_change(instance, created=False):
+    """
+    Called by post_save receivers. If change logging has been deferred, queue the given instance (if it was created
+    within the deferred context) and return True. Otherwise, return False.
+    """
+    queue = deferred_changes_queue.get()
+    if queue is None:
+        return False
+
+    key = (instance._meta.label_lower, instance.pk)
+    if created:
+        queue[key] = instance
+    return key in queue
+
+
+def discard_deferred_object(instance):
+    """
+    Called by deletion receivers. If change logging has been deferred and the given instance was created within the
+    deferred context, remove it from the queue (so that nothing is recorded for it) and return True. Otherwise, return
+    False.
+    """
+    queue = deferred_changes_queue.get()
+    if not queue:
+        return False
+
+    return queue.pop((instance._meta.label_lower, instance.pk), None) is not None
+
+
+def record_created_objects(instances):
+    """
+    Cache the search values of, and record a change (and any webhooks) for, each of the given newly created objects.
+    Objects are processed in bulk for each model.
+    """
+    from netbox.search.backends import search_backend
+    from .models import ObjectChange
+
+    request = current_request.get()
+
+    objects_by_model = defaultdict(list)
+    for instance in instances:
+        objects_by_model[instance._meta.model].append(instance)
+
+    for model, objects in objects_by_model.items():
+        search_backend.cache(objects, remove_existing=False)
+
+        if request is None or not hasattr(model, 'to_objectchange'):
+            continue
+
+        objectchanges = []
+        for instance in objects:
+            objectchange = instance.to_objectchange(ObjectChangeActionChoices.ACTION_CREATE)
+            objectchange.user = request.user
+            objectchange.user_name = request.user.username
+            objectchange.request_id = request.id
+            objectchanges.append(objectchange)
+        ObjectChange.objects.bulk_create(objectchanges)
+
+        queue = webhooks_queue.get()
+        for instance in objects:
+            enqueue_object(queue, instance, request.user, request.id, ObjectChangeActionChoices.ACTION_CREATE)
+        webhooks_queue.set(queue)
+
+        model_inserts.labels(model._meta.model_name).inc(len(objects))
@@ -11,6 +11,7 @@ from netbox.config import get_config
 from netbox.context import current_request, webhooks_queue
 from netbox.signals import post_clean
 from .choices import ObjectChangeActionChoices
+from .context_managers import defer_object_change, discard_deferred_object
 from .models import ConfigRevision, CustomField, ObjectChange
 from .webhooks import enqueue_object, get_snapshots, serialize_for_webhook
 
@@ -49,6 +50,10 @@ def handle_changed_object(sender, instance, **kwargs):
     if request is None:
         return
 
+    # Objects created while change logging is deferred are recorded in bulk (see deferred_change_logging())
+    if defer_object_change(instance, created=kwargs.get('created', False)):
+        return
+
     # Determine the type of change being made
     if kwargs.get('created'):
         action = ObjectChangeActionChoices.ACTION_CREATE
@@ -104,6 +109,10 @@ def handle_deleted_object(sender, instance, **kwargs):
     if request is None:
         return
 
+    # Objects created while change logging is deferred have yet to be recorded
+    if discard_deferred_object(instance):
+        return
+
     # Record an ObjectChange if applicable
     if hasattr(instance, 'to_objectchange'):
         if hasattr(instance, 'snapshot') and not getattr(instance, '_prechange_snapshot', None):
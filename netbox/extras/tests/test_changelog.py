@@ -1,11 +1,17 @@
+import uuid
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from rest_framework import status
 
 from dcim.choices import SiteStatusChoices
 from dcim.models import Site
 from extras.choices import *
-from extras.models import CustomField, ObjectChange, Tag
+from extras.context_managers import change_logging, deferred_change_logging
+from extras.models import CachedValue, CustomField, ObjectChange, Tag
 from utilities.testing import APITestCase
 from utilities.testing.utils import create_tags, post_data
 from utilities.testing.views import ModelViewTestCase
@@ -443,3 +449,33 @@ class ChangeLogAPITest(APITestCase):
         self.assertEqual(objectchange.prechange_data['name'], 'Site 1')
         self.assertEqual(objectchange.prechange_data['slug'], 'site-1')
         self.assertEqual(objectchange.postchange_data, None)
+
+
+class DeferredChangeLoggingTest(TestCase):
+
+    def test_deleted_objects_discarded(self):
+        """
+        Objects created and then deleted while change logging is deferred should not be recorded.
+        """
+        request = RequestFactory().get('/')
+        request.id = uuid.uuid4()
+        request.user = User.objects.create(username='User 1')
+
+        with patch('extras.context_managers.flush_webhooks') as flush_webhooks:
+            with change_logging(request):
+                with deferred_change_logging():
+                    site1 = Site.objects.create(name='Site 1', slug='site-1')
+                    site2 = Site.objects.create(name='Site 2', slug='site-2')
+                    site2_pk = site2.pk
+                    site2.delete()
+
+        self.assertEqual(
+            list(ObjectChange.objects.values_list('changed_object_id', 'action')),
+            [(site1.pk, ObjectChangeActionChoices.ACTION_CREATE)]
+        )
+        self.assertTrue(CachedValue.objects.filter(object_id=site1.pk).exists())
+        self.assertFalse(CachedValue.objects.filter(object_id=site2_pk).exists())
+        webhooks = flush_webhooks.call_args.args[0]
+        self.assertEqual([(data['event'], data['data']['id']) for data in webhooks], [
+            (ObjectChangeActionChoices.ACTION_CREATE, site1.pk),
+        ])
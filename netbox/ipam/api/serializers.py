@@ -4,7 +4,7 @@ from rest_framework import serializers
 
 from dcim.api.nested_serializers import NestedDeviceSerializer, NestedSiteSerializer
 from ipam.choices import *
-from ipam.constants import IPADDRESS_ASSIGNMENT_MODELS, VLANGROUP_SCOPE_TYPES
+from ipam.constants import IPADDRESS_ASSIGNMENT_MODELS, PREFIX_LOOKUP_MAX_ADDRESSES, VLANGROUP_SCOPE_TYPES
 from ipam.models import *
 from netbox.api.fields import ChoiceField, ContentTypeField, SerializedPKRelatedField
 from netbox.api.serializers import NetBoxModelSerializer
@@ -305,13 +305,14 @@ class PrefixSerializer(NetBoxModelSerializer):
     children = serializers.IntegerField(read_only=True)
     _depth = serializers.IntegerField(read_only=True)
     prefix = serializers.CharField()
+    utilization = serializers.DecimalField(source='_utilization', max_digits=5, decimal_places=2, read_only=True)
 
     class Meta:
         model = Prefix
         fields = [
             'id', 'url', 'display', 'family', 'prefix', 'site', 'vrf', 'tenant', 'vlan', 'status', 'role', 'is_pool',
-            'mark_utilized', 'description', 'comments', 'tags', 'custom_fields', 'created', 'last_updated', 'children',
-            '_depth',
+            'mark_utilized', 'utilization', 'description', 'comments', 'tags', 'custom_fields', 'created',
+            'last_updated', 'children', '_depth',
         ]
         read_only_fields = ['family']
 
@@ -363,6 +364,64 @@ class AvailablePrefixSerializer(serializers.Serializer):
         }
 
 
+class PrefixLookupSerializer(serializers.Serializer):
+    """
+    A set of IP addresses to be resolved to the most specific prefixes containing them within a VRF.
+    """
+    addresses = serializers.ListField(
+        child=IPAddressField(),
+        allow_empty=False,
+        max_length=PREFIX_LOOKUP_MAX_ADDRESSES
+    )
+    vrf = serializers.PrimaryKeyRelatedField(
+        queryset=VRF.objects.all(),
+        required=False,
+        allow_null=True,
+        default=None
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Limit the VRF to those which the user is permitted to view
+        request = self.context.get('request')
+        if request is not None:
+            self.fields['vrf'].queryset = VRF.objects.restrict(request.user, 'view')
+
+
+class PrefixLookupResultSerializer(serializers.Serializer):
+    """
+    Representation of the most specific prefix containing an IP address, given as an (address, Prefix) tuple.
+    """
+    address = serializers.CharField(read_only=True)
+    prefix = NestedPrefixSerializer(read_only=True, allow_null=True)
+    vrf = NestedVRFSerializer(read_only=True, allow_null=True)
+    site = NestedSiteSerializer(read_only=True, allow_null=True)
+    tenant = NestedTenantSerializer(read_only=True, allow_null=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Many addresses typically resolve to the same prefix, so each prefix is serialized only once
+        self._prefix_data = {
+            None: {'prefix': None, 'vrf': None, 'site': None, 'tenant': None},
+        }
+
+    def to_representation(self, instance):
+        address, prefix = instance
+        pk = prefix.pk if prefix is not None else None
+        if pk not in self._prefix_data:
+            context = {'request': self.context['request']}
+            self._prefix_data[pk] = {
+                'prefix': NestedPrefixSerializer(prefix, context=context).data,
+                'vrf': NestedVRFSerializer(prefix.vrf, context=context).data if prefix.vrf else None,
+                'site': NestedSiteSerializer(prefix.site, context=context).data if prefix.site else None,
+                'tenant': NestedTenantSerializer(prefix.tenant, context=context).data if prefix.tenant else None,
+            }
+        return {
+            'address': str(address),
+            **self._prefix_data[pk],
+        }
+
+
 #
 # IP ranges
 #
@@ -376,13 +435,15 @@ class IPRangeSerializer(NetBoxModelSerializer):
     tenant = NestedTenantSerializer(required=False, allow_null=True)
     status = ChoiceField(choices=IPRangeStatusChoices, required=False)
     role = NestedRoleSerializer(required=False, allow_null=True)
+    utilization = serializers.DecimalField(source='_utilization', max_digits=5, decimal_places=2, read_only=True)
 
     class Meta:
         model = IPRange
         fields = [
             'id', 'url', 'display', 'family', 'start_address', 'end_address', 'size', 'vrf', 'tenant', 'status', 'role',
             'description', 'comments', 'tags', 'custom_fields', 'created', 'last_updated',
-            'mark_utilized', 'description', 'comments', 'tags', 'custom_fields', 'created', 'last_updated',
+            'mark_utilized', 'utilization', 'description', 'comments', 'tags', 'custom_fields', 'created',
+            'last_updated',
         ]
         read_only_fields = ['family']
 
@@ -44,6 +44,11 @@ urlpatterns = [
         views.AvailablePrefixesView.as_view(),
         name='prefix-available-prefixes'
     ),
+    path(
+        'prefixes/lookup/',
+        views.PrefixLookupView.as_view(),
+        name='prefix-lookup'
+    ),
     path(
         'prefixes/<int:pk>/available-ips/',
         views.PrefixAvailableIPAddressesView.as_view(),
@@ -1,9 +1,14 @@
-from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+import itertools
+
+import netaddr
+from django.core.exceptions import FieldError, ObjectDoesNotExist, PermissionDenied
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django_pglocks import advisory_lock
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.routers import APIRootView
 from rest_framework.views import APIView
@@ -12,10 +17,12 @@ from circuits.models import Provider
 from dcim.models import Site
 from ipam import filtersets
 from ipam.models import *
+from ipam.prefix_index import get_prefix_index
+from ipam.utils import advisory_locks, get_advisory_lock_id, get_prefix_locks
+from netbox.api.authentication import LookupPermissions
 from netbox.api.viewsets import NetBoxModelViewSet
 from netbox.api.viewsets.mixins import ObjectValidationMixin
 from netbox.config import get_config
-from netbox.constants import ADVISORY_LOCK_KEYS
 from utilities.utils import count_related
 from . import serializers
 from ipam.models import L2VPN, L2VPNTermination
@@ -118,17 +125,54 @@ class IPAddressViewSet(NetBoxModelViewSet):
     serializer_class = serializers.IPAddressSerializer
     filterset_class = filtersets.IPAddressFilterSet
 
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-ips'])
+    def get_locks(self, data=None, pk=None):
+        """
+        Return the advisory locks covering the IP addresses being created, modified, or deleted: those specified in
+        the request data, and/or the current address of the IP with the given ID.
+        """
+        addresses = []
+        current_vrf_id = None
+        if pk is not None:
+            for address, current_vrf_id in IPAddress.objects.filter(pk=pk).values_list('address', 'vrf_id'):
+                addresses.append((address, current_vrf_id))
+        for item in data if isinstance(data, list) else [data]:
+            try:
+                address = netaddr.IPNetwork(item['address'])
+            except (KeyError, TypeError, ValueError, netaddr.AddrFormatError):
+                # Invalid data is rejected by the serializer
+                continue
+            addresses.append((address, self.get_vrf_id(item['vrf']) if 'vrf' in item else current_vrf_id))
+        return get_prefix_locks('available-ips', [
+            (netaddr.IPRange(address.ip, address.ip), vrf_id) for address, vrf_id in addresses
+        ])
+
+    @staticmethod
+    def get_vrf_id(value):
+        """
+        Return the ID of the VRF specified in request data (by ID or by attributes), or None.
+        """
+        if isinstance(value, dict):
+            try:
+                return VRF.objects.filter(**value).values_list('pk', flat=True).first()
+            except (FieldError, TypeError, ValueError):
+                # Invalid data is rejected by the serializer
+                return None
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
+        with advisory_locks(self.get_locks(data=request.data)):
+            return super().create(request, *args, **kwargs)
 
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-ips'])
     def update(self, request, *args, **kwargs):
-        return super().update(request, *args, **kwargs)
+        with advisory_locks(self.get_locks(data=request.data, pk=kwargs.get('pk'))):
+            return super().update(request, *args, **kwargs)
 
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-ips'])
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
+        with advisory_locks(self.get_locks(pk=kwargs.get('pk'))):
+            return super().destroy(request, *args, **kwargs)
 
 
 class FHRPGroupViewSet(NetBoxModelViewSet):
@@ -225,51 +269,52 @@ class AvailableASNsView(ObjectValidationMixin, APIView):
         return Response(serializer.data)
 
     @extend_schema(methods=["post"], responses={201: serializers.ASNSerializer(many=True)})
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-asns'])
     def post(self, request, pk):
         self.queryset = self.queryset.restrict(request.user, 'add')
         asnrange = get_object_or_404(ASNRange.objects.restrict(request.user), pk=pk)
 
-        # Normalize to a list of objects
-        requested_asns = request.data if isinstance(request.data, list) else [request.data]
-
-        # Determine if the requested number of IPs is available
-        available_asns = asnrange.get_available_asns()
-        if len(available_asns) < len(requested_asns):
-            return Response(
-                {
-                    "detail": f"An insufficient number of ASNs are available within {asnrange} "
-                              f"({len(requested_asns)} requested, {len(available_asns)} available)"
-                },
-                status=status.HTTP_409_CONFLICT
-            )
+        # Lock the ASN range being allocated from
+        with advisory_lock(get_advisory_lock_id('available-asns', asnrange.pk)):
+            # Normalize to a list of objects
+            requested_asns = request.data if isinstance(request.data, list) else [request.data]
 
-        # Assign ASNs from the list of available IPs and copy VRF assignment from the parent
-        for i, requested_asn in enumerate(requested_asns):
-            requested_asn.update({
-                'rir': asnrange.rir.pk,
-                'range': asnrange.pk,
-                'asn': available_asns[i],
-            })
-
-        # Initialize the serializer with a list or a single object depending on what was requested
-        context = {'request': request}
-        if isinstance(request.data, list):
-            serializer = serializers.ASNSerializer(data=requested_asns, many=True, context=context)
-        else:
-            serializer = serializers.ASNSerializer(data=requested_asns[0], context=context)
+            # Determine if the requested number of IPs is available
+            available_asns = asnrange.get_available_asns()
+            if len(available_asns) < len(requested_asns):
+                return Response(
+                    {
+                        "detail": f"An insufficient number of ASNs are available within {asnrange} "
+                                  f"({len(requested_asns)} requested, {len(available_asns)} available)"
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
 
-        # Create the new IP address(es)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    created = serializer.save()
-                    self._validate_objects(created)
-            except ObjectDoesNotExist:
-                raise PermissionDenied()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Assign ASNs from the list of available IPs and copy VRF assignment from the parent
+            for i, requested_asn in enumerate(requested_asns):
+                requested_asn.update({
+                    'rir': asnrange.rir.pk,
+                    'range': asnrange.pk,
+                    'asn': available_asns[i],
+                })
+
+            # Initialize the serializer with a list or a single object depending on what was requested
+            context = {'request': request}
+            if isinstance(request.data, list):
+                serializer = serializers.ASNSerializer(data=requested_asns, many=True, context=context)
+            else:
+                serializer = serializers.ASNSerializer(data=requested_asns[0], context=context)
+
+            # Create the new IP address(es)
+            if serializer.is_valid():
+                try:
+                    with transaction.atomic():
+                        created = serializer.save()
+                        self._validate_objects(created)
+                except ObjectDoesNotExist:
+                    raise PermissionDenied()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -284,9 +329,9 @@ class AvailablePrefixesView(ObjectValidationMixin, APIView):
     @extend_schema(methods=["get"], responses={200: serializers.AvailablePrefixSerializer(many=True)})
     def get(self, request, pk):
         prefix = get_object_or_404(Prefix.objects.restrict(request.user), pk=pk)
-        available_prefixes = prefix.get_available_prefixes()
+        available_prefixes = prefix.iter_available_prefixes(batch_size=None)
 
-        serializer = serializers.AvailablePrefixSerializer(available_prefixes.iter_cidrs(), many=True, context={
+        serializer = serializers.AvailablePrefixSerializer(list(available_prefixes), many=True, context={
             'request': request,
             'vrf': prefix.vrf,
         })
@@ -294,67 +339,61 @@ class AvailablePrefixesView(ObjectValidationMixin, APIView):
         return Response(serializer.data)
 
     @extend_schema(methods=["post"], responses={201: serializers.PrefixSerializer(many=True)})
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-prefixes'])
     def post(self, request, pk):
         self.queryset = self.queryset.restrict(request.user, 'add')
         prefix = get_object_or_404(Prefix.objects.restrict(request.user), pk=pk)
-        available_prefixes = prefix.get_available_prefixes()
-
-        # Validate Requested Prefixes' length
-        serializer = serializers.PrefixLengthSerializer(
-            data=request.data if isinstance(request.data, list) else [request.data],
-            many=True,
-            context={
-                'request': request,
-                'prefix': prefix,
-            }
-        )
-        if not serializer.is_valid():
-            return Response(
-                serializer.errors,
-                status=status.HTTP_400_BAD_REQUEST
+
+        # Lock the prefix being allocated from (see get_prefix_locks())
+        with advisory_locks(get_prefix_locks('available-prefixes', [(prefix.prefix, prefix.vrf_id)])):
+            # Validate Requested Prefixes' length
+            serializer = serializers.PrefixLengthSerializer(
+                data=request.data if isinstance(request.data, list) else [request.data],
+                many=True,
+                context={
+                    'request': request,
+                    'prefix': prefix,
+                }
             )
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors,
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        requested_prefixes = serializer.validated_data
-        # Allocate prefixes to the requested objects based on availability within the parent
-        for i, requested_prefix in enumerate(requested_prefixes):
-
-            # Find the first available prefix equal to or larger than the requested size
-            for available_prefix in available_prefixes.iter_cidrs():
-                if requested_prefix['prefix_length'] >= available_prefix.prefixlen:
-                    allocated_prefix = '{}/{}'.format(available_prefix.network, requested_prefix['prefix_length'])
-                    requested_prefix['prefix'] = allocated_prefix
-                    requested_prefix['vrf'] = prefix.vrf.pk if prefix.vrf else None
-                    break
-            else:
+            requested_prefixes = serializer.validated_data
+            # Allocate prefixes to the requested objects based on availability within the parent
+            allocated_prefixes = prefix.get_first_available_prefixes(
+                [requested_prefix['prefix_length'] for requested_prefix in requested_prefixes]
+            )
+            if any(allocated_prefix is None for allocated_prefix in allocated_prefixes):
                 return Response(
                     {
                         "detail": "Insufficient space is available to accommodate the requested prefix size(s)"
                     },
                     status=status.HTTP_409_CONFLICT
                 )
+            for requested_prefix, allocated_prefix in zip(requested_prefixes, allocated_prefixes):
+                requested_prefix['prefix'] = str(allocated_prefix)
+                requested_prefix['vrf'] = prefix.vrf.pk if prefix.vrf else None
+
+            # Initialize the serializer with a list or a single object depending on what was requested
+            context = {'request': request}
+            if isinstance(request.data, list):
+                serializer = serializers.PrefixSerializer(data=requested_prefixes, many=True, context=context)
+            else:
+                serializer = serializers.PrefixSerializer(data=requested_prefixes[0], context=context)
 
-            # Remove the allocated prefix from the list of available prefixes
-            available_prefixes.remove(allocated_prefix)
-
-        # Initialize the serializer with a list or a single object depending on what was requested
-        context = {'request': request}
-        if isinstance(request.data, list):
-            serializer = serializers.PrefixSerializer(data=requested_prefixes, many=True, context=context)
-        else:
-            serializer = serializers.PrefixSerializer(data=requested_prefixes[0], context=context)
-
-        # Create the new Prefix(es)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    created = serializer.save()
-                    self._validate_objects(created)
-            except ObjectDoesNotExist:
-                raise PermissionDenied()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Create the new Prefix(es)
+            if serializer.is_valid():
+                try:
+                    with transaction.atomic():
+                        created = serializer.save()
+                        self._validate_objects(created)
+                except ObjectDoesNotExist:
+                    raise PermissionDenied()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -363,23 +402,86 @@ class AvailablePrefixesView(ObjectValidationMixin, APIView):
         return serializers.PrefixLengthSerializer
 
 
+class PrefixLookupView(APIView):
+    """
+    Resolve each of the specified IP addresses to the most specific prefix visible to the user which contains it within
+    a VRF (or the global table). Addresses are resolved using the in-memory PrefixIndex. Addresses for which no prefix
+    visible to the user is found resolve to null.
+    """
+    queryset = Prefix.objects.all()
+    permission_classes = [LookupPermissions]
+
+    @extend_schema(
+        methods=["post"],
+        request=serializers.PrefixLookupSerializer,
+        responses={200: serializers.PrefixLookupResultSerializer(many=True)}
+    )
+    def post(self, request):
+        serializer = serializers.PrefixLookupSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        addresses = [address.ip for address in serializer.validated_data['addresses']]
+        vrf = serializer.validated_data['vrf']
+
+        # Find all prefixes containing each address, from most to least specific, and resolve each address to the
+        # first of these which the user is permitted to view
+        index = get_prefix_index()
+        candidates = {
+            address: [entry.pk for entry in index.iter_matches(address, vrf_id=vrf.pk if vrf else None)]
+            for address in set(addresses)
+        }
+        prefixes = Prefix.objects.restrict(request.user, 'view').select_related(
+            'vrf', 'site', 'tenant'
+        ).in_bulk({pk for pks in candidates.values() for pk in pks})
+
+        results = [
+            (address, next((prefixes[pk] for pk in candidates[address] if pk in prefixes), None))
+            for address in addresses
+        ]
+        serializer = serializers.PrefixLookupResultSerializer(results, many=True, context={'request': request})
+
+        return Response(serializer.data)
+
+
 class AvailableIPAddressesView(ObjectValidationMixin, APIView):
     queryset = IPAddress.objects.all()
 
     def get_parent(self, request, pk):
         raise NotImplemented()
 
-    @extend_schema(methods=["get"], responses={200: serializers.AvailableIPSerializer(many=True)})
+    @extend_schema(
+        methods=["get"],
+        parameters=[
+            OpenApiParameter(
+                name='start_after',
+                location='query',
+                description='Return only IP addresses following this address',
+                type=OpenApiTypes.STR
+            ),
+            OpenApiParameter(
+                name='offset',
+                location='query',
+                description='The number of available IP addresses to skip',
+                type=OpenApiTypes.INT
+            ),
+        ],
+        responses={200: serializers.AvailableIPSerializer(many=True)}
+    )
     def get(self, request, pk):
         parent = self.get_parent(request, pk)
         limit = get_results_limit(request)
-
-        # Calculate available IPs within the parent
-        ip_list = []
-        for index, ip in enumerate(parent.get_available_ips(), start=1):
-            ip_list.append(ip)
-            if index == limit:
-                break
+        try:
+            start_after = request.query_params.get('start_after')
+            start_after = netaddr.IPNetwork(start_after).ip if start_after else None
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except (netaddr.AddrFormatError, ValueError):
+            raise ValidationError("Invalid start_after or offset parameter")
+
+        # Calculate available IPs within the parent. Available ranges are retrieved only as needed to fill the page.
+        if limit:
+            ip_list = parent.get_first_available_ips(limit, start_after=start_after, offset=offset)
+        else:
+            ip_list = list(parent.iter_available_ips(start_after=start_after, offset=offset))
         serializer = serializers.AvailableIPSerializer(ip_list, many=True, context={
             'request': request,
             'parent': parent,
@@ -389,49 +491,51 @@ class AvailableIPAddressesView(ObjectValidationMixin, APIView):
         return Response(serializer.data)
 
     @extend_schema(methods=["post"], responses={201: serializers.IPAddressSerializer(many=True)})
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-ips'])
     def post(self, request, pk):
         self.queryset = self.queryset.restrict(request.user, 'add')
         parent = self.get_parent(request, pk)
 
-        # Normalize to a list of objects
-        requested_ips = request.data if isinstance(request.data, list) else [request.data]
-
-        # Determine if the requested number of IPs is available
-        available_ips = parent.get_available_ips()
-        if available_ips.size < len(requested_ips):
-            return Response(
-                {
-                    "detail": f"An insufficient number of IP addresses are available within {parent} "
-                              f"({len(requested_ips)} requested, {len(available_ips)} available)"
-                },
-                status=status.HTTP_409_CONFLICT
-            )
+        # Lock the IP space being allocated from (see get_prefix_locks())
+        ip_space = parent.prefix if isinstance(parent, Prefix) else parent.range
+        with advisory_locks(get_prefix_locks('available-ips', [(ip_space, parent.vrf_id)])):
+            # Normalize to a list of objects
+            requested_ips = request.data if isinstance(request.data, list) else [request.data]
 
-        # Assign addresses from the list of available IPs and copy VRF assignment from the parent
-        available_ips = iter(available_ips)
-        for requested_ip in requested_ips:
-            requested_ip['address'] = f'{next(available_ips)}/{parent.mask_length}'
-            requested_ip['vrf'] = parent.vrf.pk if parent.vrf else None
+            # Determine if the requested number of IPs is available
+            available_ips = parent.get_first_available_ips(len(requested_ips))
+            if len(available_ips) < len(requested_ips):
+                return Response(
+                    {
+                        "detail": f"An insufficient number of IP addresses are available within {parent} "
+                                  f"({len(requested_ips)} requested, {len(available_ips)} available)"
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
 
-        # Initialize the serializer with a list or a single object depending on what was requested
-        context = {'request': request}
-        if isinstance(request.data, list):
-            serializer = serializers.IPAddressSerializer(data=requested_ips, many=True, context=context)
-        else:
-            serializer = serializers.IPAddressSerializer(data=requested_ips[0], context=context)
+            # Assign addresses from the list of available IPs and copy VRF assignment from the parent
+            available_ips = iter(available_ips)
+            for requested_ip in requested_ips:
+                requested_ip['address'] = f'{next(available_ips)}/{parent.mask_length}'
+                requested_ip['vrf'] = parent.vrf.pk if parent.vrf else None
 
-        # Create the new IP address(es)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    created = serializer.save()
-                    self._validate_objects(created)
-            except ObjectDoesNotExist:
-                raise PermissionDenied()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # Initialize the serializer with a list or a single object depending on what was requested
+            context = {'request': request}
+            if isinstance(request.data, list):
+                serializer = serializers.IPAddressSerializer(data=requested_ips, many=True, context=context)
+            else:
+                serializer = serializers.IPAddressSerializer(data=requested_ips[0], context=context)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Create the new IP address(es)
+            if serializer.is_valid():
+                try:
+                    with transaction.atomic():
+                        created = serializer.save()
+                        self._validate_objects(created)
+                except ObjectDoesNotExist:
+                    raise PermissionDenied()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -460,7 +564,7 @@ class AvailableVLANsView(ObjectValidationMixin, APIView):
         vlangroup = get_object_or_404(VLANGroup.objects.restrict(request.user), pk=pk)
         limit = get_results_limit(request)
 
-        available_vlans = vlangroup.get_available_vids()[:limit]
+        available_vlans = list(itertools.islice(vlangroup.get_vid_bitmap().iter_available(), limit or None))
         serializer = serializers.AvailableVLANSerializer(available_vlans, many=True, context={
             'request': request,
             'group': vlangroup,
@@ -469,57 +573,59 @@ class AvailableVLANsView(ObjectValidationMixin, APIView):
         return Response(serializer.data)
 
     @extend_schema(methods=["post"], responses={201: serializers.VLANSerializer(many=True)})
-    @advisory_lock(ADVISORY_LOCK_KEYS['available-vlans'])
     def post(self, request, pk):
         self.queryset = self.queryset.restrict(request.user, 'add')
         vlangroup = get_object_or_404(VLANGroup.objects.restrict(request.user), pk=pk)
-        available_vlans = vlangroup.get_available_vids()
-        many = isinstance(request.data, list)
-
-        # Validate requested VLANs
-        serializer = serializers.CreateAvailableVLANSerializer(
-            data=request.data if many else [request.data],
-            many=True,
-            context={
-                'request': request,
-                'group': vlangroup,
-            }
-        )
-        if not serializer.is_valid():
-            return Response(
-                serializer.errors,
-                status=status.HTTP_400_BAD_REQUEST
+
+        # Lock the VLAN group being allocated from
+        with advisory_lock(get_advisory_lock_id('available-vlans', vlangroup.pk)):
+            many = isinstance(request.data, list)
+
+            # Validate requested VLANs
+            serializer = serializers.CreateAvailableVLANSerializer(
+                data=request.data if many else [request.data],
+                many=True,
+                context={
+                    'request': request,
+                    'group': vlangroup,
+                }
             )
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors,
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        requested_vlans = serializer.validated_data
+            requested_vlans = serializer.validated_data
 
-        for i, requested_vlan in enumerate(requested_vlans):
-            try:
-                requested_vlan['vid'] = available_vlans.pop(0)
-                requested_vlan['group'] = vlangroup.pk
-            except IndexError:
+            # Allocate the lowest available VIDs from the group
+            available_vids = vlangroup.get_vid_bitmap().allocate(len(requested_vlans))
+            if len(available_vids) < len(requested_vlans):
                 return Response({
                     "detail": "The requested number of VLANs is not available"
                 }, status=status.HTTP_409_CONFLICT)
+            for requested_vlan, vid in zip(requested_vlans, available_vids):
+                requested_vlan['vid'] = vid
+                requested_vlan['group'] = vlangroup.pk
 
-        # Initialize the serializer with a list or a single object depending on what was requested
-        context = {'request': request}
-        if many:
-            serializer = serializers.VLANSerializer(data=requested_vlans, many=True, context=context)
-        else:
-            serializer = serializers.VLANSerializer(data=requested_vlans[0], context=context)
-
-        # Create the new VLAN(s)
-        if serializer.is_valid():
-            try:
-                with transaction.atomic():
-                    created = serializer.save()
-                    self._validate_objects(created)
-            except ObjectDoesNotExist:
-                raise PermissionDenied()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Initialize the serializer with a list or a single object depending on what was requested
+            context = {'request': request}
+            if many:
+                serializer = serializers.VLANSerializer(data=requested_vlans, many=True, context=context)
+            else:
+                serializer = serializers.VLANSerializer(data=requested_vlans[0], context=context)
+
+            # Create the new VLAN(s)
+            if serializer.is_valid():
+                try:
+                    with transaction.atomic():
+                        created = serializer.save()
+                        self._validate_objects(created)
+                except ObjectDoesNotExist:
+                    raise PermissionDenied()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -23,6 +23,9 @@ VRF_RD_MAX_LENGTH = 21
 PREFIX_LENGTH_MIN = 1
 PREFIX_LENGTH_MAX = 127  # IPv6
 
+# Maximum number of addresses which may be resolved to prefixes in a single API request
+PREFIX_LOOKUP_MAX_ADDRESSES = 10000
+
 
 #
 # IPAddresses
@@ -47,6 +50,9 @@ IPADDRESS_ROLES_NONUNIQUE = (
     IPAddressRoleChoices.ROLE_CARP,
 )
 
+# Number of available IP ranges to retrieve from the database at a time when iterating over available IPs
+AVAILABLE_IP_RANGES_BATCH_SIZE = 100
+
 
 #
 # FHRP groups
@@ -12,7 +12,8 @@ from dcim.models import Device, Interface, Region, Site, SiteGroup
 from netbox.filtersets import ChangeLoggedModelFilterSet, OrganizationalModelFilterSet, NetBoxModelFilterSet
 from tenancy.filtersets import TenancyFilterSet
 from utilities.filters import (
-    ContentTypeFilter, MultiValueCharFilter, MultiValueNumberFilter, NumericArrayFilter, TreeNodeMultipleChoiceFilter,
+    ContentTypeFilter, MultiValueCharFilter, MultiValueDecimalFilter, MultiValueNumberFilter, NumericArrayFilter,
+    TreeNodeMultipleChoiceFilter,
 )
 from virtualization.models import VirtualMachine, VMInterface
 from .choices import *
@@ -355,6 +356,10 @@ class PrefixFilterSet(NetBoxModelFilterSet, TenancyFilterSet):
         choices=PrefixStatusChoices,
         null_value=None
     )
+    utilization = MultiValueDecimalFilter(
+        field_name='_utilization',
+        label=_('Utilization (%)'),
+    )
 
     class Meta:
         model = Prefix
@@ -467,6 +472,10 @@ class IPRangeFilterSet(TenancyFilterSet, NetBoxModelFilterSet):
         choices=IPRangeStatusChoices,
         null_value=None
     )
+    utilization = MultiValueDecimalFilter(
+        field_name='_utilization',
+        label=_('Utilization (%)'),
+    )
 
     class Meta:
         model = IPRange
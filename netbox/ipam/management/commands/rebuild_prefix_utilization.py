@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from ipam.models import IPRange, Prefix
+from ipam.utils import update_utilization
+
+
+class Command(BaseCommand):
+    help = "Recalculate the stored utilization of all prefixes and IP ranges"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, dest='batch_size',
+            help="Number of objects to update per batch (default: 500)"
+        )
+
+    def handle(self, *model_names, **options):
+        batch_size = max(options['batch_size'], 1)
+
+        for model, kwarg in ((Prefix, 'prefix_ids'), (IPRange, 'iprange_ids')):
+            verbose_name_plural = model._meta.verbose_name_plural
+            pks = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            self.stdout.write(f'Updating utilization for {len(pks)} {verbose_name_plural}...')
+
+            for i in range(0, len(pks), batch_size):
+                update_utilization(**{kwarg: pks[i:i + batch_size]})
+                self.stdout.write(f'  Updated {min(i + batch_size, len(pks))} {verbose_name_plural}', ending='\r')
+
+            self.stdout.write('')
+
+        self.stdout.write(self.style.SUCCESS('Finished.'))
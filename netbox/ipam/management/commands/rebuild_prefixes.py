@@ -1,27 +1,70 @@
+import multiprocessing
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count
 
 from ipam.models import Prefix, VRF
 from ipam.utils import rebuild_prefixes
 
 
+def rebuild_vrf_prefixes(vrf_id):
+    """
+    Rebuild the prefix hierarchy for a single VRF (or the global table) and return its ID along with the number of
+    prefixes, the number of prefixes updated, and the elapsed time.
+    """
+    start = time.monotonic()
+    count, updated = rebuild_prefixes(vrf_id)
+    return vrf_id, (count, updated, time.monotonic() - start)
+
+
 class Command(BaseCommand):
     help = "Rebuild the prefix hierarchy (depth and children counts)"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4, dest='workers',
+            help="Number of worker processes used to rebuild VRFs concurrently (default: 4)"
+        )
+
     def handle(self, *model_names, **options):
-        self.stdout.write(f'Rebuilding {Prefix.objects.count()} prefixes...')
+        workers = max(options['workers'], 1)
+        start = time.monotonic()
+
+        # Determine the VRFs (including the global table) containing prefixes
+        prefix_counts = {
+            row['vrf']: row['count'] for row in Prefix.objects.order_by().values('vrf').annotate(count=Count('pk'))
+        }
+        vrf_names = {None: 'Global'}
+        vrf_names.update({vrf.pk: f'VRF {vrf}' for vrf in VRF.objects.filter(pk__in=prefix_counts)})
+        total = len(prefix_counts)
+        self.stdout.write(
+            f'Rebuilding {sum(prefix_counts.values())} prefixes across {total} routing tables '
+            f'using {workers} workers...'
+        )
+
+        # Rebuild the largest VRFs first
+        vrf_ids = sorted(prefix_counts, key=lambda vrf_id: prefix_counts[vrf_id], reverse=True)
 
-        # Reset existing counts
-        Prefix.objects.update(_depth=0, _children=0)
+        pool = None
+        if workers > 1:
+            # Close database connections before forking so that worker processes do not inherit them
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
 
-        # Rebuild the global table
-        global_count = Prefix.objects.filter(vrf__isnull=True).count()
-        self.stdout.write(f'Global: {global_count} prefixes...')
-        rebuild_prefixes(None)
+        try:
+            results = pool.imap_unordered(rebuild_vrf_prefixes, vrf_ids) if pool else map(rebuild_vrf_prefixes, vrf_ids)
+            self.report(results, vrf_names, total)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
 
-        # Rebuild each VRF
-        for vrf in VRF.objects.all():
-            vrf_count = Prefix.objects.filter(vrf=vrf).count()
-            self.stdout.write(f'VRF {vrf}: {vrf_count} prefixes...')
-            rebuild_prefixes(vrf.pk)
+        self.stdout.write(self.style.SUCCESS(f'Finished in {time.monotonic() - start:.2f} seconds.'))
 
-        self.stdout.write(self.style.SUCCESS('Finished.'))
+    def report(self, results, vrf_names, total):
+        for i, (vrf_id, (count, updated, elapsed)) in enumerate(results, start=1):
+            self.stdout.write(
+                f'  [{i}/{total}] {vrf_names[vrf_id]}: {count} prefixes ({updated} updated) in {elapsed:.2f} seconds'
+            )
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ipam', '0066_iprange_mark_utilized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prefix',
+            name='_utilization',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='iprange',
+            name='_utilization',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+    ]
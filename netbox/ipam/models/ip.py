@@ -1,9 +1,11 @@
+import itertools
+
 import netaddr
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import F
+from django.db import connection, models
+from django.db.models import DecimalField, F, Func, Value
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
@@ -27,29 +29,317 @@ __all__ = (
 )
 
 
+# Locate the gaps between a set of used (first, last) IP address pairs within the bounds [first, last]. A sentinel row
+# marking the upper bound is appended so that the trailing gap (if any) is found in the same pass. CASE expressions
+# guard against stepping beyond either end of the address space.
+AVAILABLE_IP_RANGES_SQL = """
+SELECT host(gap_first), host(gap_last) FROM (
+    SELECT
+        CASE
+            WHEN prev_last IS NULL THEN %s::inet
+            WHEN prev_last < first_ip THEN prev_last + 1
+        END AS gap_first,
+        CASE
+            WHEN is_end THEN first_ip
+            WHEN first_ip > %s::inet THEN first_ip - 1
+        END AS gap_last,
+        is_end, first_ip, last_ip
+    FROM (
+        SELECT
+            first_ip, last_ip, is_end,
+            max(last_ip) OVER (
+                ORDER BY is_end, first_ip, last_ip ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+            ) AS prev_last
+        FROM (
+            SELECT greatest(first_ip, %s::inet) AS first_ip, least(last_ip, %s::inet) AS last_ip, false AS is_end
+            FROM ({used}) AS used (first_ip, last_ip)
+            WHERE last_ip >= %s::inet AND first_ip <= %s::inet
+            UNION ALL
+            SELECT %s::inet, %s::inet, true
+        ) AS bounded
+    ) AS ordered
+) AS gaps
+WHERE gap_first <= gap_last
+ORDER BY is_end, first_ip, last_ip
+"""
+
+
+def get_available_ranges(first, last, used, limit=None, start_after=None):
+    """
+    Return the ranges of IP addresses between first and last (inclusive) which are not consumed by any of the given
+    querysets, as a list of netaddr.IPRange in ascending order. Gaps are found by the database (see
+    AVAILABLE_IP_RANGES_SQL), so the objects consuming IP space are never retrieved.
+
+    :param first: The first IP address (netaddr.IPAddress)
+    :param last: The last IP address (netaddr.IPAddress)
+    :param used: List of (queryset, start expression, end expression) for each type of object which consumes IPs
+    :param limit: Maximum number of ranges to return
+    :param start_after: Return only IPs following this address (a cursor)
+    """
+    if start_after is not None:
+        start_after = netaddr.IPAddress(start_after)
+        if start_after.version != last.version or start_after >= last:
+            return []
+        first = max(first, start_after + 1)
+    first, last = str(first), str(last)
+
+    used_sql = []
+    used_params = []
+    for queryset, start_expression, end_expression in used:
+        if isinstance(start_expression, str):
+            start_expression = F(start_expression)
+        if isinstance(end_expression, str):
+            end_expression = F(end_expression)
+        queryset = queryset.order_by().annotate(
+            first_ip=start_expression,
+            last_ip=end_expression
+        ).values_list('first_ip', 'last_ip')
+        sql, params = queryset.query.sql_with_params()
+        used_sql.append(f'SELECT host(u.first_ip)::inet, host(u.last_ip)::inet FROM ({sql}) AS u')
+        used_params.extend(params)
+
+    sql = AVAILABLE_IP_RANGES_SQL.format(used=' UNION ALL '.join(used_sql))
+    params = [first, first, first, last, *used_params, first, last, last, last]
+    if limit is not None:
+        sql += ' LIMIT %s'
+        params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [netaddr.IPRange(gap_first, gap_last) for gap_first, gap_last in cursor.fetchall()]
+
+
+# Count the IP addresses covered by a set of (first, last, size) IP address ranges, where size is the number of IPs
+# within the range. Ranges are ordered by first IP (and the widest range first), and each contributes only the IPs
+# beyond the last IP covered by any preceding range, so that overlapping ranges and duplicate IPs are counted once.
+# The size of wholly uncovered ranges is provided by the caller, as the span of an IPv6 prefix may exceed a bigint.
+USED_IP_COUNT_SQL = """
+SELECT coalesce(sum(
+    CASE
+        WHEN prev_last IS NULL OR prev_last < first_ip THEN size
+        WHEN prev_last < last_ip THEN last_ip - prev_last
+        ELSE 0
+    END
+), 0) FROM (
+    SELECT
+        first_ip, last_ip, size,
+        max(last_ip) OVER (
+            ORDER BY first_ip, last_ip DESC ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+        ) AS prev_last
+    FROM ({used}) AS used (first_ip, last_ip, size)
+) AS ordered
+"""
+
+# The last IP address and the number of IP addresses within a prefix
+BROADCAST = Func(F('prefix'), function='BROADCAST', output_field=IPAddressField())
+PREFIX_SIZE = Func(
+    F('prefix'),
+    template='power(2::numeric, (CASE family(%(expressions)s) WHEN 4 THEN 32 ELSE 128 END) - masklen(%(expressions)s))',
+    output_field=DecimalField()
+)
+
+
+def get_used_ip_count(used):
+    """
+    Return the number of distinct IP addresses consumed by any of the given querysets. IPs are counted by the database
+    (see USED_IP_COUNT_SQL), so the objects consuming IP space are never retrieved.
+
+    :param used: List of (queryset, start expression, end expression, size expression) for each type of object which
+        consumes IPs
+    """
+    used_sql = []
+    used_params = []
+    for queryset, start_expression, end_expression, size_expression in used:
+        queryset = queryset.order_by().annotate(
+            first_ip=F(start_expression) if isinstance(start_expression, str) else start_expression,
+            last_ip=F(end_expression) if isinstance(end_expression, str) else end_expression,
+            ip_count=F(size_expression) if isinstance(size_expression, str) else size_expression
+        ).values_list('first_ip', 'last_ip', 'ip_count')
+        sql, params = queryset.query.sql_with_params()
+        used_sql.append(
+            f'SELECT host(u.first_ip)::inet, host(u.last_ip)::inet, u.ip_count::numeric FROM ({sql}) AS u'
+        )
+        used_params.extend(params)
+
+    with connection.cursor() as cursor:
+        cursor.execute(USED_IP_COUNT_SQL.format(used=' UNION ALL '.join(used_sql)), used_params)
+        return int(cursor.fetchone()[0])
+
+
 class GetAvailablePrefixesMixin:
+    """
+    Locate the available space within an Aggregate or Prefix. Gaps between child prefixes are found by the database
+    (see get_available_ranges()), so child prefixes are never retrieved; only the free ranges are decomposed into
+    CIDR-aligned blocks.
+    """
+    def get_available_prefix_ranges(self, limit=None, start_after=None, child_prefixes=None):
+        """
+        Return the available space as a list of netaddr.IPRange in ascending order.
+
+        :param limit: Maximum number of ranges to return
+        :param start_after: Return only space following this address (a cursor)
+        :param child_prefixes: Prefix queryset to consider (defaults to all child prefixes in the same VRF)
+        """
+        if child_prefixes is None:
+            params = {
+                'prefix__net_contained': str(self.prefix)
+            }
+            if hasattr(self, 'vrf'):
+                params['vrf'] = self.vrf
+            child_prefixes = Prefix.objects.filter(**params)
+
+        return get_available_ranges(
+            netaddr.IPAddress(self.prefix.first, self.prefix.version),
+            netaddr.IPAddress(self.prefix.last, self.prefix.version),
+            [(child_prefixes, 'prefix', BROADCAST)],
+            limit=limit,
+            start_after=start_after
+        )
+
+    def iter_available_prefixes(self, start_after=None, batch_size=AVAILABLE_IP_RANGES_BATCH_SIZE, child_prefixes=None):
+        """
+        Iterate over the largest available CIDR-aligned prefixes (as netaddr.IPNetwork) in ascending order. Available
+        ranges are retrieved from the database in batches as the iterator is consumed.
+
+        :param start_after: Yield only prefixes following this address (a cursor)
+        :param batch_size: Number of available ranges to retrieve per query (None to retrieve all ranges at once)
+        :param child_prefixes: Prefix queryset to consider (defaults to all child prefixes in the same VRF)
+        """
+        while True:
+            ranges = self.get_available_prefix_ranges(
+                limit=batch_size,
+                start_after=start_after,
+                child_prefixes=child_prefixes
+            )
+            for iprange in ranges:
+                yield from iprange.cidrs()
+            if batch_size is None or len(ranges) < batch_size:
+                return
+            start_after = ranges[-1][-1]
 
     def get_available_prefixes(self):
         """
         Return all available prefixes within this Aggregate or Prefix as an IPSet.
         """
-        params = {
-            'prefix__net_contained': str(self.prefix)
-        }
-        if hasattr(self, 'vrf'):
-            params['vrf'] = self.vrf
-
-        child_prefixes = Prefix.objects.filter(**params).values_list('prefix', flat=True)
-        return netaddr.IPSet(self.prefix) - netaddr.IPSet(child_prefixes)
+        return netaddr.IPSet(self.iter_available_prefixes(batch_size=None))
 
     def get_first_available_prefix(self):
         """
         Return the first available child prefix within the prefix (or None).
         """
-        available_prefixes = self.get_available_prefixes()
-        if not available_prefixes:
-            return None
-        return available_prefixes.iter_cidrs()[0]
+        return next(self.iter_available_prefixes(batch_size=1), None)
+
+    def get_first_available_prefixes(self, prefix_lengths):
+        """
+        Allocate available prefixes of each of the requested lengths in turn, returning a list of netaddr.IPNetwork
+        (or None where no space remains for a prefix of the requested length). Each prefix is allocated at the lowest
+        available aligned address. Available space is retrieved from the database only as far as needed.
+
+        :param prefix_lengths: Iterable of prefix lengths
+        """
+        available = self.iter_available_prefixes()
+        # Available prefixes retrieved so far, less those allocated, in ascending order
+        candidates = []
+        allocated = []
+
+        for prefix_length in prefix_lengths:
+            for i, candidate in enumerate(candidates):
+                if candidate.prefixlen <= prefix_length:
+                    break
+            else:
+                # Retrieve further available prefixes until one is large enough
+                for candidate in available:
+                    candidates.append(candidate)
+                    if candidate.prefixlen <= prefix_length:
+                        i = len(candidates) - 1
+                        break
+                else:
+                    allocated.append(None)
+                    continue
+
+            # Allocate the prefix at the start of the candidate, and replace the candidate with the remaining space
+            prefix = netaddr.IPNetwork(f'{candidate.network}/{prefix_length}')
+            candidates[i:i + 1] = (netaddr.IPSet([candidate]) - netaddr.IPSet([prefix])).iter_cidrs()
+            allocated.append(prefix)
+
+        return allocated
+
+
+class GetAvailableIPsMixin:
+    """
+    Locate the available IP addresses within a Prefix or IPRange. Gaps between the child IP addresses (and IP ranges)
+    are found by the database, so child objects are never retrieved.
+    """
+    def get_available_ip_bounds(self):
+        """
+        Return the first and last usable IP addresses as a tuple of netaddr.IPAddress, or None if no IPs are usable.
+        """
+        raise NotImplementedError()
+
+    def get_used_ip_querysets(self):
+        """
+        Return a list of (queryset, start field, end field) for each type of child object which consumes IP addresses.
+        """
+        raise NotImplementedError()
+
+    def get_available_ip_ranges(self, limit=None, start_after=None):
+        """
+        Return the available IP addresses as a list of netaddr.IPRange in ascending order.
+
+        :param limit: Maximum number of ranges to return
+        :param start_after: Return only IPs following this address (a cursor)
+        """
+        bounds = self.get_available_ip_bounds()
+        if bounds is None:
+            return []
+        first, last = bounds
+
+        return get_available_ranges(first, last, self.get_used_ip_querysets(), limit=limit, start_after=start_after)
+
+    def get_available_ips(self):
+        """
+        Return all available IPs as an IPSet.
+        """
+        available_ips = netaddr.IPSet()
+        for iprange in self.get_available_ip_ranges():
+            available_ips.add(iprange)
+        return available_ips
+
+    def iter_available_ips(self, start_after=None, offset=0, batch_size=AVAILABLE_IP_RANGES_BATCH_SIZE):
+        """
+        Iterate over the available IPs (as netaddr.IPAddress) in ascending order. Available ranges are retrieved from
+        the database in batches as the iterator is consumed, so the cost of reaching any position depends on the number
+        of ranges preceding it, not on the number of IPs.
+
+        :param start_after: Yield only IPs following this address (a cursor)
+        :param offset: Number of available IPs to skip
+        :param batch_size: Number of available ranges to retrieve per query
+        """
+        while True:
+            ranges = self.get_available_ip_ranges(limit=batch_size, start_after=start_after)
+            for iprange in ranges:
+                # Skip entire ranges until the offset has been reached
+                if offset >= iprange.size:
+                    offset -= iprange.size
+                    continue
+                yield from netaddr.iter_iprange(iprange[offset], iprange[-1])
+                offset = 0
+            if len(ranges) < batch_size:
+                return
+            start_after = ranges[-1][-1]
+
+    def get_first_available_ips(self, count, start_after=None, offset=0):
+        """
+        Return a list of (at most) the first `count` available IPs as netaddr.IPAddress.
+        """
+        if count < 1:
+            return []
+        # Each available range holds at least one IP, so a single batch suffices when no offset has been specified
+        batch_size = count if not offset else AVAILABLE_IP_RANGES_BATCH_SIZE
+        return list(itertools.islice(
+            self.iter_available_ips(start_after=start_after, offset=offset, batch_size=batch_size),
+            count
+        ))
 
 
 class RIR(OrganizationalModel):
@@ -167,8 +457,8 @@ class Aggregate(GetAvailablePrefixesMixin, PrimaryModel):
         Determine the prefix utilization of the aggregate and return it as a percentage.
         """
         queryset = Prefix.objects.filter(prefix__net_contained_or_equal=str(self.prefix))
-        child_prefixes = netaddr.IPSet([p.prefix for p in queryset])
-        utilization = float(child_prefixes.size) / self.prefix.size * 100
+        child_count = get_used_ip_count([(queryset, 'prefix', BROADCAST, PREFIX_SIZE)])
+        utilization = float(child_count) / self.prefix.size * 100
 
         return min(utilization, 100)
 
@@ -192,7 +482,7 @@ class Role(OrganizationalModel):
         return reverse('ipam:role', args=[self.pk])
 
 
-class Prefix(GetAvailablePrefixesMixin, PrimaryModel):
+class Prefix(GetAvailablePrefixesMixin, GetAvailableIPsMixin, PrimaryModel):
     """
     A Prefix represents an IPv4 or IPv6 network, including mask length. Prefixes can optionally be assigned to Sites and
     VRFs. A Prefix must be assigned a status and may optionally be assigned a used-define Role. A Prefix can also be
@@ -266,6 +556,14 @@ class Prefix(GetAvailablePrefixesMixin, PrimaryModel):
         editable=False
     )
 
+    # Cached utilization (as a percentage) for display and database ordering; maintained by signals
+    _utilization = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+
     objects = PrefixQuerySet.as_manager()
 
     clone_fields = (
@@ -401,75 +699,64 @@ class Prefix(GetAvailablePrefixesMixin, PrimaryModel):
         else:
             return IPAddress.objects.filter(address__net_host_contained=str(self.prefix), vrf=self.vrf)
 
-    def get_available_ips(self):
-        """
-        Return all available IPs within this prefix as an IPSet.
-        """
+    def get_available_ip_bounds(self):
         if self.mark_utilized:
-            return list()
-
-        prefix = netaddr.IPSet(self.prefix)
-        child_ips = netaddr.IPSet([ip.address.ip for ip in self.get_child_ips()])
-        child_ranges = netaddr.IPSet()
-        for iprange in self.get_child_ranges():
-            child_ranges.add(iprange.range)
-        available_ips = prefix - child_ips - child_ranges
+            return None
 
         # IPv6 /127's, pool, or IPv4 /31-/32 sets are fully usable
         if (self.family == 6 and self.prefix.prefixlen >= 127) or self.is_pool or (self.family == 4 and self.prefix.prefixlen >= 31):
-            return available_ips
+            return netaddr.IPAddress(self.prefix.first), netaddr.IPAddress(self.prefix.last)
 
         if self.family == 4:
             # For "normal" IPv4 prefixes, omit first and last addresses
-            available_ips -= netaddr.IPSet([
-                netaddr.IPAddress(self.prefix.first),
-                netaddr.IPAddress(self.prefix.last),
-            ])
-        else:
-            # For IPv6 prefixes, omit the Subnet-Router anycast address
-            # per RFC 4291
-            available_ips -= netaddr.IPSet([netaddr.IPAddress(self.prefix.first)])
-        return available_ips
+            return netaddr.IPAddress(self.prefix.first + 1), netaddr.IPAddress(self.prefix.last - 1)
+        # For IPv6 prefixes, omit the Subnet-Router anycast address
+        # per RFC 4291
+        return netaddr.IPAddress(self.prefix.first + 1), netaddr.IPAddress(self.prefix.last)
+
+    def get_used_ip_querysets(self):
+        return [
+            (self.get_child_ips(), 'address', 'address'),
+            (self.get_child_ranges(), 'start_address', 'end_address'),
+        ]
 
     def get_first_available_ip(self):
         """
         Return the first available IP within the prefix (or None).
         """
-        available_ips = self.get_available_ips()
+        available_ips = self.get_first_available_ips(1)
         if not available_ips:
             return None
-        return '{}/{}'.format(next(available_ips.__iter__()), self.prefix.prefixlen)
+        return '{}/{}'.format(available_ips[0], self.prefix.prefixlen)
 
     def get_utilization(self):
         """
         Determine the utilization of the prefix and return it as a percentage. For Prefixes with a status of
-        "container", calculate utilization based on child prefixes. For all others, count child IP addresses.
+        "container", calculate utilization based on child prefixes (belonging to any VRF if this is a container in the
+        global table). For all others, count child IP addresses.
         """
         if self.mark_utilized:
             return 100
 
         if self.status == PrefixStatusChoices.STATUS_CONTAINER:
-            queryset = Prefix.objects.filter(
-                prefix__net_contained=str(self.prefix),
-                vrf=self.vrf
-            )
-            child_prefixes = netaddr.IPSet([p.prefix for p in queryset])
-            utilization = float(child_prefixes.size) / self.prefix.size * 100
+            child_count = get_used_ip_count([(self.get_child_prefixes(), 'prefix', BROADCAST, PREFIX_SIZE)])
+            utilization = float(child_count) / self.prefix.size * 100
         else:
-            # Compile an IPSet to avoid counting duplicate IPs
-            child_ips = netaddr.IPSet(
-                [_.range for _ in self.get_child_ranges()] + [_.address.ip for _ in self.get_child_ips()]
-            )
+            # Count the distinct IPs consumed by child ranges and IP addresses
+            child_count = get_used_ip_count([
+                (self.get_child_ranges(), 'start_address', 'end_address', 'size'),
+                (self.get_child_ips(), 'address', 'address', Value(1)),
+            ])
 
             prefix_size = self.prefix.size
             if self.prefix.version == 4 and self.prefix.prefixlen < 31 and not self.is_pool:
                 prefix_size -= 2
-            utilization = float(child_ips.size) / prefix_size * 100
+            utilization = float(child_count) / prefix_size * 100
 
         return min(utilization, 100)
 
 
-class IPRange(PrimaryModel):
+class IPRange(GetAvailableIPsMixin, PrimaryModel):
     """
     A range of IP addresses, defined by start and end addresses.
     """
@@ -516,6 +803,14 @@ class IPRange(PrimaryModel):
         help_text=_("Treat as 100% utilized")
     )
 
+    # Cached utilization (as a percentage) for display and database ordering; maintained by signals
+    _utilization = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+
     clone_fields = (
         'vrf', 'tenant', 'status', 'role', 'description',
     )
@@ -525,6 +820,14 @@ class IPRange(PrimaryModel):
         verbose_name = 'IP range'
         verbose_name_plural = 'IP ranges'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Cache the original addresses and VRF so we can check if they have changed on post_save
+        self._start_address = self.start_address
+        self._end_address = self.end_address
+        self._vrf_id = self.vrf_id
+
     def __str__(self):
         return self.name
 
@@ -631,40 +934,40 @@ class IPRange(PrimaryModel):
             vrf=self.vrf
         )
 
-    def get_available_ips(self):
-        """
-        Return all available IPs within this range as an IPSet.
-        """
-        range = netaddr.IPRange(self.start_address.ip, self.end_address.ip)
-        child_ips = netaddr.IPSet([ip.address.ip for ip in self.get_child_ips()])
+    def get_available_ip_bounds(self):
+        return self.start_address.ip, self.end_address.ip
 
-        return netaddr.IPSet(range) - child_ips
+    def get_used_ip_querysets(self):
+        return [
+            (self.get_child_ips(), 'address', 'address'),
+        ]
 
     @cached_property
     def first_available_ip(self):
         """
         Return the first available IP within the range (or None).
         """
-        available_ips = self.get_available_ips()
+        available_ips = self.get_first_available_ips(1)
         if not available_ips:
             return None
 
-        return '{}/{}'.format(next(available_ips.__iter__()), self.start_address.prefixlen)
+        return '{}/{}'.format(available_ips[0], self.start_address.prefixlen)
 
-    @cached_property
-    def utilization(self):
+    def get_utilization(self):
         """
         Determine the utilization of the range and return it as a percentage.
         """
         if self.mark_utilized:
             return 100
 
-        # Compile an IPSet to avoid counting duplicate IPs
-        child_count = netaddr.IPSet([
-            ip.address.ip for ip in self.get_child_ips()
-        ]).size
+        # Count each distinct IP only once
+        child_count = get_used_ip_count([(self.get_child_ips(), 'address', 'address', Value(1))])
 
-        return int(float(child_count) / self.size * 100)
+        return float(child_count) / self.size * 100
+
+    @cached_property
+    def utilization(self):
+        return int(self.get_utilization())
 
 
 class IPAddress(PrimaryModel):
@@ -752,6 +1055,13 @@ class IPAddress(PrimaryModel):
         verbose_name = 'IP address'
         verbose_name_plural = 'IP addresses'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Cache the original address and VRF so we can check if they have changed on post_save
+        self._address = self.address
+        self._vrf_id = self.vrf_id
+
     def __str__(self):
         return str(self.address)
 
@@ -10,6 +10,7 @@ from dcim.models import Interface
 from ipam.choices import *
 from ipam.constants import *
 from ipam.querysets import VLANQuerySet
+from ipam.vid_bitmap import VIDBitmap
 from netbox.models import OrganizationalModel, PrimaryModel
 from virtualization.models import VMInterface
 
@@ -96,23 +97,25 @@ class VLANGroup(OrganizationalModel):
                 'max_vid': "Maximum child VID must be greater than or equal to minimum child VID"
             })
 
+    def get_vid_bitmap(self):
+        """
+        Return a VIDBitmap recording the VLAN IDs in use within this group.
+        """
+        return VIDBitmap(self.min_vid, self.max_vid, VLAN.objects.filter(group=self).values_list('vid', flat=True))
+
     def get_available_vids(self):
         """
         Return all available VLANs within this group.
         """
-        available_vlans = {vid for vid in range(self.min_vid, self.max_vid + 1)}
-        available_vlans -= set(VLAN.objects.filter(group=self).values_list('vid', flat=True))
-
-        return sorted(available_vlans)
+        return list(self.get_vid_bitmap().iter_available())
 
     def get_next_available_vid(self):
         """
-        Return the first available VLAN ID (1-4094) in the group.
+        Return the first available VLAN ID (1-4094) in the group. A VIDBitmap prefetched for the group (e.g. by the
+        VLAN group list view using get_vid_bitmaps()) is used if one has been assigned.
         """
-        available_vids = self.get_available_vids()
-        if available_vids:
-            return available_vids[0]
-        return None
+        vid_bitmap = getattr(self, '_vid_bitmap', None) or self.get_vid_bitmap()
+        return vid_bitmap.get_next_available()
 
 
 class VLAN(PrimaryModel):
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import netaddr
+from django.core.cache import cache
+from django.db import connection
+
+from netbox.context import prefix_changes_queue
+from utilities.transactions import TransactionQueue
+
+__all__ = (
+    'PrefixChanges',
+    'PrefixIndex',
+    'PrefixIndexEntry',
+    'get_prefix_index',
+    'invalidate_prefix_index',
+    'record_prefix_change',
+)
+
+# Cache key holding the current generation of the prefix index. Each process rebuilds its own index whenever the
+# generation changes.
+CACHE_GENERATION_KEY = 'prefix_index_generation'
+
+PrefixIndexEntry = namedtuple('PrefixIndexEntry', ('pk', 'prefix', 'vrf_id', 'site_id', 'tenant_id'))
+
+
+class PrefixIndex:
+    """
+    An in-memory, read-only snapshot of all prefixes which resolves IP addresses to the most specific prefix containing
+    them within a VRF (or the global table). All prefixes are loaded using a single query upon initialization.
+
+    Within each VRF and address family, prefixes are stored in a hash table per prefix length, keyed by network address.
+    An address is resolved by masking it to each prefix length present, from most to least specific, until a match is
+    found. Where a prefix is duplicated within a VRF, the one with the lowest ID is returned first.
+    """
+    def __init__(self, queryset=None):
+        from .models import Prefix
+
+        if queryset is None:
+            queryset = Prefix.objects.all()
+        prefixes = queryset.order_by('pk').values_list('pk', 'prefix', 'vrf_id', 'site_id', 'tenant_id')
+
+        # {(VRF ID, family): {prefix length: {network: [PrefixIndexEntry, ...]}}}
+        tables = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self.size = 0
+        for pk, prefix, vrf_id, site_id, tenant_id in prefixes.iterator(chunk_size=10000):
+            networks = tables[(vrf_id, prefix.version)][prefix.prefixlen]
+            networks[prefix.value].append(PrefixIndexEntry(pk, prefix, vrf_id, site_id, tenant_id))
+            self.size += 1
+
+        # {(VRF ID, family): [(netmask, {network: (PrefixIndexEntry, ...)}), ...]}, ordered from most to least
+        # specific, with duplicate prefixes ordered by ID
+        self._tables = {}
+        for (vrf_id, family), lengths in tables.items():
+            width = 32 if family == 4 else 128
+            self._tables[(vrf_id, family)] = [
+                (
+                    (2 ** width - 1) ^ (2 ** (width - prefixlen) - 1),
+                    {network: tuple(entries) for network, entries in lengths[prefixlen].items()}
+                )
+                for prefixlen in sorted(lengths, reverse=True)
+            ]
+
+    def iter_matches(self, address, vrf_id=None):
+        """
+        Iterate over the PrefixIndexEntries of all prefixes containing the given address, from most to least specific.
+
+        :param address: IP address (netaddr.IPAddress or string)
+        :param vrf_id: ID of the VRF to search (or None for the global table)
+        """
+        if not isinstance(address, netaddr.IPAddress):
+            address = netaddr.IPAddress(address)
+        value = address.value
+        for netmask, networks in self._tables.get((vrf_id, address.version), ()):
+            yield from networks.get(value & netmask, ())
+
+    def lookup(self, address, vrf_id=None):
+        """
+        Return the PrefixIndexEntry of the most specific prefix containing the given address, or None.
+
+        :param address: IP address (netaddr.IPAddress or string)
+        :param vrf_id: ID of the VRF to search (or None for the global table)
+        """
+        return next(self.iter_matches(address, vrf_id), None)
+
+    def lookup_many(self, addresses, vrf_id=None):
+        """
+        Return a dictionary mapping each of the given addresses to the PrefixIndexEntry of the most specific prefix
+        containing it, or None.
+
+        :param addresses: Iterable of IP addresses (netaddr.IPAddress or string)
+        :param vrf_id: ID of the VRF to search (or None for the global table)
+        """
+        return {
+            address: self.lookup(address, vrf_id) for address in addresses
+        }
+
+
+class PrefixChanges(TransactionQueue):
+    """
+    Tracks the modification of prefixes within the current transaction. The PrefixIndex of a transaction which has
+    modified prefixes is built from the transaction's own view of the database, and is retained until a prefix is next
+    modified or any savepoint within which prefixes were modified is rolled back. Once the transaction has been
+    committed, the PrefixIndex of all processes is invalidated.
+    """
+    context_var = prefix_changes_queue
+
+    def __init__(self):
+        super().__init__()
+        self.index = None
+        self._index_savepoints = ()
+
+    def __bool__(self):
+        return True
+
+    def get_index(self):
+        """
+        Return the PrefixIndex for the transaction, building it if necessary.
+        """
+        # The rollback of a savepoint within which prefixes were modified discards the callback registered within it
+        # (see TransactionQueue)
+        callbacks = self._callbacks
+        rolled_back = any(sid not in callbacks or callbacks[sid]() is None for sid in self._index_savepoints)
+        if self.index is None or rolled_back:
+            self.index = PrefixIndex()
+            self._index_savepoints = tuple(sid for sid, ref in callbacks.items() if ref() is not None)
+        return self.index
+
+    def flush(self):
+        invalidate_prefix_index()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_prefix_index():
+    """
+    Return the PrefixIndex for the current process, rebuilding it if any prefix has been modified since it was built.
+
+    Within a transaction which has modified prefixes, an index reflecting these changes is returned instead (see
+    PrefixChanges).
+    """
+    global _index
+
+    if connection.in_atomic_block:
+        changes = prefix_changes_queue.get()
+        if changes is not None and changes.is_scheduled():
+            return changes.get_index()
+
+    with _index_lock:
+        generation = cache.get(CACHE_GENERATION_KEY)
+        if generation is None:
+            cache.add(CACHE_GENERATION_KEY, time.time_ns(), None)
+            generation = cache.get(CACHE_GENERATION_KEY)
+
+        # The generation is read before the index is built, so that any modification made meanwhile results in it
+        # being rebuilt again upon the next call. If no generation can be cached, the index is always rebuilt.
+        if _index is None or generation is None or _index.generation != generation:
+            index = PrefixIndex()
+            index.generation = generation
+            _index = index
+
+        return _index
+
+
+def invalidate_prefix_index():
+    """
+    Invalidate the PrefixIndex of all processes by advancing its generation.
+    """
+    cache.set(CACHE_GENERATION_KEY, time.time_ns(), None)
+
+
+def record_prefix_change():
+    """
+    Record the modification of a prefix. Within a transaction, its PrefixIndex is rebuilt when next requested and the
+    PrefixIndex of all processes is invalidated once it has been committed. Otherwise, the PrefixIndex of all processes
+    is invalidated immediately.
+    """
+    changes = PrefixChanges.get_current()
+    if changes is None:
+        invalidate_prefix_index()
+    else:
+        changes.index = None
@@ -1,52 +1,179 @@
+from django.db import connection
+from django.db.models import Q
 from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
 from dcim.models import Device
 from virtualization.models import VirtualMachine
-from .models import IPAddress, Prefix
+from .choices import PrefixStatusChoices
+from .models import IPAddress, IPRange, Prefix
+from .prefix_index import record_prefix_change
+from .utils import enqueue_utilization
 
 
-def update_parents_children(prefix):
-    """
-    Update depth on prefix & containing prefixes
-    """
-    parents = prefix.get_parents(include_self=True).annotate_hierarchy()
-    for parent in parents:
-        parent._children = parent.hierarchy_children
-    Prefix.objects.bulk_update(parents, ['_children'], batch_size=100)
+# Adjust the cached hierarchy of a VRF for the addition (delta=1) or removal (delta=-1) of a prefix in a single
+# statement: every containing prefix gains (or loses) a child, and every contained prefix gains (or loses) a level of
+# depth unless a duplicate of the prefix remains. When adding a prefix, its own depth and children are counted as well;
+# when removing one, the row for the prefix (if it still exists) is left untouched. Null VRF values are cast to zero
+# for comparison, as in PrefixQuerySet.annotate_hierarchy().
+UPDATE_PREFIX_HIERARCHY_SQL = """
+UPDATE "ipam_prefix" SET
+    "_children" = CASE
+        WHEN "id" = %(pk)s THEN (
+            SELECT COUNT(U1."prefix") FROM "ipam_prefix" U1
+            WHERE U1."prefix" << %(prefix)s::cidr AND COALESCE(U1."vrf_id", 0) = COALESCE(%(vrf_id)s, 0)
+        )
+        WHEN "prefix" >> %(prefix)s::cidr THEN "_children" + %(delta)s
+        ELSE "_children"
+    END,
+    "_depth" = CASE
+        WHEN "id" = %(pk)s THEN (
+            SELECT COUNT(DISTINCT U0."prefix") FROM "ipam_prefix" U0
+            WHERE U0."prefix" >> %(prefix)s::cidr AND COALESCE(U0."vrf_id", 0) = COALESCE(%(vrf_id)s, 0)
+        )
+        WHEN "prefix" << %(prefix)s::cidr AND NOT EXISTS (
+            SELECT 1 FROM "ipam_prefix" U2
+            WHERE U2."prefix" = %(prefix)s::cidr AND COALESCE(U2."vrf_id", 0) = COALESCE(%(vrf_id)s, 0)
+            AND U2."id" != %(pk)s
+        ) THEN "_depth" + %(delta)s
+        ELSE "_depth"
+    END
+WHERE COALESCE("vrf_id", 0) = COALESCE(%(vrf_id)s, 0) AND CASE
+    WHEN "id" = %(pk)s THEN %(delta)s > 0
+    ELSE "prefix" >> %(prefix)s::cidr OR "prefix" << %(prefix)s::cidr
+END
+"""
 
 
-def update_children_depth(prefix):
+def update_prefix_hierarchy(pk, prefix, vrf_id, delta):
     """
-    Update children count on prefix & contained prefixes
+    Update the depth & children count of all prefixes affected by the addition or removal of a prefix.
+
+    :param pk: ID of the prefix being added or removed
+    :param prefix: The prefix (IPNetwork) being added or removed
+    :param vrf_id: ID of the prefix's VRF (or None)
+    :param delta: 1 if the prefix is being added to the hierarchy, or -1 if it is being removed
     """
-    children = prefix.get_children(include_self=True).annotate_hierarchy()
-    for child in children:
-        child._depth = child.hierarchy_depth
-    Prefix.objects.bulk_update(children, ['_depth'], batch_size=100)
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_PREFIX_HIERARCHY_SQL, {
+            'pk': pk,
+            'prefix': str(prefix),
+            'vrf_id': vrf_id,
+            'delta': delta,
+        })
 
 
 @receiver(post_save, sender=Prefix)
-def handle_prefix_saved(instance, created, **kwargs):
+def handle_prefix_saved(instance, created, raw=False, **kwargs):
+
+    # The cached hierarchy of loaded fixtures is preserved
+    if raw:
+        return
 
     # Prefix has changed (or new instance has been created)
     if created or instance.vrf_id != instance._vrf_id or instance.prefix != instance._prefix:
 
-        update_parents_children(instance)
-        update_children_depth(instance)
-
-        # If this is not a new prefix, clean up parent/children of previous prefix
+        # If this is not a new prefix, remove the previous prefix from the hierarchy
         if not created:
-            old_prefix = Prefix(vrf_id=instance._vrf_id, prefix=instance._prefix)
-            update_parents_children(old_prefix)
-            update_children_depth(old_prefix)
+            update_prefix_hierarchy(instance.pk, instance._prefix, instance._vrf_id, -1)
+
+        update_prefix_hierarchy(instance.pk, instance.prefix, instance.vrf_id, 1)
 
 
 @receiver(post_delete, sender=Prefix)
 def handle_prefix_deleted(instance, **kwargs):
 
-    update_parents_children(instance)
-    update_children_depth(instance)
+    update_prefix_hierarchy(instance.pk, instance.prefix, instance.vrf_id, -1)
+
+
+@receiver(post_save, sender=Prefix)
+@receiver(post_delete, sender=Prefix)
+def handle_prefix_index_changed(instance, **kwargs):
+    """
+    Invalidate the PrefixIndex of the current transaction, and that of all processes once the transaction has been
+    committed.
+    """
+    record_prefix_change()
+
+
+#
+# Utilization
+#
+# The utilization stored on each Prefix and IPRange is recalculated once the current transaction has been committed
+# for any object affected by a change (see ipam.utils.enqueue_utilization()). The utilization of a container prefix
+# is derived from its child prefixes; that of any other prefix from its child IP addresses and ranges.
+#
+
+@receiver(post_save, sender=Prefix)
+@receiver(post_delete, sender=Prefix)
+def update_prefix_utilization(instance, raw=False, **kwargs):
+    """
+    Update the utilization of a Prefix and of any container Prefixes in which it is (or was) contained. Global
+    containers contain the prefixes of all VRFs.
+    """
+    if raw:
+        return
+    prefix_ids = {instance.pk}
+    for prefix, vrf_id in {(instance.prefix, instance.vrf_id), (instance._prefix, instance._vrf_id)}:
+        if prefix:
+            prefix_ids.update(Prefix.objects.filter(
+                Q(vrf=vrf_id) | Q(vrf__isnull=True),
+                prefix__net_contains=str(prefix),
+                status=PrefixStatusChoices.STATUS_CONTAINER
+            ).values_list('pk', flat=True))
+    enqueue_utilization(prefix_ids=prefix_ids)
+
+
+@receiver(post_save, sender=IPRange)
+@receiver(post_delete, sender=IPRange)
+def update_iprange_utilization(instance, raw=False, **kwargs):
+    """
+    Update the utilization of an IPRange and of any Prefixes in which it is (or was) contained.
+    """
+    if raw:
+        return
+    prefix_ids = set()
+    addresses = {
+        (instance.start_address, instance.end_address, instance.vrf_id),
+        (instance._start_address, instance._end_address, instance._vrf_id),
+    }
+    for start_address, end_address, vrf_id in addresses:
+        if start_address and end_address:
+            prefix_ids.update(Prefix.objects.filter(
+                prefix__net_contains_or_equals=str(start_address.ip),
+                vrf=vrf_id
+            ).filter(
+                prefix__net_contains_or_equals=str(end_address.ip)
+            ).exclude(
+                status=PrefixStatusChoices.STATUS_CONTAINER
+            ).values_list('pk', flat=True))
+    enqueue_utilization(prefix_ids=prefix_ids, iprange_ids=[instance.pk])
+
+
+@receiver(post_save, sender=IPAddress)
+@receiver(post_delete, sender=IPAddress)
+def update_ipaddress_utilization(instance, raw=False, **kwargs):
+    """
+    Update the utilization of any Prefixes and IPRanges in which an IPAddress is (or was) contained.
+    """
+    if raw:
+        return
+    prefix_ids = set()
+    iprange_ids = set()
+    for address, vrf_id in {(instance.address, instance.vrf_id), (instance._address, instance._vrf_id)}:
+        if address:
+            prefix_ids.update(Prefix.objects.filter(
+                prefix__net_contains_or_equals=str(address.ip),
+                vrf=vrf_id
+            ).exclude(
+                status=PrefixStatusChoices.STATUS_CONTAINER
+            ).values_list('pk', flat=True))
+            iprange_ids.update(IPRange.objects.filter(
+                start_address__lte=address,
+                end_address__gte=address,
+                vrf=vrf_id
+            ).values_list('pk', flat=True))
+    enqueue_utilization(prefix_ids=prefix_ids, iprange_ids=iprange_ids)
 
 
 @receiver(pre_delete, sender=IPAddress)
@@ -62,3 +189,38 @@ def clear_primary_ip(instance, **kwargs):
     virtualmachine = VirtualMachine.objects.filter(**{field_name: instance}).first()
     if virtualmachine:
         virtualmachine.save()
+
+
+#
+# Original values
+#
+# These receivers are registered last so that they run after all other post_save receivers for these models.
+#
+
+@receiver(post_save, sender=Prefix)
+def reset_original_prefix(instance, **kwargs):
+    """
+    Reset the original prefix & VRF of a Prefix now that all post_save receivers have run, so that a subsequent save
+    of the same instance is compared against the values to which it was last saved.
+    """
+    instance._prefix = instance.prefix
+    instance._vrf_id = instance.vrf_id
+
+
+@receiver(post_save, sender=IPRange)
+def reset_original_iprange(instance, **kwargs):
+    """
+    Reset the original addresses & VRF of an IPRange now that all post_save receivers have run.
+    """
+    instance._start_address = instance.start_address
+    instance._end_address = instance.end_address
+    instance._vrf_id = instance.vrf_id
+
+
+@receiver(post_save, sender=IPAddress)
+def reset_original_ipaddress(instance, **kwargs):
+    """
+    Reset the original address & VRF of an IPAddress now that all post_save receivers have run.
+    """
+    instance._address = instance.address
+    instance._vrf_id = instance.vrf_id
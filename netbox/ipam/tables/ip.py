@@ -235,8 +235,7 @@ class PrefixTable(TenancyColumnsMixin, NetBoxTable):
         verbose_name='Marked Utilized'
     )
     utilization = PrefixUtilizationColumn(
-        accessor='get_utilization',
-        orderable=False
+        accessor='_utilization'
     )
     comments = columns.MarkdownColumn()
     tags = columns.TagColumn(
@@ -279,8 +278,7 @@ class IPRangeTable(TenancyColumnsMixin, NetBoxTable):
         verbose_name='Marked Utilized'
     )
     utilization = columns.UtilizationColumn(
-        accessor='utilization',
-        orderable=False
+        accessor='_utilization'
     )
     comments = columns.MarkdownColumn()
     tags = columns.TagColumn(
@@ -1,5 +1,6 @@
 import json
 
+from django.contrib.contenttypes.models import ContentType
 from django.urls import reverse
 from netaddr import IPNetwork
 from rest_framework import status
@@ -8,6 +9,7 @@ from dcim.models import Device, DeviceRole, DeviceType, Interface, Manufacturer,
 from ipam.choices import *
 from ipam.models import *
 from tenancy.models import Tenant
+from users.models import ObjectPermission
 from utilities.testing import APITestCase, APIViewTestCases, create_test_device, disable_warnings
 
 
@@ -466,6 +468,74 @@ class PrefixTest(APIViewTestCases.APIViewTestCase):
         self.assertHttpStatus(response, status.HTTP_201_CREATED)
         self.assertEqual(len(response.data), 4)
 
+    def test_lookup_prefixes(self):
+        """
+        Test resolving multiple IP addresses to the most specific prefixes containing them.
+        """
+        vrf = VRF.objects.create(name='VRF 1')
+        tenant = Tenant.objects.create(name='Tenant 1', slug='tenant-1')
+        Prefix.objects.create(prefix=IPNetwork('10.0.0.0/8'), vrf=vrf)
+        prefix = Prefix.objects.create(prefix=IPNetwork('10.1.0.0/16'), vrf=vrf, tenant=tenant)
+        Prefix.objects.create(prefix=IPNetwork('10.1.0.0/16'))
+        url = reverse('ipam-api:prefix-lookup')
+        self.add_permissions('ipam.view_prefix', 'ipam.view_vrf')
+
+        data = {
+            'addresses': ['10.1.2.3', '10.1.2.4/24', '10.2.0.1', '192.0.2.1'],
+            'vrf': vrf.pk,
+        }
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertListEqual([r['address'] for r in response.data], ['10.1.2.3', '10.1.2.4', '10.2.0.1', '192.0.2.1'])
+        self.assertEqual(response.data[0]['prefix']['id'], prefix.pk)
+        self.assertEqual(response.data[0]['vrf']['id'], vrf.pk)
+        self.assertEqual(response.data[0]['tenant']['id'], tenant.pk)
+        self.assertEqual(response.data[1]['prefix']['id'], prefix.pk)
+        self.assertEqual(response.data[2]['prefix']['prefix'], '10.0.0.0/8')
+        self.assertIsNone(response.data[2]['tenant'])
+        self.assertIsNone(response.data[3]['prefix'])
+
+        # Invalid addresses are rejected
+        response = self.client.post(url, {'addresses': ['10.1.2.300']}, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
+    def test_lookup_prefixes_restricted(self):
+        """
+        Test that addresses resolve to the most specific prefixes the user is permitted to view.
+        """
+        vrfs = (
+            VRF.objects.create(name='VRF 1'),
+            VRF.objects.create(name='VRF 2'),
+        )
+        tenant = Tenant.objects.create(name='Tenant 1', slug='tenant-1')
+        prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/8'), vrf=vrfs[0])
+        Prefix.objects.create(prefix=IPNetwork('10.1.0.0/16'), vrf=vrfs[0], tenant=tenant)
+        url = reverse('ipam-api:prefix-lookup')
+
+        # Permit viewing only prefixes without a tenant, and only the first VRF
+        obj_perm = ObjectPermission(name='Test permission', constraints={'tenant__isnull': True}, actions=['view'])
+        obj_perm.save()
+        obj_perm.users.add(self.user)
+        obj_perm.object_types.add(ContentType.objects.get_for_model(Prefix))
+        obj_perm = ObjectPermission(name='Test permission 2', constraints={'pk': vrfs[0].pk}, actions=['view'])
+        obj_perm.save()
+        obj_perm.users.add(self.user)
+        obj_perm.object_types.add(ContentType.objects.get_for_model(VRF))
+
+        # The address falls back to the containing prefix which the user can view
+        data = {
+            'addresses': ['10.1.2.3'],
+            'vrf': vrfs[0].pk,
+        }
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['prefix']['id'], prefix.pk)
+
+        # VRFs which the user cannot view are rejected
+        data['vrf'] = vrfs[1].pk
+        response = self.client.post(url, data, format='json', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
     def test_list_available_ips(self):
         """
         Test retrieval of all available IP addresses within a parent prefix.
@@ -486,6 +556,35 @@ class PrefixTest(APIViewTestCases.APIViewTestCase):
         response = self.client.get(url, **self.header)
         self.assertEqual(len(response.data), 6)  # 8 - 2 because prefix.is_pool = False
 
+    def test_list_available_ips_paginated(self):
+        """
+        Test retrieval of a page of available IP addresses within a parent prefix.
+        """
+        prefix = Prefix.objects.create(prefix=IPNetwork('192.0.2.0/24'), is_pool=True)
+        IPAddress.objects.create(address=IPNetwork('192.0.2.5/24'))
+        url = reverse('ipam-api:prefix-available-ips', kwargs={'pk': prefix.pk})
+        self.add_permissions('ipam.view_prefix', 'ipam.view_ipaddress')
+
+        # Retrieve a page using an offset
+        response = self.client.get(f'{url}?limit=3&offset=4', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(
+            [ip['address'] for ip in response.data],
+            ['192.0.2.4/24', '192.0.2.6/24', '192.0.2.7/24']
+        )
+
+        # Retrieve the next page using a cursor
+        response = self.client.get(f'{url}?limit=3&start_after=192.0.2.7', **self.header)
+        self.assertHttpStatus(response, status.HTTP_200_OK)
+        self.assertEqual(
+            [ip['address'] for ip in response.data],
+            ['192.0.2.8/24', '192.0.2.9/24', '192.0.2.10/24']
+        )
+
+        # Invalid cursor
+        response = self.client.get(f'{url}?start_after=foo', **self.header)
+        self.assertHttpStatus(response, status.HTTP_400_BAD_REQUEST)
+
     def test_create_single_available_ip(self):
         """
         Test retrieval of the first available IP address within a parent prefix.
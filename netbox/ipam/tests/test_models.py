@@ -1,10 +1,11 @@
-from netaddr import IPNetwork, IPSet
+from netaddr import IPNetwork, IPRange as IPAddressRange, IPSet
 from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
 
 from dcim.models import Interface, Device, DeviceRole, DeviceType, Manufacturer, Site
 from ipam.choices import IPAddressRoleChoices, PrefixStatusChoices
 from ipam.models import Aggregate, IPAddress, IPRange, Prefix, RIR, VLAN, VLANGroup, VRF, L2VPN, L2VPNTermination
+from ipam.vid_bitmap import get_vid_bitmaps
 
 
 class TestAggregate(TestCase):
@@ -160,6 +161,57 @@ class TestPrefix(TestCase):
 
         self.assertEqual(available_ips, missing_ips)
 
+    def test_get_available_ip_ranges(self):
+
+        parent_prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'), is_pool=True)
+        IPAddress.objects.bulk_create((
+            IPAddress(address=IPNetwork('10.0.0.0/24')),
+            IPAddress(address=IPNetwork('10.0.0.10/24')),
+            IPAddress(address=IPNetwork('10.0.0.11/24')),
+            IPAddress(address=IPNetwork('10.0.0.25/24')),
+            IPAddress(address=IPNetwork('10.0.0.255/24')),
+            IPAddress(address=IPNetwork('10.0.2.1/24')),  # Outside the prefix
+        ))
+        # Overlaps an IP address
+        IPRange.objects.create(
+            start_address=IPNetwork('10.0.0.20/24'),
+            end_address=IPNetwork('10.0.0.30/24')
+        )
+
+        self.assertEqual(parent_prefix.get_available_ip_ranges(), [
+            IPAddressRange('10.0.0.1', '10.0.0.9'),
+            IPAddressRange('10.0.0.12', '10.0.0.19'),
+            IPAddressRange('10.0.0.31', '10.0.0.254'),
+        ])
+        self.assertEqual(parent_prefix.get_available_ip_ranges(limit=1), [
+            IPAddressRange('10.0.0.1', '10.0.0.9'),
+        ])
+        self.assertEqual(
+            [str(ip) for ip in parent_prefix.get_first_available_ips(11)],
+            [f'10.0.0.{i}' for i in (1, 2, 3, 4, 5, 6, 7, 8, 9, 12, 13)]
+        )
+
+        # Iterate from a cursor and/or offset
+        self.assertEqual(
+            [str(ip) for ip in parent_prefix.get_first_available_ips(3, start_after='10.0.0.8')],
+            ['10.0.0.9', '10.0.0.12', '10.0.0.13']
+        )
+        self.assertEqual(
+            [str(ip) for ip in parent_prefix.get_first_available_ips(2, offset=16)],
+            ['10.0.0.19', '10.0.0.31']
+        )
+        available_ips = parent_prefix.iter_available_ips(start_after='10.0.0.250', batch_size=1)
+        self.assertEqual([str(ip) for ip in available_ips], ['10.0.0.251', '10.0.0.252', '10.0.0.253', '10.0.0.254'])
+
+        # Fully consumed
+        parent_prefix = Prefix.objects.create(prefix=IPNetwork('10.0.1.0/31'))
+        IPAddress.objects.bulk_create((
+            IPAddress(address=IPNetwork('10.0.1.0/31')),
+            IPAddress(address=IPNetwork('10.0.1.1/31')),
+        ))
+        self.assertEqual(parent_prefix.get_available_ip_ranges(), [])
+        self.assertIsNone(parent_prefix.get_first_available_ip())
+
     def test_get_first_available_prefix(self):
 
         prefixes = Prefix.objects.bulk_create((
@@ -173,6 +225,30 @@ class TestPrefix(TestCase):
         Prefix.objects.create(prefix=IPNetwork('10.0.3.0/24'))
         self.assertEqual(prefixes[0].get_first_available_prefix(), IPNetwork('10.0.4.0/22'))
 
+    def test_get_first_available_prefixes(self):
+
+        prefixes = Prefix.objects.bulk_create((
+            Prefix(prefix=IPNetwork('10.0.0.0/24')),  # Parent prefix
+            Prefix(prefix=IPNetwork('10.0.0.0/26')),
+            Prefix(prefix=IPNetwork('10.0.0.0/28')),  # Nested within another child
+            Prefix(prefix=IPNetwork('10.0.0.128/27')),
+        ))
+        self.assertEqual(list(prefixes[0].iter_available_prefixes(batch_size=1)), [
+            IPNetwork('10.0.0.64/26'),
+            IPNetwork('10.0.0.160/27'),
+            IPNetwork('10.0.0.192/26'),
+        ])
+        self.assertEqual(prefixes[0].get_available_prefix_ranges(limit=1), [
+            IPAddressRange('10.0.0.64', '10.0.0.127'),
+        ])
+        self.assertEqual(prefixes[0].get_first_available_prefixes([27, 26, 28, 28, 25]), [
+            IPNetwork('10.0.0.64/27'),
+            IPNetwork('10.0.0.192/26'),
+            IPNetwork('10.0.0.96/28'),
+            IPNetwork('10.0.0.112/28'),
+            None,
+        ])
+
     def test_get_first_available_ip(self):
 
         parent_prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'))
@@ -223,6 +299,91 @@ class TestPrefix(TestCase):
         IPRange.objects.create(start_address=IPNetwork('10.0.0.33/24'), end_address=IPNetwork('10.0.0.64/24'))
         self.assertEqual(prefix.get_utilization(), 64 / 254 * 100)  # ~25% utilization
 
+    def test_get_utilization_overlapping(self):
+        # Nested child prefixes are counted once, including those too large to be counted as a bigint
+        prefixes = (
+            Prefix(prefix=IPNetwork('2001:db8::/32'), status=PrefixStatusChoices.STATUS_CONTAINER),
+            Prefix(prefix=IPNetwork('2001:db8::/33')),
+            Prefix(prefix=IPNetwork('2001:db8::/64')),
+            Prefix(prefix=IPNetwork('2001:db8::/64')),
+        )
+        Prefix.objects.bulk_create(prefixes)
+        self.assertEqual(prefixes[0].get_utilization(), 50)
+
+        # Duplicate IPs and IPs within a child range are counted once
+        prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'))
+        IPRange.objects.create(start_address=IPNetwork('10.0.0.1/24'), end_address=IPNetwork('10.0.0.10/24'))
+        IPAddress.objects.bulk_create([
+            IPAddress(address=IPNetwork('10.0.0.5/24')),
+            IPAddress(address=IPNetwork('10.0.0.20/24')),
+            IPAddress(address=IPNetwork('10.0.0.20/24')),
+        ])
+        self.assertEqual(prefix.get_utilization(), 11 / 254 * 100)
+
+    def test_stored_utilization(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            container = Prefix.objects.create(
+                prefix=IPNetwork('10.0.0.0/16'),
+                status=PrefixStatusChoices.STATUS_CONTAINER
+            )
+            prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'))
+        container.refresh_from_db()
+        self.assertEqual(float(container._utilization), 0.39)  # 256/65536
+
+        # Child IPs and ranges update the stored utilization of the prefix, and child IPs that of the range
+        with self.captureOnCommitCallbacks(execute=True):
+            iprange = IPRange.objects.create(
+                start_address=IPNetwork('10.0.0.1/24'),
+                end_address=IPNetwork('10.0.0.10/24')
+            )
+            ipaddress = IPAddress.objects.create(address=IPNetwork('10.0.0.1/24'))
+        prefix.refresh_from_db()
+        iprange.refresh_from_db()
+        self.assertEqual(float(prefix._utilization), 3.94)  # 10/254
+        self.assertEqual(float(iprange._utilization), 10.0)  # 1/10
+
+        # Moving the IP outside the range
+        with self.captureOnCommitCallbacks(execute=True):
+            ipaddress.address = IPNetwork('10.0.0.100/24')
+            ipaddress.save()
+        prefix.refresh_from_db()
+        iprange.refresh_from_db()
+        self.assertEqual(float(prefix._utilization), 4.33)  # 11/254
+        self.assertEqual(float(iprange._utilization), 0.0)
+
+        # Deleting the range
+        with self.captureOnCommitCallbacks(execute=True):
+            iprange.delete()
+        prefix.refresh_from_db()
+        self.assertEqual(float(prefix._utilization), 0.39)  # 1/254
+
+    def test_stored_utilization_global_container(self):
+        vrf = VRF.objects.create(name='VRF 1')
+        with self.captureOnCommitCallbacks(execute=True):
+            container = Prefix.objects.create(
+                prefix=IPNetwork('10.0.0.0/16'),
+                status=PrefixStatusChoices.STATUS_CONTAINER
+            )
+            vrf_container = Prefix.objects.create(
+                prefix=IPNetwork('10.0.0.0/16'),
+                vrf=vrf,
+                status=PrefixStatusChoices.STATUS_CONTAINER
+            )
+
+        # A child prefix in a VRF updates the utilization of global containers
+        with self.captureOnCommitCallbacks(execute=True):
+            prefix = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/24'), vrf=vrf)
+        container.refresh_from_db()
+        vrf_container.refresh_from_db()
+        self.assertEqual(float(container._utilization), 0.39)  # 256/65536
+        self.assertEqual(float(vrf_container._utilization), 0.39)
+
+        # Deleting the child prefix
+        with self.captureOnCommitCallbacks(execute=True):
+            prefix.delete()
+        container.refresh_from_db()
+        self.assertEqual(float(container._utilization), 0)
+
     #
     # Uniqueness enforcement tests
     #
@@ -389,6 +550,23 @@ class TestPrefixHierarchy(TestCase):
         self.assertEqual(prefixes[0]._depth, 0)
         self.assertEqual(prefixes[0]._children, 0)
 
+    def test_update_prefix_repeatedly(self):
+        # Change 10.0.0.0/16 to 10.0.0.0/12 and back, and save it again unchanged
+        p = Prefix.objects.get(prefix='10.0.0.0/16')
+        p.prefix = '10.0.0.0/12'
+        p.save()
+        p.prefix = '10.0.0.0/16'
+        p.save()
+        p.save()
+
+        prefixes = Prefix.objects.filter(prefix__family=4)
+        self.assertEqual(prefixes[0]._depth, 0)
+        self.assertEqual(prefixes[0]._children, 2)
+        self.assertEqual(prefixes[1]._depth, 1)
+        self.assertEqual(prefixes[1]._children, 1)
+        self.assertEqual(prefixes[2]._depth, 2)
+        self.assertEqual(prefixes[2]._children, 0)
+
     def test_delete_prefix4(self):
         # Delete 10.0.0.0/16
         Prefix.objects.filter(prefix='10.0.0.0/16').delete()
@@ -540,6 +718,28 @@ class TestVLANGroup(TestCase):
         VLAN.objects.create(name='VLAN 104', vid=104, group=vlangroup)
         self.assertEqual(vlangroup.get_next_available_vid(), 105)
 
+    def test_vid_bitmap(self):
+        vlangroup = VLANGroup.objects.first()
+        VLAN.objects.create(name='VLAN 150', vid=150, group=vlangroup)
+        bitmap = vlangroup.get_vid_bitmap()
+        self.assertEqual(bitmap.get_available_count(), 95)
+        self.assertListEqual(bitmap.get_available_ranges(), [(104, 149), (151, 199)])
+
+        # Allocate VIDs in bulk
+        self.assertListEqual(bitmap.allocate(3), [104, 105, 106])
+        self.assertEqual(bitmap.get_next_available(), 107)
+        self.assertListEqual(bitmap.allocate(100), [])
+        self.assertEqual(bitmap.get_next_available(), 107)
+
+        # Retrieve the bitmaps of multiple groups
+        vlangroup2 = VLANGroup.objects.create(name='VLAN Group 2', slug='vlan-group-2', min_vid=10, max_vid=11)
+        VLAN.objects.create(name='VLAN 10', vid=10, group=vlangroup2)
+        bitmaps = get_vid_bitmaps([vlangroup, vlangroup2])
+        self.assertEqual(bitmaps[vlangroup.pk].get_next_available(), 104)
+        self.assertListEqual(bitmaps[vlangroup2.pk].allocate(2), [])
+        self.assertListEqual(bitmaps[vlangroup2.pk].allocate(1), [11])
+        self.assertIsNone(bitmaps[vlangroup2.pk].get_next_available())
+
 
 class TestL2VPNTermination(TestCase):
 
@@ -0,0 +1,159 @@
+from django.db import transaction
+from django.test import TestCase
+from netaddr import IPNetwork, IPRange
+
+from ipam.choices import PrefixStatusChoices
+from ipam.models import Prefix, VRF
+from ipam.prefix_index import PrefixIndex, get_prefix_index
+from ipam.utils import get_advisory_lock_id, get_prefix_locks, rebuild_prefixes
+
+
+class GetPrefixLocksTest(TestCase):
+    """
+    Validate the operation of get_prefix_locks().
+    """
+    @classmethod
+    def setUpTestData(cls):
+        vrf = VRF.objects.create(name='VRF 1')
+        Prefix.objects.bulk_create((
+            Prefix(prefix=IPNetwork('10.0.0.0/8'), status=PrefixStatusChoices.STATUS_CONTAINER),
+            Prefix(prefix=IPNetwork('10.0.0.0/16')),
+            Prefix(prefix=IPNetwork('10.0.0.0/24')),
+            Prefix(prefix=IPNetwork('10.0.0.0/24'), vrf=vrf),
+            Prefix(prefix=IPNetwork('10.0.1.0/24')),
+        ))
+
+    def lock(self, prefix, shared, vrf=None):
+        pk = Prefix.objects.get(prefix=prefix, vrf=vrf).pk
+        return get_advisory_lock_id('available-ips', pk), shared
+
+    def test_prefix_locks(self):
+        global_lock = (get_advisory_lock_id('available-ips', 0), False)
+
+        # Allocating from a prefix locks it exclusively, and its parents for sharing
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPNetwork('10.0.0.0/24'), None)]), [
+            self.lock('10.0.0.0/8', True),
+            self.lock('10.0.0.0/16', True),
+            self.lock('10.0.0.0/24', False),
+        ])
+
+        # IP addresses lock their most specific prefix exclusively
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPRange('10.0.1.5', '10.0.1.5'), None)]), [
+            self.lock('10.0.0.0/8', True),
+            self.lock('10.0.0.0/16', True),
+            self.lock('10.0.1.0/24', False),
+        ])
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPRange('10.1.0.1', '10.1.0.1'), None)]), [
+            self.lock('10.0.0.0/8', False),
+        ])
+
+        # Space outside any prefix falls back to the global lock
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPRange('192.0.2.1', '192.0.2.1'), None)]), [
+            global_lock,
+        ])
+
+        # Space partially overlapping prefixes falls back to the global lock, and locks the outermost prefixes
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPRange('9.255.255.250', '10.0.0.5'), None)]), [
+            global_lock,
+            self.lock('10.0.0.0/8', False),
+        ])
+
+    def test_prefix_locks_vrf(self):
+        vrf = VRF.objects.get(name='VRF 1')
+        global_lock = (get_advisory_lock_id('available-ips', 0), False)
+
+        # Prefixes in other VRFs are not locked, but global containers are locked for sharing
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPNetwork('10.0.0.0/24'), vrf.pk)]), [
+            self.lock('10.0.0.0/8', True),
+            self.lock('10.0.0.0/24', False, vrf=vrf),
+        ])
+        self.assertListEqual(get_prefix_locks('available-ips', [(IPRange('10.0.0.250', '10.0.1.5'), vrf.pk)]), [
+            global_lock,
+            self.lock('10.0.0.0/8', True),
+            self.lock('10.0.0.0/24', False, vrf=vrf),
+        ])
+
+
+class RebuildPrefixesTest(TestCase):
+    """
+    Validate the operation of rebuild_prefixes().
+    """
+    def test_rebuild_prefixes(self):
+        vrf = VRF.objects.create(name='VRF 1')
+        Prefix.objects.bulk_create((
+            Prefix(prefix=IPNetwork('10.0.0.0/8')),
+            Prefix(prefix=IPNetwork('10.0.0.0/16')),
+            Prefix(prefix=IPNetwork('10.0.0.0/16')),
+            Prefix(prefix=IPNetwork('10.0.0.0/24')),
+            Prefix(prefix=IPNetwork('10.1.0.0/16')),
+            Prefix(prefix=IPNetwork('10.0.0.0/24'), vrf=vrf),
+        ))
+
+        # Bulk creation bypasses signals, so the hierarchy of every prefix in the global table needs updating
+        self.assertEqual(rebuild_prefixes(None), (5, 5))
+        self.assertEqual(rebuild_prefixes(None), (5, 0))
+
+        hierarchy = [(str(p.prefix), p._depth, p._children) for p in Prefix.objects.filter(vrf__isnull=True)]
+        self.assertListEqual(hierarchy, [
+            ('10.0.0.0/8', 0, 4),
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/16', 1, 1),
+            ('10.0.0.0/24', 2, 0),
+            ('10.1.0.0/16', 1, 0),
+        ])
+        self.assertListEqual(list(Prefix.objects.filter(vrf=vrf).values_list('_depth', '_children')), [(0, 0)])
+
+
+class PrefixIndexTest(TestCase):
+    """
+    Validate longest-prefix-match lookups using PrefixIndex.
+    """
+    def test_lookup(self):
+        vrf = VRF.objects.create(name='VRF 1')
+        prefixes = Prefix.objects.bulk_create((
+            Prefix(prefix=IPNetwork('10.0.0.0/8')),
+            Prefix(prefix=IPNetwork('10.1.0.0/16')),
+            Prefix(prefix=IPNetwork('10.1.0.0/16')),
+            Prefix(prefix=IPNetwork('10.1.1.0/24'), vrf=vrf),
+            Prefix(prefix=IPNetwork('2001:db8::/32')),
+            Prefix(prefix=IPNetwork('2001:db8::/64')),
+        ))
+        index = PrefixIndex()
+        self.assertEqual(index.size, 6)
+
+        matches = index.lookup_many(['10.1.1.1', '10.2.0.1', '11.0.0.1', '2001:db8::1', '2001:db8:1::1'])
+        self.assertListEqual([match.pk if match else None for match in matches.values()], [
+            prefixes[1].pk, prefixes[0].pk, None, prefixes[5].pk, prefixes[4].pk,
+        ])
+
+        match = index.lookup('10.1.1.1', vrf_id=vrf.pk)
+        self.assertEqual(match.pk, prefixes[3].pk)
+        self.assertEqual(match.prefix, IPNetwork('10.1.1.0/24'))
+        self.assertEqual(match.vrf_id, vrf.pk)
+        self.assertIsNone(index.lookup('10.1.2.1', vrf_id=vrf.pk))
+
+        # All containing prefixes are found, from most to least specific, with duplicates ordered by ID
+        self.assertListEqual([entry.pk for entry in index.iter_matches('10.1.1.1')], [
+            prefixes[1].pk, prefixes[2].pk, prefixes[0].pk,
+        ])
+
+    def test_transaction_index(self):
+        prefix1 = Prefix.objects.create(prefix=IPNetwork('10.0.0.0/8'))
+
+        # The index of a transaction which has modified prefixes reflects its changes, and is retained until a prefix
+        # is next modified
+        index = get_prefix_index()
+        self.assertEqual(index.lookup('10.1.1.1').pk, prefix1.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(get_prefix_index(), index)
+
+        prefix2 = Prefix.objects.create(prefix=IPNetwork('10.1.0.0/16'))
+        index = get_prefix_index()
+        self.assertEqual(index.lookup('10.1.1.1').pk, prefix2.pk)
+
+        # Changes rolled back to a savepoint are discarded from the index
+        with transaction.atomic():
+            Prefix.objects.create(prefix=IPNetwork('10.1.1.0/24'))
+            self.assertNotEqual(get_prefix_index().lookup('10.1.1.1').pk, prefix2.pk)
+            transaction.set_rollback(True)
+        self.assertEqual(get_prefix_index().lookup('10.1.1.1').pk, prefix2.pk)
@@ -1,7 +1,18 @@
-import netaddr
+import io
+from contextlib import ExitStack, contextmanager
 
+import netaddr
+from django.db import connection, transaction
+from django.db.models import Q
+from django_pglocks import advisory_lock
+
+from netbox.constants import ADVISORY_LOCK_KEYS
+from netbox.context import ip_utilization_queue
+from utilities.transactions import TransactionQueue
+from .choices import PrefixStatusChoices
 from .constants import *
-from .models import ASN, Prefix, VLAN
+from .models import ASN, IPRange, Prefix, VLAN
+from .vid_bitmap import VIDBitmap
 
 
 def add_requested_prefixes(parent, prefix_list, show_available=True, show_assigned=True):
@@ -9,8 +20,8 @@ def add_requested_prefixes(parent, prefix_list, show_available=True, show_assign
     Return a list of requested prefixes using show_available, show_assigned filters. If available prefixes are
     requested, create fake Prefix objects for all unallocated space within a prefix.
 
-    :param parent: Parent Prefix instance
-    :param prefix_list: Child prefixes list
+    :param parent: Parent Aggregate or Prefix instance
+    :param prefix_list: Child prefixes queryset
     :param show_available: Include available prefixes.
     :param show_assigned: Show assigned prefixes.
     """
@@ -19,9 +30,9 @@ def add_requested_prefixes(parent, prefix_list, show_available=True, show_assign
     # Add available prefixes to the table if requested
     if prefix_list and show_available:
 
-        # Find all unallocated space, add fake Prefix objects to child_prefixes.
-        available_prefixes = netaddr.IPSet(parent) ^ netaddr.IPSet([p.prefix for p in prefix_list])
-        available_prefixes = [Prefix(prefix=p, status=None) for p in available_prefixes.iter_cidrs()]
+        # Find all unallocated space (computed by the database), add fake Prefix objects to child_prefixes.
+        available_prefixes = parent.iter_available_prefixes(batch_size=None, child_prefixes=prefix_list)
+        available_prefixes = [Prefix(prefix=p, status=None) for p in available_prefixes]
         child_prefixes = child_prefixes + available_prefixes
 
     # Add assigned prefixes to the table if requested
@@ -89,98 +100,245 @@ def add_available_vlans(vlans, vlan_group=None):
     min_vid = vlan_group.min_vid if vlan_group else VLAN_VID_MIN
     max_vid = vlan_group.max_vid if vlan_group else VLAN_VID_MAX
 
-    if not vlans:
-        return [{
-            'vid': min_vid,
-            'vlan_group': vlan_group,
-            'available': max_vid - min_vid + 1
-        }]
-
-    prev_vid = max_vid
-    new_vlans = []
-    for vlan in vlans:
-        if vlan.vid - prev_vid > 1:
-            new_vlans.append({
-                'vid': prev_vid + 1,
-                'vlan_group': vlan_group,
-                'available': vlan.vid - prev_vid - 1,
-            })
-        prev_vid = vlan.vid
-
-    if vlans[0].vid > min_vid:
-        new_vlans.append({
-            'vid': min_vid,
-            'vlan_group': vlan_group,
-            'available': vlans[0].vid - min_vid,
-        })
-    if prev_vid < max_vid:
-        new_vlans.append({
-            'vid': prev_vid + 1,
+    vlans = list(vlans)
+    bitmap = VIDBitmap(min_vid, max_vid, [vlan.vid for vlan in vlans])
+    new_vlans = [
+        {
+            'vid': first,
             'vlan_group': vlan_group,
-            'available': max_vid - prev_vid,
-        })
+            'available': last - first + 1,
+        } for first, last in bitmap.get_available_ranges()
+    ]
 
-    vlans = list(vlans) + new_vlans
+    vlans = vlans + new_vlans
     vlans.sort(key=lambda v: v.vid if type(v) == VLAN else v['vid'])
 
     return vlans
 
 
-def rebuild_prefixes(vrf):
+def get_prefix_hierarchy(vrf):
     """
-    Rebuild the prefix hierarchy for all prefixes in the specified VRF (or global table).
+    Compute the depth and number of children of each prefix in the specified VRF (or global table), consistent with
+    PrefixQuerySet.annotate_hierarchy(). Yields a (pk, depth, children) tuple for each prefix.
     """
     def contains(parent, child):
         return child in parent and child != parent
 
-    def push_to_stack(prefix):
-        # Increment child count on parent nodes
-        for n in stack:
-            n['children'] += 1
-        stack.append({
-            'pk': [prefix['pk']],
-            'prefix': prefix['prefix'],
-            'children': 0,
-        })
+    def pop_from_stack():
+        node = stack.pop()
+        for pk in node['pk']:
+            yield pk, len(stack), node['children']
 
     stack = []
-    update_queue = []
-    prefixes = Prefix.objects.filter(vrf=vrf).values('pk', 'prefix')
+    prefixes = Prefix.objects.filter(vrf=vrf).order_by('prefix', 'pk').values_list('pk', 'prefix')
 
     # Iterate through all Prefixes in the VRF, growing and shrinking the stack as we go
-    for i, p in enumerate(prefixes):
-
-        # Grow the stack if this is a child of the most recent prefix
-        if not stack or contains(stack[-1]['prefix'], p['prefix']):
-            push_to_stack(p)
+    for pk, prefix in prefixes.iterator(chunk_size=2000):
 
-        # Handle duplicate prefixes
-        elif stack[-1]['prefix'] == p['prefix']:
-            stack[-1]['pk'].append(p['pk'])
+        # Handle duplicate prefixes (each of which counts as a child of its parents)
+        if stack and stack[-1]['prefix'] == prefix:
+            stack[-1]['pk'].append(pk)
+            for n in stack[:-1]:
+                n['children'] += 1
+            continue
 
         # If this is a sibling or parent of the most recent prefix, pop nodes from the
         # stack until we reach a parent prefix (or the root)
-        else:
-            while stack and not contains(stack[-1]['prefix'], p['prefix']):
-                node = stack.pop()
-                for pk in node['pk']:
-                    update_queue.append(
-                        Prefix(pk=pk, _depth=len(stack), _children=node['children'])
-                    )
-            push_to_stack(p)
-
-        # Flush the update queue once it reaches 100 Prefixes
-        if len(update_queue) >= 100:
-            Prefix.objects.bulk_update(update_queue, ['_depth', '_children'])
-            update_queue = []
+        while stack and not contains(stack[-1]['prefix'], prefix):
+            yield from pop_from_stack()
+
+        # Increment child count on parent nodes and push this prefix onto the stack
+        for n in stack:
+            n['children'] += 1
+        stack.append({
+            'pk': [pk],
+            'prefix': prefix,
+            'children': 0,
+        })
 
     # Clear out any prefixes remaining in the stack
     while stack:
-        node = stack.pop()
-        for pk in node['pk']:
-            update_queue.append(
-                Prefix(pk=pk, _depth=len(stack), _children=node['children'])
-            )
+        yield from pop_from_stack()
+
 
-    # Final flush of any remaining Prefixes
-    Prefix.objects.bulk_update(update_queue, ['_depth', '_children'])
+def rebuild_prefixes(vrf):
+    """
+    Rebuild the prefix hierarchy for all prefixes in the specified VRF (or global table). The computed values are
+    copied into a temporary table, from which all changed prefixes are updated using a single statement.
+
+    Returns a tuple of the number of prefixes in the VRF and the number of prefixes updated.
+    """
+    buffer = io.StringIO()
+    count = 0
+    for pk, depth, children in get_prefix_hierarchy(vrf):
+        buffer.write(f'{pk}\t{depth}\t{children}\n')
+        count += 1
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE "ipam_prefix_hierarchy" '
+            '("id" bigint PRIMARY KEY, "depth" smallint NOT NULL, "children" bigint NOT NULL)'
+        )
+        cursor.copy_from(buffer, 'ipam_prefix_hierarchy', columns=('id', 'depth', 'children'))
+        cursor.execute(
+            'UPDATE "ipam_prefix" SET "_depth" = H."depth", "_children" = H."children" '
+            'FROM "ipam_prefix_hierarchy" H '
+            'WHERE "ipam_prefix"."id" = H."id" '
+            'AND ("ipam_prefix"."_depth", "ipam_prefix"."_children") IS DISTINCT FROM (H."depth", H."children")'
+        )
+        updated = cursor.rowcount
+        cursor.execute('DROP TABLE "ipam_prefix_hierarchy"')
+
+    return count, updated
+
+
+def get_advisory_lock_id(key, pk):
+    """
+    Return the ID of the advisory lock scoped to the object with the given ID, under the specified ADVISORY_LOCK_KEYS
+    key. Object IDs are folded into the 32-bit range accepted by PostgreSQL.
+    """
+    return ADVISORY_LOCK_KEYS[key], pk % 2 ** 31
+
+
+def get_prefix_locks(key, ranges):
+    """
+    Return the advisory locks to be held while allocating from (or otherwise modifying) the given IP space, as an
+    ordered list of (lock ID, shared) tuples. Within the VRF of each range, an exclusive lock is taken on the most
+    specific Prefix(es) containing the range, and a shared lock on every other Prefix containing it. Work within nested
+    prefixes is thereby serialized, while unrelated prefixes (and VRFs) may be worked within concurrently. Global
+    container prefixes span all VRFs, so they are locked for sharing by ranges within any VRF.
+
+    A range which does not fall within any Prefix of its VRF is covered by the global lock for the key, along with an
+    exclusive lock on each of the outermost Prefixes which it partially overlaps.
+
+    All locks are held in the same (two-key) lock space, and are ordered consistently (the global lock first, followed
+    by prefixes by mask length) to avoid deadlocks.
+
+    :param key: ADVISORY_LOCK_KEYS key
+    :param ranges: Iterable of (netaddr.IPNetwork or netaddr.IPRange, VRF ID) tuples
+    """
+    bounds = [
+        (netaddr.IPAddress(r.first, r.version), netaddr.IPAddress(r.last, r.version), vrf_id) for r, vrf_id in ranges
+    ]
+    if not bounds:
+        return []
+
+    # Retrieve all prefixes overlapping each range: those containing either end of the range, and those within it
+    query = Q()
+    for first, last, vrf_id in bounds:
+        vrf_query = Q(vrf=vrf_id)
+        if vrf_id is not None:
+            vrf_query |= Q(vrf__isnull=True, status=PrefixStatusChoices.STATUS_CONTAINER)
+        range_query = Q(prefix__net_contains_or_equals=str(first)) | Q(prefix__net_contains_or_equals=str(last))
+        for cidr in netaddr.iprange_to_cidrs(first, last):
+            range_query |= Q(prefix__net_contained_or_equal=str(cidr))
+        query |= vrf_query & range_query
+    prefixes = list(Prefix.objects.filter(query).values_list('pk', 'prefix', 'vrf_id', 'status'))
+
+    use_global_lock = False
+    exclusive = set()
+    shared = set()
+    for first, last, vrf_id in bounds:
+        containing = []
+        overlapping = []
+        for pk, prefix, prefix_vrf_id, status in prefixes:
+            if not (first in prefix or last in prefix or first.value <= prefix.first <= last.value):
+                continue
+            if prefix_vrf_id != vrf_id:
+                # Global container prefixes overlapping the range of another VRF
+                if prefix_vrf_id is None and status == PrefixStatusChoices.STATUS_CONTAINER:
+                    shared.add((prefix.prefixlen, pk))
+            elif first in prefix and last in prefix:
+                containing.append((prefix.prefixlen, pk))
+            else:
+                overlapping.append((prefix, pk))
+        if not containing:
+            # Lock the outermost prefixes overlapping the range exclusively, as work within them locks them (or their
+            # descendants) rather than the global lock
+            use_global_lock = True
+            for prefix, pk in overlapping:
+                if not any(other.prefixlen < prefix.prefixlen and prefix in other for other, _ in overlapping):
+                    exclusive.add((prefix.prefixlen, pk))
+            continue
+        depth = max(prefixlen for prefixlen, pk in containing)
+        for prefixlen, pk in containing:
+            if prefixlen == depth:
+                exclusive.add((prefixlen, pk))
+            else:
+                shared.add((prefixlen, pk))
+
+    # The global lock is expressed in the same two-key form as prefix locks (no Prefix has an ID of zero), as
+    # PostgreSQL does not resolve conflicts between single-key and two-key locks
+    locks = [(get_advisory_lock_id(key, 0), False)] if use_global_lock else []
+    for prefixlen, pk in sorted(exclusive | shared):
+        locks.append((get_advisory_lock_id(key, pk), (prefixlen, pk) not in exclusive))
+
+    return locks
+
+
+@contextmanager
+def advisory_locks(locks):
+    """
+    Acquire each of the given advisory locks (as (lock ID, shared) tuples) in order, and release them all on exit.
+    """
+    with ExitStack() as stack:
+        for lock_id, shared in locks:
+            stack.enter_context(advisory_lock(lock_id, shared=shared))
+        yield
+
+
+def update_utilization(prefix_ids=(), iprange_ids=()):
+    """
+    Recalculate and store the utilization of the specified prefixes and IP ranges. The IPs consumed within each object
+    are counted by the database (see get_used_ip_count()), so child objects are never retrieved.
+
+    :param prefix_ids: Iterable of Prefix IDs
+    :param iprange_ids: Iterable of IPRange IDs
+    """
+    for model, pks in ((Prefix, prefix_ids), (IPRange, iprange_ids)):
+        instances = list(model.objects.filter(pk__in=pks))
+        for instance in instances:
+            instance._utilization = round(instance.get_utilization(), 2)
+        model.objects.bulk_update(instances, fields=['_utilization'], batch_size=100)
+
+
+class UtilizationQueue(TransactionQueue):
+    """
+    Collects the IDs of prefixes and IP ranges whose utilization is to be recalculated once the current transaction has
+    been committed.
+    """
+    context_var = ip_utilization_queue
+
+    def __init__(self):
+        super().__init__()
+        self.prefix_ids = set()
+        self.iprange_ids = set()
+
+    def __bool__(self):
+        return bool(self.prefix_ids or self.iprange_ids)
+
+    def flush(self):
+        update_utilization(self.prefix_ids, self.iprange_ids)
+
+
+def enqueue_utilization(prefix_ids=(), iprange_ids=()):
+    """
+    Schedule the recalculation of the utilization of the specified prefixes and IP ranges once the current transaction
+    has been committed. Each object is updated only once per transaction. If no transaction is active, the objects are
+    updated immediately.
+
+    :param prefix_ids: Iterable of Prefix IDs (null values are ignored)
+    :param iprange_ids: Iterable of IPRange IDs (null values are ignored)
+    """
+    prefix_ids = {pk for pk in prefix_ids if pk}
+    iprange_ids = {pk for pk in iprange_ids if pk}
+    if not prefix_ids and not iprange_ids:
+        return
+
+    queue = UtilizationQueue.get_current()
+    if queue is None:
+        update_utilization(prefix_ids, iprange_ids)
+    else:
+        queue.prefix_ids.update(prefix_ids)
+        queue.iprange_ids.update(iprange_ids)
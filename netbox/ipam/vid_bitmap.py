@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+__all__ = (
+    'VIDBitmap',
+    'get_vid_bitmaps',
+)
+
+
+class VIDBitmap:
+    """
+    A compact record of the VLAN IDs in use within a VLANGroup, held as a bitmap in which bit n represents VID n. Bits
+    outside the group's permitted range (min_vid to max_vid) are permanently set, so the lowest clear bit is always the
+    next available VID. Because the bitmap is a plain integer, the next available VID is found using a constant number
+    of integer operations, and VIDs may be allocated without querying the database once the bitmap has been built.
+    """
+    def __init__(self, min_vid, max_vid, vids=()):
+        self.min_vid = min_vid
+        self.max_vid = max_vid
+        # All bits below min_vid and above max_vid are set (the latter by virtue of the integer being negative)
+        self.bitmap = ((1 << min_vid) - 1) | -(1 << (max_vid + 1))
+        for vid in vids:
+            self.use(vid)
+
+    def _in_range(self, vid):
+        return self.min_vid <= vid <= self.max_vid
+
+    def use(self, vid):
+        """
+        Mark the given VID as used. VIDs outside the permitted range are ignored.
+        """
+        if self._in_range(vid):
+            self.bitmap |= 1 << vid
+
+    def release(self, vid):
+        """
+        Mark the given VID as available. VIDs outside the permitted range are ignored.
+        """
+        if self._in_range(vid):
+            self.bitmap &= ~(1 << vid)
+
+    def is_available(self, vid):
+        return self._in_range(vid) and not self.bitmap >> vid & 1
+
+    def get_available_count(self):
+        """
+        Return the number of available VIDs.
+        """
+        mask = (1 << (self.max_vid + 1)) - (1 << self.min_vid)
+        return bin(~self.bitmap & mask).count('1')
+
+    def get_next_available(self):
+        """
+        Return the lowest available VID, or None if all VIDs are in use.
+        """
+        # Isolate the lowest clear bit
+        lowest = ~self.bitmap & (self.bitmap + 1)
+        return lowest.bit_length() - 1 if lowest else None
+
+    def allocate(self, count=1):
+        """
+        Mark the lowest `count` available VIDs as used and return them as a list. If fewer VIDs are available, none are
+        allocated and an empty list is returned.
+        """
+        if self.get_available_count() < count:
+            return []
+        vids = []
+        for _ in range(count):
+            vid = self.get_next_available()
+            self.bitmap |= 1 << vid
+            vids.append(vid)
+        return vids
+
+    def iter_available(self):
+        """
+        Iterate over all available VIDs in ascending order.
+        """
+        bitmap = self.bitmap
+        while True:
+            lowest = ~bitmap & (bitmap + 1)
+            if not lowest:
+                return
+            bitmap |= lowest
+            yield lowest.bit_length() - 1
+
+    def get_available_ranges(self):
+        """
+        Return a list of (first VID, last VID) tuples for each contiguous range of available VIDs, in ascending order.
+        """
+        ranges = []
+        bitmap = self.bitmap
+        while True:
+            lowest = ~bitmap & (bitmap + 1)
+            if not lowest:
+                return ranges
+            first = lowest.bit_length() - 1
+            # The range extends up to the lowest set bit above it (which always exists, as all bits above max_vid
+            # are set)
+            above = bitmap >> first
+            last = first + (above & -above).bit_length() - 2
+            ranges.append((first, last))
+            bitmap |= (1 << (last + 1)) - (1 << first)
+
+
+def get_vid_bitmaps(vlan_groups):
+    """
+    Return a dictionary mapping the ID of each of the given VLANGroups to its VIDBitmap. The VIDs of all groups are
+    retrieved using a single query.
+
+    :param vlan_groups: Iterable of VLANGroup instances
+    """
+    from ipam.models import VLAN
+
+    vlan_groups = list(vlan_groups)
+    vids = defaultdict(list)
+    if vlan_groups:
+        for group_id, vid in VLAN.objects.filter(group__in=vlan_groups).values_list('group_id', 'vid'):
+            vids[group_id].append(vid)
+
+    return {
+        group.pk: VIDBitmap(group.min_vid, group.max_vid, vids[group.pk]) for group in vlan_groups
+    }
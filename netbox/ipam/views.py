@@ -20,6 +20,7 @@ from .constants import *
 from .models import *
 from .tables.l2vpn import L2VPNTable, L2VPNTerminationTable
 from .utils import add_requested_prefixes, add_available_ipaddresses, add_available_vlans
+from .vid_bitmap import get_vid_bitmaps
 
 
 #
@@ -367,7 +368,7 @@ class AggregatePrefixesView(generic.ObjectChildrenView):
         show_available = bool(request.GET.get('show_available', 'true') == 'true')
         show_assigned = bool(request.GET.get('show_assigned', 'true') == 'true')
 
-        return add_requested_prefixes(parent.prefix, queryset, show_available, show_assigned)
+        return add_requested_prefixes(parent, queryset, show_available, show_assigned)
 
     def get_extra_context(self, request, instance):
         return {
@@ -554,7 +555,7 @@ class PrefixPrefixesView(generic.ObjectChildrenView):
         show_available = bool(request.GET.get('show_available', 'true') == 'true')
         show_assigned = bool(request.GET.get('show_assigned', 'true') == 'true')
 
-        return add_requested_prefixes(parent.prefix, queryset, show_available, show_assigned)
+        return add_requested_prefixes(parent, queryset, show_available, show_assigned)
 
     def get_extra_context(self, request, instance):
         return {
@@ -893,6 +894,17 @@ class VLANGroupListView(generic.ObjectListView):
     filterset_form = forms.VLANGroupFilterForm
     table = tables.VLANGroupTable
 
+    def get_table(self, *args, **kwargs):
+        table = super().get_table(*args, **kwargs)
+
+        # Build the VID bitmaps of all VLAN groups on the current page using a single query
+        vlan_groups = [row.record for row in table.page.object_list] if hasattr(table, 'page') else []
+        vid_bitmaps = get_vid_bitmaps(vlan_groups)
+        for vlan_group in vlan_groups:
+            vlan_group._vid_bitmap = vid_bitmaps[vlan_group.pk]
+
+        return table
+
 
 @register_model_view(VLANGroup)
 class VLANGroupView(generic.ObjectView):
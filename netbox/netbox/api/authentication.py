@@ -124,6 +124,20 @@ class TokenPermissions(DjangoObjectPermissions):
         return super().has_object_permission(request, view, obj)
 
 
+class LookupPermissions(TokenPermissions):
+    """
+    Permissions handler for views which accept POST requests only to retrieve objects (e.g. bulk lookups too large to
+    be expressed as query parameters). Such requests require view permission and are permitted for read-only tokens.
+    """
+    perms_map = {
+        **TokenPermissions.perms_map,
+        'POST': ['%(app_label)s.view_%(model_name)s'],
+    }
+
+    def _verify_write_permission(self, request):
+        return request.method in SAFE_METHODS or request.method == 'POST' or request.auth.write_enabled
+
+
 class IsAuthenticatedOrLoginNotRequired(BasePermission):
     """
     Returns True if the user is authenticated or LOGIN_REQUIRED is False.
@@ -9,7 +9,7 @@ RQ_QUEUE_LOW = 'low'
 # Keys for PostgreSQL advisory locks. These are arbitrary bigints used by the advisory_lock
 # context manager. When a lock is acquired, one of these keys will be used to identify said lock.
 # When adding a new key, pick something arbitrary and unique so that it is easily searchable in
-# query logs.
+# query logs. Locks scoped to an individual object are identified by the pair of a key and the object's ID.
 ADVISORY_LOCK_KEYS = {
     'available-prefixes': 100100,
     'available-ips': 100200,
@@ -1,10 +1,26 @@
 from contextvars import ContextVar
 
 __all__ = (
+    'cablepath_queue',
     'current_request',
+    'deferred_changes_queue',
+    'device_components_queue',
+    'ip_utilization_queue',
+    'module_components_queue',
+    'prefix_changes_queue',
+    'rack_utilization_queue',
+    'synchronous_path_tracing',
     'webhooks_queue',
 )
 
 
 current_request = ContextVar('current_request', default=None)
 webhooks_queue = ContextVar('webhooks_queue', default=[])
+cablepath_queue = ContextVar('cablepath_queue', default=None)
+synchronous_path_tracing = ContextVar('synchronous_path_tracing', default=False)
+rack_utilization_queue = ContextVar('rack_utilization_queue', default=None)
+deferred_changes_queue = ContextVar('deferred_changes_queue', default=None)
+device_components_queue = ContextVar('device_components_queue', default=None)
+module_components_queue = ContextVar('module_components_queue', default=None)
+ip_utilization_queue = ContextVar('ip_utilization_queue', default=None)
+prefix_changes_queue = ContextVar('prefix_changes_queue', default=None)
@@ -10,6 +10,7 @@ from django.utils.module_loading import import_string
 import netaddr
 from netaddr.core import AddrFormatError
 
+from extras.context_managers import defer_object_change, discard_deferred_object
 from extras.models import CachedValue, CustomField
 from netbox.registry import registry
 from utilities.querysets import RestrictedPrefetch
@@ -58,12 +59,16 @@ class SearchBackend:
         """
         Receiver for the post_save signal, responsible for caching object creation/changes.
         """
+        if defer_object_change(instance, created=created):
+            return
         self.cache(instance, remove_existing=not created)
 
     def removal_handler(self, sender, instance, **kwargs):
         """
         Receiver for the post_delete signal, responsible for caching object deletion.
         """
+        if discard_deferred_object(instance):
+            return
         self.remove(instance)
 
     def cache(self, instances, indexer=None, remove_existing=True):
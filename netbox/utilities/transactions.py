@@ -0,0 +1,82 @@
+import weakref
+
+from django.db import transaction
+
+__all__ = (
+    'TransactionQueue',
+)
+
+
+class TransactionQueue:
+    """
+    A queue of work to be performed once the current transaction has been committed. Each queue is held in a
+    ContextVar (`context_var`) and is flushed by an on_commit() callback, however many items are added to it.
+
+    A callback is registered once for each atomic block (savepoint) within which items are added to the queue, so that
+    the queue is flushed when the block is committed under Django's captureOnCommitCallbacks() as well as upon commit of
+    the outermost transaction. Once the queue has been flushed, any remaining callbacks have no effect. If the
+    transaction, or every savepoint within which a callback was registered, is rolled back, Django discards the
+    callbacks and the queue is abandoned; a new queue is created by the next call to get_current(). Callbacks are
+    tracked using weak references, which are cleared once Django has discarded them.
+
+    Subclasses must set `context_var` and implement __bool__() and flush().
+    """
+    context_var = None
+
+    def __init__(self):
+        self._callbacks = {}
+        self._flushed = False
+
+    def __bool__(self):
+        raise NotImplementedError()
+
+    @classmethod
+    def get_current(cls):
+        """
+        Return the queue for the current transaction, creating a new one if necessary, and ensure that it is scheduled
+        to be flushed upon commit of the current atomic block. Returns None if no transaction is active, in which case
+        work should be performed immediately.
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            return None
+
+        queue = cls.context_var.get()
+        if queue is None or not queue.is_scheduled():
+            queue = cls()
+            cls.context_var.set(queue)
+        queue.schedule(connection)
+
+        return queue
+
+    def schedule(self, connection):
+        """
+        Flush the queue once the current atomic block has been committed.
+        """
+        self._callbacks = {sid: ref for sid, ref in self._callbacks.items() if ref() is not None}
+        # Atomic blocks which do not create a savepoint belong to the enclosing savepoint (if any)
+        savepoint_id = next((sid for sid in reversed(connection.savepoint_ids) if sid), None)
+        if savepoint_id not in self._callbacks:
+            # The bound method is referenced only by the transaction's list of on_commit() callbacks
+            callback = self.on_commit
+            self._callbacks[savepoint_id] = weakref.ref(callback)
+            transaction.on_commit(callback)
+
+    def is_scheduled(self):
+        """
+        Return True if the queue is yet to be flushed upon commit of the current transaction.
+        """
+        return any(ref() is not None for ref in self._callbacks.values())
+
+    def on_commit(self):
+        """
+        Clear the queue from the current context and flush it.
+        """
+        if self.context_var.get() is self:
+            self.context_var.set(None)
+        if self and not self._flushed:
+            self._flushed = True
+            self.flush()
+
+    def flush(self):
+        raise NotImplementedError()
@@ -88,6 +88,16 @@ COMMAND="python3 netbox/manage.py trace_paths --no-input"
 echo "Checking for missing cable paths ($COMMAND)..."
 eval $COMMAND || exit 1
 
+# Recalculate the stored utilization of all racks
+COMMAND="python3 netbox/manage.py rebuild_rack_utilization"
+echo "Updating rack utilization ($COMMAND)..."
+eval $COMMAND || exit 1
+
+# Recalculate the stored utilization of all prefixes and IP ranges
+COMMAND="python3 netbox/manage.py rebuild_prefix_utilization"
+echo "Updating prefix utilization ($COMMAND)..."
+eval $COMMAND || exit 1
+
 # Build the local documentation
 COMMAND="mkdocs build"
 echo "Building documentation ($COMMAND)..."